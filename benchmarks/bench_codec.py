@@ -0,0 +1,61 @@
+""" Encode/decode time and size of typical messages, codec against pickle.
+
+    python benchmarks/bench_codec.py [iterations]
+"""
+
+import pickle
+import sys
+import timeit
+
+from waving_hands import codec
+from waving_hands.gamemaster import Gamemaster
+from waving_hands.targetable_client import TargetableClient
+
+
+def messages():
+
+    gm = Gamemaster()
+    gm.create_wizards()
+    gandalf, saruman = gm.wizards
+
+    targets = [
+        TargetableClient("Nobody", 0, "nobody"),
+        TargetableClient(gandalf.name, gandalf.hp, "wizard"),
+        TargetableClient(saruman.name, saruman.hp, "wizard"),
+        TargetableClient("Grobleplop the Goblin", 1, "minion", False, 1, "Gandalf", "Saruman"),
+        TargetableClient("Fire Elemental", 3, "elemental"),
+    ]
+
+    return {
+        "bool reply":False,
+        "spell choice":[["Shield", "Counter-spell", "Remove Enchantment"], "left"],
+        "get target":[targets, "Lightning Bolt"],
+        "status snapshot":gm.build_status_snapshot(gandalf),
+        "flavor lines":["longlonglonglonglonglonglonglonglong " + str(i) for i in range(50)],
+    }
+
+
+def main():
+
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    print("{:<16} {:>8} {:>8}   {:>9} {:>9}   {:>9} {:>9}".format(
+        "message", "pickle", "codec", "pickle", "codec", "pickle", "codec"))
+    print("{:<16} {:>8} {:>8}   {:>9} {:>9}   {:>9} {:>9}".format(
+        "", "bytes", "bytes", "enc us", "enc us", "dec us", "dec us"))
+
+    for name, message in messages().items():
+        pickled = pickle.dumps(message)
+        encoded = codec.encode(message)
+
+        p_enc = timeit.timeit(lambda message=message: pickle.dumps(message), number=number) / number * 1e6
+        c_enc = timeit.timeit(lambda message=message: codec.encode(message), number=number) / number * 1e6
+        p_dec = timeit.timeit(lambda pickled=pickled: pickle.loads(pickled), number=number) / number * 1e6
+        c_dec = timeit.timeit(lambda encoded=encoded: codec.decode(encoded), number=number) / number * 1e6
+
+        print("{:<16} {:>8} {:>8}   {:>9.2f} {:>9.2f}   {:>9.2f} {:>9.2f}".format(
+            name, len(pickled), len(encoded), p_enc, c_enc, p_dec, c_dec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+""" Bytes on the wire and CPU time per round with and without compression.
+
+Two ScriptedClients play a match in this process, once offering to take
+compressed frames and once not. The bytes are those queued for the clients
+by the Gamemaster; the CPU time is that of the whole process, both clients
+included, since they share the one core.
+
+The last lines time compressing and unpacking a single round report.
+
+    python benchmarks/bench_compression.py [turns]
+"""
+
+import sys
+import time
+
+from waving_hands import protocol
+from waving_hands.headless import play_match
+from waving_hands.scripted_client import ScriptedClient
+
+REPORT = ["Gandalf casts Magic Missile at Saruman!",
+          "...but it is deflected by Saruman's shield!",
+          "Saruman casts Cause Light Wounds at Gandalf!",
+          "Gandalf takes 2 damage!",
+          "Saruman stabs at Gandalf with the dagger in their right hand!",
+          "Gandalf's protective aura bends the stab away!"]
+
+
+def play(turns, compress):
+
+    bots = [ScriptedClient(name="Alice", gestures=("p", "s"), surrender_after=turns, compress=compress),
+            ScriptedClient(name="Bob", gestures=("s", "d"), surrender_after=turns + 1, compress=compress)]
+
+    start = time.process_time()
+    game = play_match(bots, seed=1)
+    cpu = time.process_time() - start
+
+    sent = sum(stats["queued"] for stats in game.outbound_stats().values())
+
+    return sent, cpu
+
+
+def main():
+
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = turns + 1
+
+    results = {}
+    for compress in (False, True):
+        # Once to warm up, once to measure.
+        play(5, compress)
+        results[compress] = play(turns, compress)
+
+    print("\n{} rounds, two clients\n".format(rounds))
+    for compress, (sent, cpu) in results.items():
+        print("{:<12} {:>8.0f} bytes/round   {:>7.3f}ms CPU/round".format(
+            "compressed" if compress else "plain", sent / rounds, cpu / rounds * 1e3))
+
+    plain, packed = results[False][0], results[True][0]
+    print("\ncompressed frames carry {:.0%} of the plain bytes".format(packed / plain))
+
+    data = [protocol.pack_frame(protocol.CMD, b"PRINT_FLAVOR")]
+    for line in REPORT:
+        data.append(protocol.pack_frame(protocol.FLAVOR, line.encode(protocol.ENC)))
+    data.append(protocol.pack_frame(protocol.FLAVOR_END))
+    data = b"".join(data)
+
+    n = 5000
+    start = time.perf_counter()
+    for _ in range(n):
+        packed = protocol.pack_compressed(data)
+    compress_time = (time.perf_counter() - start) / n
+
+    payload = packed[protocol.HEADER.size:]
+    start = time.perf_counter()
+    for _ in range(n):
+        protocol.unpack_compressed(payload)
+    unpack_time = (time.perf_counter() - start) / n
+
+    print("\nround report of {} bytes: {} compressed, {:.1f}us to compress, {:.1f}us to unpack".format(
+        len(data), len(packed), compress_time * 1e6, unpack_time * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+""" Time the end of round report with the 10,000 line stress report that
+print_flavor_messages keeps commented out.
+
+The legacy run replays the old exchange: a size, then 4096 byte chunks of one
+pickled list with a MORE_DATA reply after each, while the client tries to
+unpickle everything received so far after every chunk. The streaming run
+sends one FLAVOR frame per line and a FLAVOR_END frame with no replies.
+
+    python benchmarks/bench_flavor.py [lines]
+"""
+
+import pickle
+import sys
+import threading
+import time
+
+from waving_hands import protocol
+
+from bench_protocol import loopback_pair
+
+
+def stress_report(lines):
+
+    report = []
+    for i in range(lines):
+        report.append("longlonglonglonglonglonglonglonglong " + str(i))
+    report.append("over!")
+
+    return report
+
+
+def legacy_server(sock, report):
+
+    flavor_p = report + ["\0"]
+    flavor_p = pickle.dumps(flavor_p)
+    size = len(flavor_p)
+
+    protocol.send_frame(sock, protocol.INT, protocol.encode_int(size))
+    protocol.recv_frame(sock)                   # SIZE_ACK
+
+    sent_size = 0
+    while sent_size < size:
+        chunk = flavor_p[sent_size:sent_size + 4096]
+        protocol.send_frame(sock, protocol.DATA, chunk)
+        sent_size += len(chunk)
+        protocol.recv_frame(sock)               # MORE_DATA or DATA_DONE
+
+
+def legacy_client(sock):
+
+    size = protocol.decode_int(protocol.recv_frame(sock).payload)
+    protocol.send_frame(sock, protocol.CMD, b"SIZE_ACK")
+
+    flavor_list = b""
+    while len(flavor_list) < size:
+        flavor_list += protocol.recv_frame(sock).payload
+        try:
+            if "\0" in pickle.loads(flavor_list):
+                break
+        except (pickle.UnpicklingError, EOFError):
+            pass
+        if len(flavor_list) < size:
+            protocol.send_frame(sock, protocol.CMD, b"MORE_DATA")
+
+    protocol.send_frame(sock, protocol.CMD, b"DATA_DONE")
+
+    # Nothing can be printed until the whole list has arrived.
+    lines = pickle.loads(flavor_list)
+    first = time.perf_counter()
+
+    return first, len(lines) - 1
+
+
+def streaming_server(sock, report):
+
+    frames = []
+    for line in report:
+        frames.append(protocol.pack_frame(protocol.FLAVOR, line.encode(protocol.ENC)))
+    frames.append(protocol.pack_frame(protocol.FLAVOR_END))
+
+    sock.sendall(b"".join(frames))
+
+
+def streaming_client(sock):
+
+    first = None
+    count = 0
+
+    while True:
+        frame = protocol.recv_frame(sock)
+        if frame.tag == protocol.FLAVOR_END:
+            break
+        frame.payload.decode(protocol.ENC)
+        if first is None:
+            first = time.perf_counter()
+        count += 1
+
+    return first, count
+
+
+def run(name, server_loop, client_loop, report):
+
+    server, client = loopback_pair(True)
+
+    worker = threading.Thread(target=server_loop, args=(server, report))
+
+    start = time.perf_counter()
+    worker.start()
+    first, count = client_loop(client)
+    end = time.perf_counter()
+
+    worker.join()
+    server.close()
+    client.close()
+
+    assert count == len(report)
+
+    print("{:<10} first line {:>9.2f}ms   whole report {:>9.2f}ms".format(
+        name, (first - start) * 1e3, (end - start) * 1e3))
+
+
+def main():
+
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    report = stress_report(lines)
+
+    print("End of round report of " + str(len(report)) + " lines over loopback\n")
+    run("legacy", legacy_server, legacy_client, report)
+    run("streaming", streaming_server, streaming_client, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+""" Time adding a gesture to a full hand history.
+
+The string run is the old Hand.add_gesture, which rebuilt the history one
+character at a time once it held MAX_HISTORY gestures. The packed run adds
+to a GestureHistory, and the last line times turning one into a string, as
+happens when it is shown or sent.
+
+    python benchmarks/bench_gesture_history.py [gestures]
+"""
+
+import random
+import sys
+import time
+
+from waving_hands.gesture_history import GestureHistory, MAX_HISTORY
+
+
+def string_add(history, gesture):
+
+    if len(history) == MAX_HISTORY:
+        new_history = []
+        for i in range(1, len(history)):
+            new_history.append(history[i])
+
+        new_history.append(gesture)
+        return "".join(new_history)
+
+    return history + gesture
+
+
+def main(count):
+
+    rng = random.Random(1)
+    gestures = [rng.choice("fpswdcFPSWDC$") for _ in range(count)]
+
+    start = time.perf_counter()
+    history = ""
+    for gesture in gestures:
+        history = string_add(history, gesture)
+    string_time = (time.perf_counter() - start) / count
+
+    start = time.perf_counter()
+    packed = GestureHistory()
+    for gesture in gestures:
+        packed.append(gesture)
+    packed_time = (time.perf_counter() - start) / count
+
+    assert packed == history
+
+    start = time.perf_counter()
+    for gesture in gestures:
+        packed.append(gesture)
+        str(packed)
+    render_time = (time.perf_counter() - start) / count - packed_time
+
+    print("string rebuild: {:.3f}us per gesture".format(string_time * 1e6))
+    print("packed append:  {:.3f}us per gesture ({:.1f}x)".format(packed_time * 1e6, string_time / packed_time))
+    print("to string:      {:.3f}us".format(render_time * 1e6))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
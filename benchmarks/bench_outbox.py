@@ -0,0 +1,99 @@
+""" How long a fast player waits for the round report while the other player
+reads slowly.
+
+The slow client takes 64 KB every 10ms. The blocking run sends the report to
+each client in turn with sendall, as the Gamemaster used to, so the fast
+client waits for the slow one whenever the slow one comes first. The outbox
+run queues the report for both and lets each socket drain at its own pace.
+The report is far larger than a real one, since loopback socket buffers
+swallow a few megabytes without blocking.
+
+    python benchmarks/bench_outbox.py [report KB]
+"""
+
+import sys
+import threading
+import time
+
+from waving_hands import protocol
+from waving_hands.gamemaster import Gamemaster
+
+from bench_protocol import loopback_pair
+
+
+def fast_reader(sock, size, done):
+
+    received = 0
+    while received < size:
+        received += len(sock.recv(1 << 20))
+    done.append(time.perf_counter())
+
+    protocol.send_frame(sock, protocol.CMD, b"NEXT_TURN_READY")
+
+
+def slow_reader(sock, size):
+
+    received = 0
+    while received < size:
+        received += len(sock.recv(65536))
+        time.sleep(0.01)
+
+
+def blocking_server(gm, clients, report):
+
+    for client in clients:
+        client.sendall(report)
+
+
+def outbox_server(gm, clients, report):
+
+    gm.stream_to_clients(report, clients)
+    gm.recv(clients[1])
+    gm.flush_outboxes(60)
+
+
+def run(name, server_loop, report):
+
+    gm = Gamemaster(high_water=len(report) * 2)
+    gm.create_wizards()
+
+    slow, slow_client = loopback_pair(True)
+    fast, fast_client = loopback_pair(True)
+    gm.wizards[0].client, gm.wizards[1].client = slow, fast
+
+    done = []
+    readers = [threading.Thread(target=slow_reader, args=(slow_client, len(report))),
+               threading.Thread(target=fast_reader, args=(fast_client, len(report), done))]
+
+    start = time.perf_counter()
+    for reader in readers:
+        reader.start()
+    server_loop(gm, [slow, fast], report)
+    for reader in readers:
+        reader.join()
+    end = time.perf_counter()
+
+    stats = gm.outbound_stats()
+
+    for sock in (slow, slow_client, fast, fast_client):
+        sock.close()
+
+    print("{:<9} fast player has the report after {:>8.1f}ms   slow player after {:>8.1f}ms".format(
+        name, (done[0] - start) * 1e3, (end - start) * 1e3))
+    if stats:
+        print("{:<9} slow outbox peak {} bytes, {} sends, {} would-block".format(
+            "", stats["Gandalf"]["peak"], stats["Gandalf"]["sends"], stats["Gandalf"]["would_block"]))
+
+
+def main():
+
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 12 * 1024 * 1024
+    report = protocol.pack_frame(protocol.FLAVOR, b"x" * size)
+
+    print("Round report of " + str(size // 1024) + " KB to one slow and one fast player\n")
+    run("blocking", blocking_server, report)
+    run("outbox", outbox_server, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+""" Compare the old ACK-driven exchange against the framed protocol over loopback.
+
+The exchange measured is the one a GET_TARGET request costs: the server sends
+a command and a pickled list of targets, the client answers with a name. The
+second run makes the client wait before every send to stand in for network
+latency, which is where dropping the ACK round trip pays off.
+
+    python benchmarks/bench_protocol.py [exchanges]
+"""
+
+import pickle
+import socket
+import statistics
+import sys
+import threading
+import time
+
+from waving_hands import protocol
+
+TARGETS = ["Nobody", "Alice", "Bob", "Grobleplop the Goblin", "Fire Elemental"]
+REPLY = "Grobleplop the Goblin"
+
+
+def loopback_pair(nodelay):
+
+    """ Return a connected (server side, client side) pair of TCP sockets. """
+
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    client = socket.socket()
+    client.connect(listener.getsockname())
+    server, addr = listener.accept()
+    listener.close()
+
+    if nodelay:
+        protocol.configure_socket(server)
+        protocol.configure_socket(client)
+
+    return server, client
+
+
+def legacy_client(sock, count, delay):
+
+    for _ in range(count):
+        sock.recv(1024)                         # GET_TARGET
+        time.sleep(delay)
+        sock.send(b"GET_TARGET_ACK")
+        pickle.loads(sock.recv(1024))           # targets
+        time.sleep(delay)
+        sock.send(REPLY.encode("utf-8"))
+
+
+def legacy_exchange(sock, data_p):
+
+    sock.send(b"GET_TARGET")
+    sock.recv(1024)                             # GET_TARGET_ACK
+    sock.send(data_p)
+    return sock.recv(1024).decode("utf-8")
+
+
+def framed_client(sock, count, delay):
+
+    for _ in range(count):
+        protocol.recv_frame(sock)               # GET_TARGET
+        pickle.loads(protocol.recv_frame(sock).payload)
+        time.sleep(delay)
+        protocol.send_frame(sock, protocol.TEXT, REPLY.encode("utf-8"))
+
+
+def framed_exchange(sock, data_p):
+
+    protocol.send_frame(sock, protocol.CMD, b"GET_TARGET")
+    protocol.send_frame(sock, protocol.DATA, data_p)
+    return protocol.recv_frame(sock).payload.decode("utf-8")
+
+
+def run(name, exchange, client_loop, nodelay, count, delay=0):
+
+    server, client = loopback_pair(nodelay)
+    data_p = pickle.dumps([TARGETS, "stab"])
+
+    worker = threading.Thread(target=client_loop, args=(client, count, delay))
+    worker.start()
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t0 = time.perf_counter()
+        assert exchange(server, data_p) == REPLY
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    worker.join()
+    server.close()
+    client.close()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+
+    print("{:<8} {:>10.0f} exchanges/s   mean {:>7.1f}us   p50 {:>7.1f}us   p99 {:>7.1f}us".format(
+        name, count / elapsed, statistics.mean(latencies) * 1e6, p50, p99))
+
+
+def main():
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    print("GET_TARGET exchange over loopback, " + str(count) + " exchanges\n")
+    run("legacy", legacy_exchange, legacy_client, False, count)
+    run("framed", framed_exchange, framed_client, True, count)
+
+    count = max(count // 25, 1)
+    delay = 0.001
+
+    print("\nWith 1ms of client latency per send, " + str(count) + " exchanges\n")
+    run("legacy", legacy_exchange, legacy_client, False, count, delay)
+    run("framed", framed_exchange, framed_client, True, count, delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+""" How long the Gamemaster takes over a turn, measured by replaying a
+captured match with no pauses for the players.
+
+A match between two ScriptedClients is recorded once, then replayed over
+and over. Every replay is checked against the capture, so a change that
+alters what the server sends shows up here as a failure rather than as a
+timing.
+
+    python benchmarks/bench_replay.py [turns] [replays]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+
+from waving_hands.headless import play_match
+from waving_hands.replay import Replay
+from waving_hands.scripted_client import ScriptedClient
+
+
+def main():
+
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    replays = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "match.whcap")
+
+        bots = [ScriptedClient(name="Alice", surrender_after=turns),
+                ScriptedClient(name="Bob", surrender_after=turns + 1)]
+        play_match(bots, seed=1, capture=path)
+
+        print("Capture of " + str(os.path.getsize(path)) + " bytes\n")
+
+        turn_times = []
+        for n in range(replays):
+            replay = Replay(path)
+            if not replay.run():
+                print("Replay " + str(n) + " differs from the capture:")
+                for message in replay.mismatches:
+                    print("  " + message)
+                return 1
+            turn_times.extend(replay.turn_times)
+            print("replay {:>3}: {} turns, {} frames in {:.1f}ms".format(
+                n, replay.turns, replay.frames, replay.elapsed * 1e3))
+
+    turn_times.sort()
+    print("\nturn latency: median {:.3f}ms   p95 {:.3f}ms   max {:.3f}ms".format(
+        statistics.median(turn_times) * 1e3,
+        turn_times[int(len(turn_times) * 0.95)] * 1e3,
+        turn_times[-1] * 1e3))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+""" How much a crowd of spectators slows down the duel they watch.
+
+A match between two ScriptedClients is played with no spectators, then with
+more and more. One spectator reads every round; the rest never read at all,
+so their socket buffers fill and they end up dropped, as a crowd of slow
+connections would be.
+
+    python benchmarks/bench_spectators.py [turns]
+"""
+
+import sys
+import threading
+import time
+
+from waving_hands import protocol
+from waving_hands.gamemaster import Gamemaster
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.spectator_client import SpectatorClient
+from waving_hands.transport import InProcessTransport
+
+
+def play(turns, idle):
+
+    transport = InProcessTransport()
+    game = Gamemaster(players=2, transport=transport, pregame=False, customize_wizards=False)
+
+    watcher = SpectatorClient(transport=transport, output=lambda line: None)
+    watcher.connect()
+    crowd = [transport.connect() for _ in range(idle)]
+
+    threads = [threading.Thread(target=watcher.watch)]
+    bots = [ScriptedClient(name="Alice", gestures=("p", "s"), surrender_after=turns, transport=transport),
+            ScriptedClient(name="Bob", gestures=("s", "d"), surrender_after=turns + 1, transport=transport)]
+
+    for bot in bots:
+        bot.connect()
+        threads.append(threading.Thread(target=bot.play))
+
+    for sock in crowd:
+        protocol.send_frame(sock, protocol.HELLO, protocol.pack_hello(spectate=""))
+
+    for thread in threads:
+        thread.start()
+
+    start = time.perf_counter()
+    try:
+        game.setup_game()
+        game.play_game()
+    finally:
+        game.close_connections()
+    elapsed = time.perf_counter() - start
+
+    for thread in threads:
+        thread.join()
+    for sock in crowd:
+        sock.close()
+    transport.close()
+
+    return elapsed, watcher.rounds, game.spectators.stats()
+
+
+def main():
+
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    for idle in (0, 10, 100, 400):
+        elapsed, rounds, stats = play(turns, idle)
+        print("{:>4} idle spectators: {:>7.3f}ms per round, reader saw {} rounds, {} joined, {} dropped".format(
+            idle, elapsed / (turns + 1) * 1e3, rounds, stats["joined"], stats["dropped"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+""" Time finding the spells completed by many hand histories at once.
+
+The batch run encodes the histories into a code matrix once, then finds
+every history's spells, as made and as a hasted wizard's first gestures,
+with two calls to BatchMatcher.completions. It is timed against the loop
+determine_spellcasts used to make for each hand, and against the
+SpellMatcher that replaced it. The nested loop is only run over the first
+10,000 histories; its time for more is scaled up from those.
+
+Needs NumPy.
+
+    python benchmarks/bench_spell_batch.py [histories ...]
+"""
+
+import random
+import sys
+import time
+
+from waving_hands import spellbook
+from waving_hands.config import DATA
+from waving_hands.spell_batch import BatchMatcher, encode_histories
+
+from bench_spell_matching import HISTORY_GESTURES, nested_loop
+
+LOOP_SAMPLE = 10000
+
+
+def timed(work):
+
+    start = time.perf_counter()
+    result = work()
+
+    return time.perf_counter() - start, result
+
+
+def main(counts):
+
+    book = spellbook.load(DATA["spellbook"])
+    spells = book.spell_list
+    batch = BatchMatcher(spells)
+
+    rng = random.Random(1)
+
+    for count in counts:
+        histories = ["".join(rng.choice(HISTORY_GESTURES) for _ in range(8)) for _ in range(count)]
+        sample = histories[:LOOP_SAMPLE]
+
+        encode_time, codes = timed(lambda histories=histories: encode_histories(histories))
+        batch_time, (found, hasted) = timed(lambda codes=codes: (batch.completions(codes), batch.completions(codes, hasted=True)))
+
+        loop_time, loop_found = timed(lambda sample=sample: [(nested_loop(spells, history), nested_loop(spells, history[:-1]))
+                                                             for history in sample])
+        loop_time *= count / len(sample)
+
+        matcher_time, _ = timed(lambda histories=histories: [(book.matcher.matches(history), book.matcher.matches(history[:-1]))
+                                                             for history in histories])
+
+        for row, (made, first) in enumerate(loop_found):
+            assert made == [spell for spell, hit in zip(spells, found[row]) if hit]
+            assert first == [spell for spell, hit in zip(spells, hasted[row]) if hit]
+
+        print("{:>9,} histories: nested loop {:8.2f}s{}, matcher {:7.2f}s, batch {:6.3f}s + {:.3f}s to encode ({:.0f}x the loop)".format(
+            count, loop_time, "*" if count > len(sample) else " ", matcher_time,
+            batch_time, encode_time, loop_time / (batch_time + encode_time)))
+
+    print("* scaled up from the first " + format(LOOP_SAMPLE, ",") + " histories")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 1000000])
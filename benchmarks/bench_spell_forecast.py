@@ -0,0 +1,68 @@
+""" Time forecasting how close a hand is to every spell.
+
+The check it is compared with tries, for each spell, finishing it with one
+more gesture, then two, and so on, running the nested loop determine_spellcasts
+used over each try. The forecast is timed from a history, which looks up the
+history's state, and from a hand's state, which is what a bot or the client
+already has. Each is run over the same random histories of up to eight
+gestures, with the real spellbook.
+
+    python benchmarks/bench_spell_forecast.py [histories]
+"""
+
+import random
+import sys
+import time
+
+from bench_spell_matching import HISTORY_GESTURES, nested_loop
+
+from waving_hands.config import DATA
+from waving_hands import spellbook
+
+
+def enumerated(spell_list, history):
+
+    forecast = []
+
+    for spell in spell_list:
+        for count in range(1, len(spell.gesture) + 1):
+            if spell in nested_loop(spell_list, history + spell.gesture[-count:]):
+                forecast.append((spell, count, spell.gesture[-count:]))
+                break
+
+    return forecast
+
+
+def time_per_history(forecast, histories):
+
+    start = time.perf_counter()
+    for history in histories:
+        forecast(history)
+
+    return (time.perf_counter() - start) / len(histories)
+
+
+def main(count):
+
+    rng = random.Random(1)
+    histories = ["".join(rng.choice(HISTORY_GESTURES) for _ in range(rng.randint(0, 8))) for _ in range(count)]
+
+    book = spellbook.load(DATA["spellbook"])
+    states = {history: book.matcher.state_after(history) for history in histories}
+
+    # The enumeration is slow enough that a sample of the histories will do.
+    sample = histories[:max(1, count // 100)]
+    for history in sample:
+        assert sorted(enumerated(book.spell_list, history), key=lambda entry: entry[0].name) == sorted(
+            map(tuple, book.forecast(history)), key=lambda entry: entry[0].name)
+
+    enumerated_time = time_per_history(lambda history: enumerated(book.spell_list, history), sample)
+    history_time = time_per_history(book.forecast, histories)
+    state_time = time_per_history(lambda history: book.forecast(states[history], 3), histories)
+
+    print("{} spells: enumerated {:8.1f}us, from a history {:5.2f}us, from a state within 3 {:5.2f}us per history ({:.0f}x)".format(
+        len(book.spell_list), enumerated_time * 1e6, history_time * 1e6, state_time * 1e6, enumerated_time / state_time))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,91 @@
+""" Time finding the spells a hand's history completes.
+
+The nested loop is the check determine_spellcasts made for every spell in
+the spellbook. The matcher is timed twice: working out a history's state
+from scratch, and moving a hand's state on by the latest gesture, which is
+what a Hand does. All three are run over the same random eight gesture
+histories, once with the real spellbook and once with it padded out to ten
+times as many spells of random gestures.
+
+    python benchmarks/bench_spell_matching.py [histories]
+"""
+
+import random
+import sys
+import time
+
+from waving_hands.config import DATA
+from waving_hands.spell import Spell
+from waving_hands.spell_matcher import SpellMatcher
+from waving_hands import spellbook
+
+HISTORY_GESTURES = "fpswdcFPSWDC$-"
+
+
+def nested_loop(spell_list, hand_history):
+
+    found = []
+
+    for spell in spell_list:
+        if len(spell.gesture) <= len(hand_history):
+            spell_slice = hand_history[-len(spell.gesture):]
+            for i in range(0, len(spell_slice)):
+                if spell.gesture[i] != "C":
+                    if spell_slice[i].lower() == spell.gesture[i].lower():
+                        if spell_slice[i] != spell.gesture[i]:
+                            if spell_slice[i].lower() == spell.gesture[i]:
+                                spell_slice = spell_slice.replace(spell_slice[i], spell_slice[i].lower(), 1)
+
+            if spell_slice == spell.gesture:
+                found.append(spell)
+
+    return found
+
+
+def padded(spell_list, times, rng):
+
+    spells = list(spell_list)
+
+    while len(spells) < len(spell_list) * times:
+        gesture = "".join(rng.choice("fpswd") for _ in range(rng.randint(3, 8)))
+        spells.append(Spell("Padding " + str(len(spells)), gesture, "", "null"))
+
+    return spells
+
+
+def time_per_history(match, histories):
+
+    start = time.perf_counter()
+    found = 0
+    for history in histories:
+        found += len(match(history))
+
+    return (time.perf_counter() - start) / len(histories), found
+
+
+def main(count):
+
+    rng = random.Random(1)
+    histories = ["".join(rng.choice(HISTORY_GESTURES) for _ in range(8)) for _ in range(count)]
+
+    spell_list = spellbook.load(DATA["spellbook"]).spell_list
+
+    for spells in (spell_list, padded(spell_list, 10, rng)):
+        matcher = SpellMatcher(spells)
+
+        # The state of each history but its latest gesture, as a Hand would
+        # already have it.
+        before = {history: matcher.state_after(history[:-1]) for history in histories}
+
+        loop_time, loop_found = time_per_history(lambda history, spells=spells: nested_loop(spells, history), histories)
+        scratch_time, scratch_found = time_per_history(matcher.matches, histories)
+        step_time, step_found = time_per_history(lambda history, before=before: before[history].next(history[-1]).completed, histories)
+
+        assert loop_found == scratch_found == step_found
+
+        print("{:>4} spells: nested loop {:7.2f}us, from scratch {:5.2f}us, one gesture {:5.2f}us per history ({:.0f}x), {} spells found".format(
+            len(spells), loop_time * 1e6, scratch_time * 1e6, step_time * 1e6, loop_time / step_time, step_found))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
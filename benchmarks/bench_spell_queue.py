@@ -0,0 +1,80 @@
+""" Time resolving a turn's spells one name at a time.
+
+This is what Gamemaster.cycle_spell_list and the Raise Dead loop do: while a
+spell of the name is queued, find the first, then check the enchantments on
+its target and remove it, as resolve_spell does. The list is the scanning
+the Gamemaster did before the SpellQueue; both resolve the same spells, cast
+by a few wizards at each other, in the same order.
+
+    python benchmarks/bench_spell_queue.py [spells...]
+"""
+
+import random
+import sys
+import time
+
+from waving_hands.spell import Spell
+from waving_hands.spell_queue import SpellQueue
+
+NAMES = ("Raise Dead", "Amnesia", "Shield", "Paralysis")
+
+
+class Caster:
+
+    def __init__(self, name):
+        self.name = name
+
+
+def resolve_list(spell_targets, order):
+
+    resolved = []
+
+    for name in order:
+        while any(spell_tuple[2].name == name for spell_tuple in spell_targets):
+            spell_tuple = next(spell_tuple for spell_tuple in spell_targets if spell_tuple[2].name == name)
+            warped = any(other[1] == spell_tuple[1] and other[2].name != name for other in spell_targets)
+            resolved.append((spell_tuple, warped))
+            spell_targets.remove(spell_tuple)
+
+    return resolved
+
+
+def resolve_queue(spell_targets, order):
+
+    resolved = []
+
+    for name in order:
+        while spell_targets.contains_spell(name):
+            spell_tuple = spell_targets.first(name)
+            warped = any(other[2].name != name for other in spell_targets.targeting(spell_tuple[1]))
+            resolved.append((spell_tuple, warped))
+            spell_targets.remove(spell_tuple)
+
+    return resolved
+
+
+def main(counts):
+
+    rng = random.Random(1)
+    wizards = [Caster("Wizard " + str(i)) for i in range(4)]
+    spells = [Spell(name, "p", "", "null") for name in NAMES]
+
+    for count in counts:
+        cast = [(rng.choice(wizards), rng.choice(wizards), rng.choice(spells)) for _ in range(count)]
+
+        start = time.perf_counter()
+        by_list = resolve_list(list(cast), NAMES)
+        list_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        by_queue = resolve_queue(SpellQueue(cast), NAMES)
+        queue_time = time.perf_counter() - start
+
+        assert by_list == by_queue
+
+        print("{:>6} spells: list {:9.2f}ms, queue {:7.2f}ms ({:.0f}x)".format(
+            count, list_time * 1e3, queue_time * 1e3, list_time / queue_time))
+
+
+if __name__ == "__main__":
+    main([int(count) for count in sys.argv[1:]] or [10, 100, 1000, 5000])
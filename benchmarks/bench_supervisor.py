@@ -0,0 +1,105 @@
+""" Matches per second through the supervisor for a growing number of workers.
+
+Every match is played by two ScriptedClients that make a few turns of
+gestures and then surrender. The clients run in their own pool of processes
+so that they are not what limits the server.
+
+    python benchmarks/bench_supervisor.py [matches] [max workers]
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.supervisor import Supervisor
+
+
+def play_matches(port, count):
+
+    """ Play count matches one after another from a client process. """
+
+    for i in range(count):
+        bots = [ScriptedClient(host="127.0.0.1", port=port, name="A" + str(i)),
+                ScriptedClient(host="127.0.0.1", port=port, name="B" + str(i), surrender_after=4)]
+        for bot in bots:
+            bot.connect()
+        threads = [threading.Thread(target=bot.play) for bot in bots]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+def free_port():
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    return port
+
+
+def run(workers, matches):
+
+    port = free_port()
+    supervisor = Supervisor(host="127.0.0.1", port=port, pregame=False,
+                            customize_wizards=False, workers=workers, quiet=True)
+    supervisor.start_workers()
+    supervisor.open_socket()
+
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+
+    serving = threading.Thread(target=supervisor.serve, args=(matches,))
+    serving.start()
+
+    client_procs = max(workers * 2, 2)
+    per_proc = [matches // client_procs] * client_procs
+    for i in range(matches % client_procs):
+        per_proc[i] += 1
+
+    start = time.perf_counter()
+    procs = [multiprocessing.Process(target=play_matches, args=(port, count)) for count in per_proc]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    serving.join()
+    sys.stdout = stdout
+    devnull.close()
+
+    # A worker counts a match as finished just after its players leave.
+    for _ in range(100):
+        finished = sum(entry["finished"] for entry in supervisor.load())
+        if finished == matches:
+            break
+        time.sleep(0.01)
+    spread = ", ".join(str(entry["finished"]) for entry in supervisor.load())
+    supervisor.stop_workers()
+
+    print("{:>2} workers: {:>7.1f} matches/s   ({} finished, per worker: {})".format(
+        workers, matches / elapsed, finished, spread))
+
+
+def main():
+
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    print(str(matches) + " matches on " + str(os.cpu_count()) + " cores\n")
+
+    workers = 1
+    while workers <= max_workers:
+        run(workers, matches)
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+""" Headless matches per second over each transport.
+
+Every match is played by two ScriptedClients in this process with
+headless.play_match. The TCP run binds a fresh loopback port for each match,
+the in-process run binds nothing.
+
+    python benchmarks/bench_transport.py [matches]
+"""
+
+import os
+import sys
+import time
+
+from waving_hands.headless import play_match
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.transport import InProcessTransport, TcpTransport
+
+
+def run(name, make_transport, matches):
+
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+
+    start = time.perf_counter()
+    for i in range(matches):
+        bots = [ScriptedClient(name="A" + str(i)), ScriptedClient(name="B" + str(i), surrender_after=4)]
+        play_match(bots, make_transport())
+    elapsed = time.perf_counter() - start
+
+    sys.stdout = stdout
+    devnull.close()
+
+    print("{:<11} {:>7.1f} matches/s   {:>7.2f}ms per match".format(name, matches / elapsed, elapsed / matches * 1e3))
+
+
+def main():
+
+    matches = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print(str(matches) + " matches of three to five turns\n")
+    run("tcp", lambda: TcpTransport("127.0.0.1", 0), matches)
+    run("in-process", InProcessTransport, matches)
+
+
+if __name__ == "__main__":
+    main()
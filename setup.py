@@ -25,6 +25,10 @@ setuptools.setup(
     url="https://github.com/alanb33/WavingHands",
     packages=setuptools.find_packages(),
     include_package_data=True,
+    extras_require={
+        # Batch spell detection for simulations, see waving_hands/spell_batch.py
+        "batch": ["numpy"],
+    },
     entry_points={
         "console_scripts": ["waving-hands = waving_hands.waving_hands:main",],
     },
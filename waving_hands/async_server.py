@@ -0,0 +1,261 @@
+# One process serving many matches at once.
+#
+# The event loop accepts every connection, reads its HELLO and groups players
+# into matches without a thread per connection. The matches themselves are
+# not coroutines: each is played by an ordinary blocking Gamemaster in a
+# thread from a pool of max_matches threads, and the loop only waits for it
+# to end. This is on purpose. The Gamemaster is thousands of lines of code
+# that waits on its clients all through the turn, and making every one of
+# those waits a coroutine would mean rewriting it; a thread lets it run as
+# it is, and a dead client still ends only its own match.
+#
+# The price is one OS thread per match being played. Each thread has its
+# own stack (8MB of address space by default on Linux, of which only the
+# pages used are resident) and is scheduled by the OS, so the 256 matches
+# allowed at once by default cost 256 threads. Once max_matches are being
+# played, further matches wait for a thread to come free; raise max_matches
+# to allow more, at the same cost per match.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import socket
+
+from waving_hands import capture
+from waving_hands import codec
+from waving_hands import protocol
+from waving_hands.gamemaster import ConnectionLost, Gamemaster, resume_session, spectate_session
+
+log = logging.getLogger(__name__)
+
+
+class AsyncMatchServer:
+
+    """ Accept players on a single port and run every match in one process.
+
+    The event loop owns the listening socket and pairs players as they
+    connect. Each pair is handed to a Gamemaster running in session mode, in
+    a thread of its own, so a client that dies ends only its own match. At
+    most max_matches are played at once. A client that reconnects with a
+    resume token goes back to the match it came from.
+    """
+
+    def __init__(self,
+        host: str = "localhost",
+        port: int = 12345,
+        pregame: bool = True,
+        customize_wizards: bool = True,
+        players: int = 2,
+        max_matches: int = 256,
+        deadlines: dict = None,
+        resume_window: float = 60,
+        capture_dir: str = None):
+        """
+        :param host: IP address or host to serve the game, defaults to localhost
+        :param port: Port to use for the server
+        :param pregame: Start each game with pre-game flair? Defaults to True
+        :param customize_wizards: Allow players to customize their wizards? Defaults to True
+        :param players: Number of players in each match. Defaults to 2
+        :param max_matches: Number of matches that can be played at once, one thread each
+        :param deadlines: {phase:seconds} for the Gamemaster of each match
+        :param resume_window: Seconds a dropped player has to reconnect
+        :param capture_dir: Directory to record a capture of every match to
+        """
+
+        self._HOST = host
+        self._PORT = port
+
+        self.pregame = pregame
+        self.customize_wizards = customize_wizards
+
+        self._NUMBER_OF_WIZARDS = players
+        self._MAX_MATCHES = max_matches
+        self._HELLO_TIMEOUT = 10
+
+        self.deadlines = deadlines
+        self.resume_window = resume_window
+        self.capture_dir = capture_dir
+
+        self._server = None
+        self._waiting = []
+        self._matches = set()
+        self._finished = 0
+        self._admitting = set()
+
+    @property
+    def server(self):
+        return self._server
+
+    @server.setter
+    def server(self, sock):
+        self._server = sock
+
+    @property
+    def active_matches(self):
+        return len(self._matches)
+
+    @property
+    def finished_matches(self):
+        return self._finished
+
+    def open_socket(self):
+
+        """ Open the listening socket. """
+
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self._HOST, self._PORT))
+        self.server.listen(128)
+        self.server.setblocking(False)
+
+        log.info("Serving matches on " + str(self.server.getsockname()))
+
+    async def serve(self):
+
+        """ Accept players forever, starting a match for every full group. """
+
+        loop = asyncio.get_running_loop()
+
+        # The Gamemaster is blocking code, so each match needs its own thread.
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self._MAX_MATCHES))
+
+        if not self.server:
+            self.open_socket()
+
+        try:
+            while True:
+                client, addr = await loop.sock_accept(self.server)
+                print("Connection accepted from " + str(addr))
+
+                admission = asyncio.ensure_future(self.admit(client))
+                self._admitting.add(admission)
+                admission.add_done_callback(self._admitting.discard)
+        finally:
+            self.server.close()
+
+    async def admit(self, client):
+
+        """ Read the HELLO of a new connection, then either queue it as a new
+        player, hand it back to the match it is resuming, or let it watch
+        the match it asks for. """
+
+        loop = asyncio.get_running_loop()
+
+        hello = await protocol.async_recv_hello(loop, client, self._HELLO_TIMEOUT)
+
+        if hello is None:
+            print("Dropped a connection that did not say hello.")
+            client.close()
+        elif hello.get("resume"):
+            client.setblocking(True)
+            if not resume_session(client, hello):
+                print("Turned away a resume for a match that has ended.")
+                client.close()
+        elif hello.get("spectate") is not None:
+            try:
+                await protocol.async_answer_hello(loop, client, hello)
+            except OSError:
+                client.close()
+                return
+            if not spectate_session(client, hello):
+                print("Turned away a spectator, there is no such match.")
+                client.close()
+        else:
+            try:
+                await protocol.async_answer_hello(loop, client, hello)
+            except OSError:
+                client.close()
+                return
+            self.add_player(client)
+
+    def add_player(self, client):
+
+        """ Queue a newly connected player, starting a match once enough
+        players are waiting. """
+
+        # The Gamemaster expects ordinary blocking sockets.
+        client.setblocking(True)
+        protocol.configure_socket(client)
+
+        self._waiting.append(client)
+
+        if len(self._waiting) >= self._NUMBER_OF_WIZARDS:
+            # Never start a match against someone who has already gone.
+            self.drop_dead_waiters()
+
+        if len(self._waiting) >= self._NUMBER_OF_WIZARDS:
+            clients = self._waiting[:self._NUMBER_OF_WIZARDS]
+            self._waiting = self._waiting[self._NUMBER_OF_WIZARDS:]
+
+            match = asyncio.ensure_future(self.run_match(clients))
+            self._matches.add(match)
+            match.add_done_callback(self.match_done)
+
+    def drop_dead_waiters(self):
+
+        for client in list(self._waiting):
+            if not protocol.client_alive(client):
+                self._waiting.remove(client)
+                client.close()
+                print("A waiting player hung up.")
+
+    def match_done(self, match):
+
+        self._matches.discard(match)
+        self._finished += 1
+
+    async def run_match(self, clients):
+
+        """ Play one match to completion without blocking the event loop. """
+
+        game = Gamemaster(
+            pregame=self.pregame,
+            customize_wizards=self.customize_wizards,
+            players=self._NUMBER_OF_WIZARDS,
+            clients=clients,
+            deadlines=self.deadlines,
+            resume_window=self.resume_window,
+            capture=capture.match_path(self.capture_dir) if self.capture_dir else None,
+        )
+
+        loop = asyncio.get_running_loop()
+
+        await loop.run_in_executor(None, play_session, game)
+
+
+def play_session(game):
+
+    """ Play a Gamemaster session, making sure its sockets are closed however
+    the match ends. """
+
+    try:
+        game.setup_game()
+        game.play_game()
+    except ConnectionLost as e:
+        log.info("Match ended early: " + str(e))
+    except (protocol.ProtocolError, codec.CodecError) as e:
+        log.info("Match ended by a malformed message: " + str(e))
+    except OSError as e:
+        log.info("Match ended by a socket error: " + str(e))
+    finally:
+        game.close_connections()
+
+
+def main(host, port, pregame=True, customize_wizards=True, players=2, deadlines=None, resume_window=60,
+         capture_dir=None):
+
+    server = AsyncMatchServer(
+        host=host,
+        port=port,
+        pregame=pregame,
+        customize_wizards=customize_wizards,
+        players=players,
+        deadlines=deadlines,
+        resume_window=resume_window,
+        capture_dir=capture_dir,
+    )
+
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("Server shut down.")
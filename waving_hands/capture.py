@@ -0,0 +1,180 @@
+# Capture files: every frame a Gamemaster exchanged with its clients, in the
+# order it happened, for replaying a match later (see replay.py).
+#
+# A capture starts with a header:
+#
+#   MAGIC  varint length  settings
+#
+# where settings is a codec encoded dict holding the capture version, the
+# seed of the match, the number of players and the Gamemaster options that
+# change what is sent. Then comes one record per frame, appended as the
+# match goes:
+#
+#   direction (1)  varint connection  varint microseconds  varint length  frame
+#
+# The direction is IN for frames from a client and OUT for frames to it. A
+# connection is numbered by the order the Gamemaster first dealt with it,
+# which is also the order its wizard was seated in. The time is counted from
+# the previous record, so it stays small. Heartbeats are left out, since they
+# say nothing about the match.
+
+from collections import namedtuple
+import itertools
+import os
+import time
+
+from waving_hands import codec
+from waving_hands import protocol
+
+MAGIC = b"WHCAP"
+VERSION = 1
+
+IN = 0
+OUT = 1
+
+Record = namedtuple("Record", ["direction", "connection", "time", "frame"])
+
+_captures = itertools.count(1)
+
+
+class CaptureError(ValueError):
+
+    """ Raised for a file that is not a capture, or is cut short. """
+
+    pass
+
+
+def match_path(directory):
+
+    """ Return a capture file name in directory that no other match in any
+    process will use. """
+
+    name = "match-{0}-{1}-{2}.whcap".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid(), next(_captures))
+
+    return os.path.join(directory, name)
+
+
+class Recorder:
+
+    """ Appends the frames of one match to a capture file. """
+
+    def __init__(self, path, settings):
+        """
+        :param path: File to write; it is created or replaced
+        :param settings: Match settings stored in the header, see replay.py
+        """
+
+        self._file = open(path, "wb")
+        self._path = path
+
+        self._connections = {}
+        self._last = time.monotonic()
+
+        header = dict(settings)
+        header["version"] = VERSION
+        header["started"] = int(time.time())
+        header = codec.encode(header)
+
+        out = bytearray(MAGIC)
+        codec.write_varint(out, len(header))
+        out += header
+        self._file.write(out)
+
+    @property
+    def path(self):
+        return self._path
+
+    def connection(self, sock):
+
+        """ Return the number of a connection, numbering it if it is new. """
+
+        number = self._connections.get(sock)
+
+        if number is None:
+            number = len(self._connections)
+            self._connections[sock] = number
+
+        return number
+
+    def record_in(self, sock, frame):
+
+        if frame.tag == protocol.HEARTBEAT:
+            return
+
+        self.write(IN, sock, protocol.pack_frame(frame.tag, frame.payload))
+
+    def record_out(self, sock, data):
+
+        """ Record bytes sent to a client, one record per frame in them. """
+
+        for tag, payload in protocol.split_frames(data):
+            self.write(OUT, sock, protocol.pack_frame(tag, payload))
+
+    def write(self, direction, sock, frame):
+
+        if self._file is None:
+            return
+
+        now = time.monotonic()
+        elapsed = int((now - self._last) * 1e6)
+        self._last = now
+
+        out = bytearray((direction,))
+        codec.write_varint(out, self.connection(sock))
+        codec.write_varint(out, elapsed)
+        codec.write_varint(out, len(frame))
+        out += frame
+
+        self._file.write(out)
+
+    def close(self):
+
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def read_capture(path):
+
+    """ Return (settings, [Record, ...]) from a capture file. Record times
+    are in seconds from the start of the match. """
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(MAGIC):
+        raise CaptureError(path + " is not a capture file.")
+
+    try:
+        size, pos = codec.read_varint(data, len(MAGIC))
+        settings = codec.decode(data[pos:pos + size])
+    except codec.CodecError as e:
+        raise CaptureError(path + " has a damaged header: " + str(e))
+    pos += size
+
+    if settings.get("version") != VERSION:
+        raise CaptureError(path + " is capture version " + str(settings.get("version")) + ".")
+
+    records = []
+    now = 0
+
+    while pos < len(data):
+        try:
+            direction = data[pos]
+            connection, pos = codec.read_varint(data, pos + 1)
+            elapsed, pos = codec.read_varint(data, pos)
+            size, pos = codec.read_varint(data, pos)
+        except codec.CodecError:
+            raise CaptureError(path + " ends in the middle of a record.")
+
+        if pos + size > len(data):
+            raise CaptureError(path + " ends in the middle of a record.")
+
+        tag, length = protocol.HEADER.unpack_from(data, pos)
+        frame = protocol.Frame(tag, data[pos + protocol.HEADER.size:pos + size])
+        pos += size
+
+        now += elapsed / 1e6
+        records.append(Record(direction, connection, now, frame))
+
+    return settings, records
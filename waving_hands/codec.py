@@ -0,0 +1,354 @@
+# A compact binary encoding for everything the Gamemaster and the client
+# exchange in DATA and STATUS frames.
+#
+# Unlike pickle, only a fixed set of types can be encoded, and decoding never
+# creates anything but those types, so a hostile peer cannot run code by
+# sending a crafted payload.
+#
+# Every value starts with a one byte type code:
+#
+#   N               None
+#   T / F           True / False
+#   I varint        int, zigzag encoded so small negative numbers stay small
+#   S varint bytes  str, utf-8
+#   L varint items  list (tuples are sent as lists)
+#   A varint bytes  non-empty list made up only of strings with no NUL in
+#                   them, sent as one utf-8 string joined by NULs
+#   D varint pairs  dict, each pair is a key followed by its value
+#   R fields        TargetableClient record, see encode_record
+#
+# A varint is an unsigned int sent seven bits at a time, low bits first, with
+# the high bit of each byte set while more bytes follow.
+#
+# This is pure Python, so it cannot match pickle's C code for time, only
+# for size and safety. What makes it as quick as it is: each value's type
+# is looked up in one dict rather than tried in turn, and a list of strings,
+# the commonest thing sent, is encoded and decoded with one join or split.
+
+from waving_hands.targetable_client import TargetableClient
+
+ENC = "utf-8"
+
+NONE  = ord("N")
+TRUE  = ord("T")
+FALSE = ord("F")
+INT   = ord("I")
+STR   = ord("S")
+LIST  = ord("L")
+DICT  = ord("D")
+RECORD = ord("R")
+STR_LIST = ord("A")
+
+# No message nests this deep. The limit keeps a hostile payload from
+# exhausting the stack.
+MAX_DEPTH = 32
+
+
+class CodecError(ValueError):
+
+    """ Raised for values that cannot be encoded and payloads that cannot be
+    decoded. """
+
+    pass
+
+
+def write_varint(out, value):
+
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+
+    out.append(value)
+
+
+def read_varint(data, pos):
+
+    """ Return (value, position after the varint). """
+
+    value = 0
+    shift = 0
+
+    while True:
+        if pos >= len(data):
+            raise CodecError("Payload ends in the middle of a number.")
+
+        byte = data[pos]
+        pos += 1
+
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+
+        shift += 7
+
+
+def zigzag(value):
+
+    """ Map ints onto unsigned ints so that small negatives stay small. """
+
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def unzigzag(raw):
+
+    return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1)
+
+
+def encode_str(out, value):
+
+    raw = value.encode(ENC)
+    size = len(raw)
+
+    if size < 0x80:
+        out.append(size)
+    else:
+        write_varint(out, size)
+
+    out += raw
+
+
+def encode_none(out, value):
+    out.append(NONE)
+
+
+def encode_bool(out, value):
+    out.append(TRUE if value else FALSE)
+
+
+def encode_int(out, value):
+    out.append(INT)
+    write_varint(out, zigzag(value))
+
+
+def encode_string(out, value):
+    out.append(STR)
+    encode_str(out, value)
+
+
+def encode_list(out, value):
+
+    if value and all(type(item) is str for item in value):
+        joined = "\0".join(value)
+        # A NUL in one of the strings would split it in two.
+        if joined.count("\0") == len(value) - 1:
+            out.append(STR_LIST)
+            encode_str(out, joined)
+            return
+
+    out.append(LIST)
+    write_varint(out, len(value))
+    for item in value:
+        encode_value(out, item)
+
+
+def encode_dict(out, value):
+
+    out.append(DICT)
+    write_varint(out, len(value))
+    for key, item in value.items():
+        encode_value(out, key)
+        encode_value(out, item)
+
+
+def encode_targetable(out, value):
+    out.append(RECORD)
+    encode_record(out, value)
+
+
+# type: the function that encodes a value of exactly that type
+ENCODERS = {
+    type(None):encode_none,
+    bool:encode_bool,
+    int:encode_int,
+    str:encode_string,
+    list:encode_list,
+    tuple:encode_list,
+    dict:encode_dict,
+    TargetableClient:encode_targetable,
+}
+
+
+def encode_value(out, value):
+
+    """ Append the encoding of value to the bytearray out. """
+
+    encoder = ENCODERS.get(type(value))
+
+    if encoder is None:
+        # Subclasses of the types above, which are rare enough to be looked
+        # up the slow way.
+        for kind in (bool, str, int, list, tuple, dict, TargetableClient):
+            if isinstance(value, kind):
+                encoder = ENCODERS[kind]
+                break
+        else:
+            raise CodecError("Cannot encode a value of type " + type(value).__name__)
+
+    encoder(out, value)
+
+
+def encode_record(out, record):
+
+    """ Append the fields of a TargetableClient without type codes, since
+    the type of every field is fixed. """
+
+    try:
+        encode_str(out, record.name)
+        write_varint(out, zigzag(record.hp))
+        encode_str(out, record.e_type)
+        out.append(TRUE if record.invisible else FALSE)
+        write_varint(out, zigzag(record.rank))
+        encode_str(out, record.target_name)
+        encode_str(out, record.master_name)
+    except (AttributeError, TypeError):
+        raise CodecError("TargetableClient " + repr(record.name) + " has a field of the wrong type.")
+
+
+def decode_record(data, pos):
+
+    """ Return (TargetableClient, position after the record). """
+
+    name, pos = decode_str(data, pos)
+    hp, pos = read_varint(data, pos)
+    e_type, pos = decode_str(data, pos)
+    if pos >= len(data):
+        raise CodecError("Payload ends in the middle of a record.")
+    invisible = data[pos] == TRUE
+    rank, pos = read_varint(data, pos + 1)
+    target_name, pos = decode_str(data, pos)
+    master_name, pos = decode_str(data, pos)
+
+    return TargetableClient(name, unzigzag(hp), e_type, invisible, unzigzag(rank), target_name, master_name), pos
+
+
+def decode_str(data, pos):
+
+    """ Return (string, position after the string). """
+
+    size = data[pos] if pos < len(data) else 0x80
+    if size < 0x80:
+        pos += 1
+    else:
+        size, pos = read_varint(data, pos)
+
+    end = pos + size
+    if end > len(data):
+        raise CodecError("Payload ends in the middle of a string.")
+
+    try:
+        return str(data[pos:end], ENC), end
+    except UnicodeDecodeError:
+        raise CodecError("Payload has a string that is not valid " + ENC + ".")
+
+
+# Values whose type code is the whole of them.
+CONSTANTS = {NONE:None, TRUE:True, FALSE:False}
+
+
+def decode_value(data, pos, depth=0):
+
+    """ Return (value, position after the value). """
+
+    if pos >= len(data):
+        raise CodecError("Payload ends where a value was expected.")
+
+    code = data[pos]
+
+    if code in CONSTANTS:
+        return CONSTANTS[code], pos + 1
+
+    decoder = DECODERS.get(code)
+    if decoder is None:
+        raise CodecError("Unknown type code [" + str(code) + "] in payload.")
+
+    return decoder(data, pos + 1, depth)
+
+
+def decode_int(data, pos, depth):
+
+    raw, pos = read_varint(data, pos)
+
+    return unzigzag(raw), pos
+
+
+def decode_string(data, pos, depth):
+    return decode_str(data, pos)
+
+
+def decode_str_list(data, pos, depth):
+
+    joined, pos = decode_str(data, pos)
+
+    return joined.split("\0"), pos
+
+
+def decode_list(data, pos, depth):
+
+    if depth >= MAX_DEPTH:
+        raise CodecError("Payload nests deeper than " + str(MAX_DEPTH) + " levels.")
+
+    count, pos = read_varint(data, pos)
+    items = []
+    for _ in range(count):
+        item, pos = decode_value(data, pos, depth + 1)
+        items.append(item)
+
+    return items, pos
+
+
+def decode_dict(data, pos, depth):
+
+    if depth >= MAX_DEPTH:
+        raise CodecError("Payload nests deeper than " + str(MAX_DEPTH) + " levels.")
+
+    count, pos = read_varint(data, pos)
+    items = {}
+    for _ in range(count):
+        # Keys are nearly always strings, so those are read here.
+        if pos < len(data) and data[pos] == STR:
+            key, pos = decode_str(data, pos + 1)
+        else:
+            key, pos = decode_value(data, pos, depth + 1)
+            if isinstance(key, (list, dict, TargetableClient)):
+                raise CodecError("Dictionary keys must be None, bool, int or str.")
+        item, pos = decode_value(data, pos, depth + 1)
+        items[key] = item
+
+    return items, pos
+
+
+def decode_targetable(data, pos, depth):
+    return decode_record(data, pos)
+
+
+# type code: the function that decodes the rest of the value
+DECODERS = {
+    INT:decode_int,
+    STR:decode_string,
+    STR_LIST:decode_str_list,
+    LIST:decode_list,
+    DICT:decode_dict,
+    RECORD:decode_targetable,
+}
+
+
+def encode(value):
+
+    """ Return the bytes for value. """
+
+    out = bytearray()
+    encode_value(out, value)
+
+    return bytes(out)
+
+
+def decode(data):
+
+    """ Return the value encoded in data, which must hold exactly one value. """
+
+    value, pos = decode_value(data, 0)
+
+    if pos != len(data):
+        raise CodecError("Payload has " + str(len(data) - pos) + " bytes after its value.")
+
+    return value
@@ -0,0 +1,127 @@
+# Compression of what the Gamemaster sends, for clients that agree to it.
+#
+# Round reports and status snapshots are short runs of the same English and
+# the same field names, round after round. Each is compressed on its own,
+# so that any one can be sent again after a resume, which leaves zlib
+# little to learn from within a message. Both sides therefore prime zlib
+# with a preset dictionary: the spell names and descriptions from the
+# spellbook, and the phrases the round reports are built from. The
+# capability name carries a checksum of the dictionary, so a client and
+# server with different spellbooks never agree to use it.
+
+import functools
+import zlib
+
+from waving_hands.config import DATA
+from waving_hands import spellbook
+
+# Messages shorter than this are sent as they are.
+COMPRESS_MIN = 128
+
+LEVEL = 6
+
+# Raw deflate, with no zlib header or checksum; the frame length already
+# says where the data ends.
+WBITS = -15
+
+# Loading the dictionary costs several times more than compressing a round
+# report, so it is loaded once into a compressor that each message starts
+# from a copy of. A smaller hash table than the default makes that copy
+# cheaper, and makes no difference to messages this short.
+MEM_LEVEL = 5
+
+# The phrases of the round reports and the names in a status snapshot. zlib
+# looks back from the end of the dictionary, so the most common go last.
+PHRASES = (
+    "amnesia", "blind", "charmed", "confusion", "fear", "haste", "hp",
+    "enemy_hp", "monsters", "paralyzed", "timestop", "history_self",
+    "history_others", "left", "right", "state", "version", "nobody",
+    "The wind whistles and the temperature drops as an ice storm starts to take shape...",
+    "The wizard examines the two dead competitors and declares the match to be a non-conclusive draw.",
+    "The wizards, looking embarrassed, quietly agree to never speak of this incident again.",
+    "The sun breaks through the clouds to shine upon both wizards as live to see another day.",
+    "The virulent plague finally takes its toll on ",
+    "The spell begins to unravel the magic composing ",
+    "The time loop surrounding ",
+    "The two shields merge into one.",
+    "Both wizards die equally messily.",
+    "'s flesh is scoured from their bones by the beam of pure entropic power!",
+    "'s protective aura bends the missile away!",
+    "'s protective aura bends the stab away!",
+    "'s protective aura bends the swing away!",
+    "'s protective aura fades away.",
+    "'s sight is stolen by the blindness enchantment!",
+    "'s looks forgetful... they repeat their previous gestures!",
+    "'s mind is filled with fear!",
+    "'s goes still as the magic takes hold!",
+    "'s aura glows with a new light!",
+    "'s eyes cross!", "'s eyes uncross!",
+    " regains the use of their ", " hand has been paralyzed again!",
+    " returns to normal speed.", " seems less forgetful.", " is nullified!",
+    " fades away.", " elemental!", "'s minion, swings at ", "'s command!",
+    "...and hits them in the ", "...but it is deflected by ", "'s shield!",
+    " for 1 damage!", " stabs at ", " with the dagger in their ",
+    " triumphantly declares, \"It looks like I win again.\"",
+    " kicks up some dirt and mumbles, \"It looks like I win again.\"",
+    "Nothing happened this round.",
+    " casts ", " on ", " at ", " hand!", " hand.", " left hand", " right hand",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def dictionary():
+
+    """ Return the preset dictionary, built once from the spellbook. """
+
+    # The shared spellbook, so that the file is not parsed a second time.
+    parts = []
+
+    for spell in spellbook.load(DATA["spellbook"]).spell_list:
+        parts.append(spell.name)
+        parts.append(spell.desc)
+
+    parts.extend(PHRASES)
+
+    return "\n".join(parts).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=None)
+def capability():
+
+    """ Return the name this kind of compression is offered and agreed by. """
+
+    return "zlib-" + format(zlib.adler32(dictionary()), "08x")
+
+
+@functools.lru_cache(maxsize=None)
+def primed():
+
+    return zlib.compressobj(LEVEL, zlib.DEFLATED, WBITS, MEM_LEVEL, zdict=dictionary())
+
+
+def compress(data):
+
+    compressor = primed().copy()
+
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data, limit):
+
+    """ Return the decompressed data. Raises ValueError if it is damaged, or
+    would come to more than limit bytes. """
+
+    decompressor = zlib.decompressobj(WBITS, zdict=dictionary())
+
+    try:
+        out = decompressor.decompress(data, limit)
+    except zlib.error as e:
+        raise ValueError("Damaged compressed data: " + str(e))
+
+    if decompressor.unconsumed_tail:
+        raise ValueError("Compressed data comes to more than " + str(limit) + " bytes.")
+
+    if not decompressor.eof:
+        raise ValueError("Compressed data is cut short.")
+
+    return out
@@ -1,19 +1,95 @@
-from random import randint
-import pickle
+from collections import deque
+import random
+import queue
+import secrets
 import select
 import socket
-import sys
+import threading
+import time
 import logging
 import logging.config
 
 from waving_hands.elemental import Elemental
+from waving_hands.outbox import Outbox
+from waving_hands.spell_queue import SpellQueue
+from waving_hands.transport import TcpTransport
 from waving_hands.minion import Minion
 from waving_hands.targetable_client import TargetableClient
 from waving_hands.wizard import Wizard
 from waving_hands import groblenames
+from waving_hands import capture
+from waving_hands import codec
+from waving_hands import compression
+from waving_hands import netstats
+from waving_hands import protocol
+from waving_hands import snapshot as status
+from waving_hands import spectators
 
 log = logging.getLogger(__name__)
 
+# Seconds the players have for each phase of a turn, counted from when the
+# server first asks for their input. A phase set to None has no deadline.
+DEADLINES = {
+    "customize":300,
+    "gestures":300,
+    "choices":120,
+    "ready":300,
+}
+
+# resume token: the Gamemaster playing the match it belongs to
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# match id: the Gamemaster playing it, for spectators to find
+_matches = {}
+
+
+class ConnectionLost(Exception):
+
+    """ Raised when a client goes away and the match cannot continue. """
+
+    pass
+
+
+def resume_session(sock, hello):
+
+    """ Hand a reconnecting client to the match its resume token belongs to.
+    Returns False if no match in this process knows the token. """
+
+    token = hello.get("resume")
+
+    with _sessions_lock:
+        game = _sessions.get(token)
+
+    if not game:
+        return False
+
+    game.offer_resume(token, sock, hello.get("received", 0))
+
+    return True
+
+
+def spectate_session(sock, hello):
+
+    """ Hand a new spectator to the match it asked to watch, or to the
+    latest match if it named none. Returns False if there is no such match
+    in this process. """
+
+    match_id = hello.get("spectate")
+
+    with _sessions_lock:
+        if match_id:
+            game = _matches.get(match_id)
+        else:
+            game = next(reversed(_matches.values()), None)
+
+    if not game:
+        return False
+
+    game.add_spectator(sock)
+
+    return True
+
 
 class Gamemaster:
 
@@ -22,7 +98,17 @@ class Gamemaster:
         port: int = 12345,
         pregame: bool = True,
         customize_wizards: bool = True,
-        players: int = 2):
+        players: int = 2,
+        clients: list = None,
+        transport = None,
+        deadlines: dict = None,
+        heartbeat_timeout: float = 30,
+        resume_window: float = 60,
+        session_prefix: str = "",
+        high_water: int = 1024 * 1024,
+        compress: bool = True,
+        seed: int = None,
+        capture: str = None):
         """
         Start the game, with a given number of parameters
 
@@ -31,6 +117,25 @@ class Gamemaster:
         :param pregame: Start the game with pre-game flair? Defaults to True
         :param customize_wizards: Allow players to customize their wizards? Defaults to True
         :param players: Number of players to use for the game. Defaults to 2
+        :param clients: Already connected client sockets. When given, the game
+            runs as a session for a larger server and never opens its own
+            listening socket.
+        :param transport: Transport to take players' connections from.
+            Defaults to TCP on host and port
+        :param deadlines: {phase:seconds} to change some of the DEADLINES
+        :param heartbeat_timeout: Seconds a client we are waiting on may go
+            without a heartbeat before it is taken to have dropped
+        :param resume_window: Seconds a dropped client has to reconnect before
+            the match ends. 0 ends the match as soon as a client drops
+        :param session_prefix: Put in front of every resume token, so that a
+            server with several processes can tell which one a token belongs to
+        :param high_water: Bytes waiting to go to a client past which its
+            notices are dropped and the match waits for it to catch up
+        :param compress: Compress large messages to clients that agree to it
+        :param seed: Seed for every random choice of the match. Defaults to
+            a fresh one, so that no two matches are alike
+        :param capture: File to record every frame of the match to, so it
+            can be played back with replay.py
         """
 
         self._wizards = []
@@ -44,7 +149,7 @@ class Gamemaster:
 
         self._targets = []
         self._stab_targets = []
-        self._spell_targets = []
+        self._spell_targets = SpellQueue()
         self._spells_reflected = []
 
         self._dying_minions = []
@@ -63,11 +168,86 @@ class Gamemaster:
 
         self._NUMBER_OF_WIZARDS = players
 
-        self._server = None
+        self._seed = seed if seed is not None else secrets.randbits(32)
+        self._rng = random.Random(self._seed)
+
+        self._capture_path = capture
+        self._recorder = None
+
+        self._server_socket = None
+        self._session_clients = clients
+        self._transport = transport
+
+        # client: (state number, last status snapshot sent to it)
+        self._status_sent = {}
+
+        # client: sequence number of the last notice sent to it
+        self._notice_seq = {}
+
+        # client: frames received from it that have not been asked for yet,
+        # and the bytes of the frame it is part way through sending
+        self._inbox = {}
+        self._partial = {}
+        # client: Outbox of bytes waiting to be sent to it
+        self._outboxes = {}
+        # Bytes and round trips of the match per kind of message, and the
+        # netstats.Link counting each client's traffic into it
+        self._net_stats = netstats.NetStats()
+        self._links = {}
+        # The last bytes compressed, and what they came to. The same round
+        # report goes to every client, so it is only compressed once.
+        self._last_plain = None
+        self._last_packed = None
+        # Everyone watching the match, and the gestures of this round as
+        # they can see them, as {wizard name:[{hand:gesture}, ...]}
+        self._match_id = session_prefix + secrets.token_hex(4)
+        self._spectators = spectators.Spectators()
+        self._public_gestures = {}
+
+        # client: when we last heard anything from it, heartbeats included
+        self._last_heard = {}
+
+        self._phase = None
+        self._phase_deadline = None
+
+        # client: its resume token
+        self._tokens = {}
+        # client: bytes of the match sent to and received from it, and the
+        # most recent bytes sent, kept to send again after a resume
+        self._sent = {}
+        self._received = {}
+        self._replay = {}
+        # client: how many times it has come back
+        self._resumed = {}
+        # The socket a client first connected on stays its key everywhere in
+        # the match. Once it has come back, the socket it is connected on now
+        # is kept here, as client: socket and socket: client.
+        self._sockets = {}
+        self._clients = {}
+        # (token, socket, bytes received) from reconnecting clients
+        self._resumes = queue.Queue()
+        # Set once close_connections has run
+        self._closed = False
+
+        self._DEADLINES = dict(DEADLINES)
+        self._DEADLINES.update(deadlines or {})
+
         self._HOST          = host
         self._PORT          = port
-        self._ENC           = "utf-8"
-        self._BUFFSIZE      = 1024
+        self._ENC           = protocol.ENC
+        self._HIGH_WATER    = high_water
+        self._CLOSE_TIMEOUT = 5
+        self._HEARTBEAT_TIMEOUT = heartbeat_timeout
+        self._RESUME_WINDOW = resume_window
+        self._SESSION_PREFIX = session_prefix
+        self._HELLO_TIMEOUT = 10
+        self._POLL_INTERVAL = 1.0
+        self._RECV_BYTES    = 64 * 1024
+        self._REPLAY_BYTES  = 256 * 1024
+        self._COMPRESS_MIN  = compression.COMPRESS_MIN if compress else None
+
+        # Connections to our own listening socket that have yet to say hello
+        self._hellos = protocol.PendingHellos(self._HELLO_TIMEOUT)
 
     @property
     def server(self):
@@ -77,11 +257,55 @@ class Gamemaster:
     def server(self, socket):
         self._server_socket = socket
 
+    @property
+    def seed(self):
+        return self._seed
+
+    @property
+    def rng(self):
+        return self._rng
+
+    @property
+    def recorder(self):
+        return self._recorder
+
+    @property
+    def net_stats(self):
+        return self._net_stats
+
+    @property
+    def match_id(self):
+        return self._match_id
+
+    @property
+    def spectators(self):
+        return self._spectators
+
+    def start_capture(self):
+
+        """ Open the capture file, if we were given one. The header holds
+        everything replay.py needs to set up the same match again. """
+
+        if not self._capture_path or self._recorder:
+            return
+
+        settings = {"seed":self.seed,
+                    "players":self._NUMBER_OF_WIZARDS,
+                    "pregame":self.pregame,
+                    "customize_wizards":self.customize_wizards}
+
+        self._recorder = capture.Recorder(self._capture_path, settings)
+
+        log.info("Recording the match to " + str(self._capture_path))
+
     def setup_game(self):
     
         self.create_wizards() # create wizards, populate spellbook
         # Wait for incoming connections and assign the sockets to the wizards.
-        self.wait_for_connections()
+        if self._session_clients:
+            self.assign_clients(self._session_clients)
+        else:
+            self.wait_for_connections()
 
         if self.customize_wizards:
             log.debug("Customizing Wizards")
@@ -106,7 +330,7 @@ class Gamemaster:
                 c_list.append(wizard.client)
 
         for client in c_list:
-            client.send("WELCOME".encode(self._ENC))
+            self.msg_client("WELCOME", client)
 
         while True:
 
@@ -122,32 +346,68 @@ class Gamemaster:
 
         for line in welcome_msg:
             for client in c_list:
-                client.send(line.encode(self._ENC))
+                self.msg_client(line, client, protocol.TEXT)
 
     def wait_for_connections(self):
 
-        # First, open the network socket.
+        # First, start listening. The transport stands in for the listening
+        # socket from here on.
 
-        self.server = socket.socket()
+        if not self._transport:
+            self._transport = TcpTransport(self._HOST, self._PORT, self._NUMBER_OF_WIZARDS)
 
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        
-        addr = (self._HOST, self._PORT)
-
-        self.server.bind(addr)
-
-        self.server.listen(self._NUMBER_OF_WIZARDS)
+        self._transport.listen()
+        self.server = self._transport
 
         c_list = []
 
-        log.info(f"Listening for {self._NUMBER_OF_WIZARDS} players on {addr}")
+        log.info("Listening for " + str(self._NUMBER_OF_WIZARDS) + " players on " + str(self._transport))
 
+        # Each connection's HELLO is read as it arrives, so one that is slow
+        # to say hello does not keep the others waiting.
         while len(c_list) < self._NUMBER_OF_WIZARDS:
-            c, addr = self.server.accept()
-            print("Connection accepted from " + str(addr))
-            c_list.append(c)
-            if len(c_list) < self._NUMBER_OF_WIZARDS:
-                self.wait_msg(c, "Waiting for challenger...")
+            rlist, wlist, elist = select.select( [self.server] + self._hellos.sockets(), [], [],
+                                                 self._hellos.timeout() )
+
+            for c in rlist:
+                if c is self.server:
+                    c, addr = self.server.accept()
+                    protocol.configure_socket(c)
+                    print("Connection accepted from " + str(addr))
+                    self._hellos.add(c)
+                    continue
+
+                hello = self._hellos.read(c)
+                if c in self._hellos:
+                    continue
+                if hello and hello.get("spectate") is not None:
+                    protocol.answer_hello(c, hello)
+                    self.add_spectator(c)
+                    continue
+                if hello is None or hello.get("resume") or len(c_list) == self._NUMBER_OF_WIZARDS:
+                    print("Turned away a connection which did not open as a new player.")
+                    c.close()
+                    continue
+
+                protocol.answer_hello(c, hello)
+
+                c_list.append(c)
+                if len(c_list) < self._NUMBER_OF_WIZARDS:
+                    self.wait_msg(c, "Waiting for challenger...")
+
+            self.expire_hellos()
+
+        self.assign_clients(c_list)
+
+    def assign_clients(self, c_list):
+
+        """ Give each connected client socket to a wizard. """
+
+        self.start_capture()
+
+        with _sessions_lock:
+            _matches[self.match_id] = self
+        print("Match " + self.match_id + " is starting. Watch it with --spectate " + self.match_id)
 
         for client in c_list:
             for wizard in self.wizards:
@@ -155,14 +415,71 @@ class Gamemaster:
                     wizard.client = client
                     break
 
+            if self._recorder:
+                self._recorder.connection(client)
+
+            self.open_session(client)
+
+    def open_session(self, client):
+
+        """ Give the client a resume token, which it can use to carry on with
+        the match from a new connection if this one drops. """
+
+        if not self._RESUME_WINDOW:
+            return
+
+        token = self._SESSION_PREFIX + secrets.token_hex(16)
+        self._tokens[client] = token
+
+        with _sessions_lock:
+            _sessions[token] = self
+
+        session = {"token":token, "received":0}
+        self.queue_bytes(client, protocol.pack_frame(protocol.SESSION, self.serialize(session)), replay=False)
+
     def close_connections(self):
 
-        for wizard in self.wizards:
-            wizard.client.shutdown(1)
-            wizard.client.close()
+        """ Close every connection of the match and log its traffic. Only
+        the first call does anything, so it is safe to call again after
+        kill_connection. """
+
+        if self._closed:
+            return
+        self._closed = True
+
+        with _sessions_lock:
+            for token in self._tokens.values():
+                _sessions.pop(token, None)
+            _matches.pop(self.match_id, None)
+        self._tokens = {}
 
-        self.server.shutdown(1)
-        self.server.close()
+        while not self._resumes.empty():
+            token, sock, received = self._resumes.get()
+            sock.close()
+        self._hellos.close()
+
+        # Give the last round report a chance to get out.
+        self.flush_outboxes(self._CLOSE_TIMEOUT)
+        self._spectators.close()
+        self.log_outbound_stats()
+        self.log_net_stats()
+        netstats.process_stats.merge(self._net_stats)
+
+        if self._recorder:
+            self._recorder.close()
+
+        for client in self.get_clients():
+            sock = self.socket_of(client)
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                # The client is already gone.
+                pass
+            sock.close()
+
+        if self.server:
+            self.server.close()
+            self.server = None
 
     def create_wizards(self):
 
@@ -190,6 +507,7 @@ class Gamemaster:
             ]
 
         for wizard in self.wizards:
+            wizard.rng = self.rng
             self.add_target(wizard)
 
     def get_clients(self):
@@ -204,6 +522,18 @@ class Gamemaster:
 
         return c_list
 
+    def socket_of(self, client):
+
+        """ Return the socket the client is connected on now. """
+
+        return self._sockets.get(client, client)
+
+    def client_of(self, sock):
+
+        """ Return the client connected on sock, as the match knows it. """
+
+        return self._clients.get(sock, sock)
+
     def get_wizard_from_client(self, client):
 
         for wizard in self.wizards:
@@ -220,20 +550,22 @@ class Gamemaster:
 
         c_list = self.get_clients()
 
+        self.begin_phase("customize")
+
         for client in c_list:
-            client.send("CUSTOMIZE".encode(self._ENC))
+            self.msg_client("CUSTOMIZE", client)
 
         customized = []
 
         while len(customized) < 2:
 
-            rlist, wlist, elist = select.select( c_list, [], [] )
+            rlist = self.poll_clients([client for client in c_list if client not in customized])
 
             for client in rlist:
                 if client not in customized:
 
                     cust_d = self.recv(client)
-                    cust_d = self.depickle(cust_d)
+                    cust_d = self.deserialize(cust_d)
 
                     wizard = self.get_wizard_from_client(client)
                     
@@ -243,7 +575,7 @@ class Gamemaster:
                     wizard.victory = cust_d["victory"]
                     
                     """
-                    spellbook_c = self.pickle(wizard.spellbook_client)
+                    spellbook_c = self.serialize(wizard.spellbook_client)
                     print("Size of spellbook: " + str(sys.getsizeof(spellbook_c)))
                     print("Sending clientside spellbook to " + wizard.name)
                     wizard.client.send(spellbook_c, socket.MSG_WAITALL)
@@ -274,9 +606,7 @@ class Gamemaster:
         
 
         if self.dead_response(data):
-            if msg:
-                print(msg)
-            self.kill_connection()
+            self.kill_connection(msg)
         
         return True
 
@@ -291,27 +621,21 @@ class Gamemaster:
 
         c_list = self.get_clients()
 
-        for client in c_list:
-            self.msg_client("PREGAME", client)
+        pf = ["A storm rages over a windswept plain.",
+              "Despite the torrential downpour, two figures can be seen approaching each other.",
+              "They stop at a distance, waiting. Thunder rumbles overhead.\n"]
 
-            ack = self.recv(client)
-            if self.response(ack, "Client died during PREGAME request"):
-                ack = self.dec(ack)
-
-                if ack == "PREGAME_ACK":
-
-                    pf = ["A storm rages over a windswept plain.",
-                          "Despite the torrential downpour, two figures can be seen approaching each other.",
-                          "They stop at a distance, waiting. Thunder rumbles overhead.\n"]
-
-                    for wizard in self.wizards:
-                        pf.append("A wizard in " + wizard.color + " robes steps forward.")
-                        pf.append("\"I am " + wizard.name + ". " + wizard.taunt + "\"")
+        for wizard in self.wizards:
+            pf.append("A wizard in " + wizard.color + " robes steps forward.")
+            pf.append("\"I am " + wizard.name + ". " + wizard.taunt + "\"")
 
-                    pf.append("\nWith a flash of lightning, the battle begins!")
+        pf.append("\nWith a flash of lightning, the battle begins!")
 
-                    self.msg_client_pp(pf, client)
-                    self.recv(client)
+        # The flavor list follows the command directly; the client does not
+        # need to acknowledge either of them.
+        for client in c_list:
+            self.msg_client("PREGAME", client)
+            self.msg_client_pp(pf, client)
 
         #for wizard in self.wizards:
         #    wizard.introduce()
@@ -352,14 +676,17 @@ class Gamemaster:
             self.get_gestures()
             self.get_additional_gestures()
 
+            self.begin_phase("choices")
             self.process_turn()
 
-            self.resolve_death_or_surrender()
+            game_over = not self.resolve_death_or_surrender()
 
-            self.print_flavor_messages()
+            # Clients disconnect after a game-ending report, so there is no
+            # NEXT_TURN_READY to wait for.
+            self.print_flavor_messages(not game_over)
             self.cleanup()
 
-            if self.surrender:
+            if game_over:
                 print("Thank you for playing Richard Bartle's Spellbinder!")
                 self.playing = False
 
@@ -426,92 +753,560 @@ class Gamemaster:
     def add_spell_reflection(self, spell_tuple):
         self._spells_reflected.append(spell_tuple)
 
-    def msg_clients(self, msg):
+    def msg_clients(self, msg, tag=protocol.CMD):
 
         """ Encode the message and send it to all clients. """
 
         c_list = self.get_clients()
 
         for client in c_list:
-            client.send(msg.encode(self._ENC))
+            self.send_frame(client, tag, self.enc(msg))
+
+    def send_frame(self, client, tag, payload=b""):
+
+        self.send_bytes(client, protocol.pack_frame(tag, payload))
+
+    def send_bytes(self, client, data):
+
+        """ Send part of the match to the client. If the client is backed up,
+        wait for it to catch up first. If the connection drops the client is
+        waited for, and whatever it missed is sent again. """
+
+        self.queue_bytes(client, data)
+
+        if self.outbox(client).over_high_water:
+            self.drain(client)
+
+    def outbox(self, client):
+
+        outbox = self._outboxes.get(client)
+
+        if outbox is None:
+            outbox = Outbox(self._HIGH_WATER)
+            self._outboxes[client] = outbox
+
+        return outbox
+
+    def queue_bytes(self, client, data, replay=True):
+
+        """ Put bytes in the client's outbox and send as much of it as the
+        socket takes right now. The rest goes out whenever the match waits
+        on anyone. Never blocks. """
+
+        if replay:
+            link = self.link(client)
+            for tag, payload in protocol.split_frames(data):
+                link.sent(tag, payload)
+
+            if self._recorder:
+                self._recorder.record_out(client, data)
+
+            data = self.wire_bytes(client, data)
+            self.keep_for_replay(client, data)
+
+        outbox = self.outbox(client)
+        outbox.put(data)
+
+        self.flush_outbox(client)
+
+    def wire_bytes(self, client, data):
+
+        """ Return the bytes to send the client for data: compressed, if the
+        client agreed to it and data is long enough to be worth it. """
+
+        if self._COMPRESS_MIN is None or len(data) < self._COMPRESS_MIN:
+            return data
+
+        if compression.capability() not in protocol.agreed(self.socket_of(client)):
+            return data
+
+        if data is not self._last_plain:
+            self._last_plain = data
+            self._last_packed = protocol.pack_compressed(data)
+
+        return self._last_packed
+
+    def flush_outbox(self, client):
+
+        try:
+            self.outbox(client).flush(self.socket_of(client))
+        except OSError:
+            self.reconnect(client, "connection lost while sending")
+
+    def pending_writes(self):
+
+        """ Return the sockets of the clients that have bytes waiting to be
+        sent. """
+
+        return [self.socket_of(client) for client in self.get_clients() if self._outboxes.get(client)]
+
+    def drain(self, client):
+
+        """ Wait until a backed up client has caught up to half the high-water
+        mark, writing to every other client in the meantime. A client that
+        takes nothing for longer than the heartbeat timeout is treated as
+        dropped. """
+
+        outbox = self.outbox(client)
+        outbox.count_stall()
 
-    def recv(self, client, buff=0):
+        print("Waiting for " + self.get_wizard_from_client(client).name + " to catch up with " +
+              str(len(outbox)) + " bytes.")
 
-        """ Receive any data for processing. """
+        last_progress = time.monotonic()
 
-        if buff == 0:
-            buff = self._BUFFSIZE
+        while not outbox.under_low_water:
+            waiting = len(outbox)
 
-        return client.recv(buff)
+            rlist, wlist, elist = select.select( [], self.pending_writes(), [], self._POLL_INTERVAL )
+            for writable in wlist:
+                self.flush_outbox(self.client_of(writable))
+
+            now = time.monotonic()
+            if len(outbox) < waiting:
+                last_progress = now
+            elif self._HEARTBEAT_TIMEOUT and now - last_progress > self._HEARTBEAT_TIMEOUT:
+                self.reconnect(client, "took nothing for " + str(self._HEARTBEAT_TIMEOUT) + " seconds")
+
+    def flush_outboxes(self, timeout):
+
+        """ Try for up to timeout seconds to send everything that is waiting. """
+
+        give_up = time.monotonic() + timeout
+
+        while True:
+            pending = [sock for sock in self.pending_writes() if sock.fileno() != -1]
+            left = give_up - time.monotonic()
+            if not pending or left <= 0:
+                return
+
+            rlist, wlist, elist = select.select( [], pending, [], left )
+            for sock in wlist:
+                outbox = self.outbox(self.client_of(sock))
+                try:
+                    outbox.flush(sock)
+                except OSError:
+                    outbox.clear()
+
+    def outbound_stats(self):
+
+        """ Return the Outbox counters of every wizard as {name:stats}. """
+
+        stats = {}
+
+        for wizard in self.wizards:
+            if wizard.client in self._outboxes:
+                stats[wizard.name] = self._outboxes[wizard.client].stats()
+
+        return stats
+
+    def log_outbound_stats(self):
+
+        for name, stats in self.outbound_stats().items():
+            log.info("Outbound to " + name + ": " + str(stats))
+
+    def link(self, client):
+
+        link = self._links.get(client)
+
+        if link is None:
+            link = netstats.Link(self._net_stats, asks=True)
+            self._links[client] = link
+
+        return link
+
+    def log_net_stats(self):
+
+        """ Log the traffic of the match per kind of message. """
+
+        for line in self._net_stats.report():
+            log.info(line)
+
+    def keep_for_replay(self, client, data):
+
+        """ Count bytes sent to the client, keeping the most recent ones in
+        case they have to be sent again after a resume. """
+
+        if client not in self._tokens:
+            return
+
+        self._sent[client] = self._sent.get(client, 0) + len(data)
+
+        replay = self._replay.setdefault(client, bytearray())
+        replay += data
+        if len(replay) > self._REPLAY_BYTES:
+            del replay[:len(replay) - self._REPLAY_BYTES]
+
+    def recv(self, client):
+
+        """ Receive the payload of the next frame from the client. """
+
+        return self.recv_frame(client).payload
+
+    def recv_frame(self, client):
+
+        """ Receive the next whole frame from the client. A client that drops
+        is waited for, so this only returns once a frame arrives; if the
+        client does not come back, the match ends with ConnectionLost. """
+
+        inbox = self._inbox.setdefault(client, deque())
+
+        while not inbox:
+            self.poll_clients([client])
+
+        return inbox.popleft()
+
+    def begin_phase(self, phase):
+
+        """ Start the clock on a phase of the turn. """
+
+        self._phase = phase
+
+        limit = self._DEADLINES.get(phase)
+        self._phase_deadline = time.monotonic() + limit if limit else None
+
+    def poll_clients(self, c_list):
+
+        """ Wait until at least one of the clients has sent a frame, and
+        return the clients that have.
+
+        Heartbeats are taken in along the way. The match ends if the phase
+        deadline passes. A client that drops, or goes quiet for longer than
+        the heartbeat timeout, is waited for until it reconnects.
+        """
+
+        started = time.monotonic()
+
+        while True:
+            ready = [client for client in c_list if self._inbox.get(client)]
+            if ready:
+                return ready
+
+            now = time.monotonic()
+            self.check_deadline(now, c_list)
+            self.take_resumes()
+
+            timeout = self._POLL_INTERVAL
+            if self._phase_deadline is not None:
+                timeout = max(0, min(timeout, self._phase_deadline - now))
+
+            watched = [self.socket_of(client) for client in c_list]
+            if self.server:
+                watched.append(self.server)
+            watched += self._hellos.sockets()
+
+            rlist, wlist, elist = select.select( watched, self.pending_writes() + self._spectators.pending(), [],
+                                                 self._hellos.timeout(timeout) )
+
+            for sock in wlist:
+                if self.client_of(sock) in self._outboxes:
+                    self.flush_outbox(self.client_of(sock))
+                else:
+                    self._spectators.flush(sock)
+
+            for sock in rlist:
+                if sock is self.server:
+                    self.accept_resume()
+                elif sock in self._hellos:
+                    self.read_hello(sock)
+                else:
+                    self.read_frame(self.client_of(sock))
+            self.expire_hellos()
+
+            now = time.monotonic()
+            for client in c_list:
+                heard = max(started, self._last_heard.get(client, started))
+                if self._HEARTBEAT_TIMEOUT and now - heard > self._HEARTBEAT_TIMEOUT:
+                    self.reconnect(client, "no heartbeat for " + str(self._HEARTBEAT_TIMEOUT) + " seconds")
+
+    def read_frame(self, client):
+
+        """ Read what a ready client has sent, keeping each whole frame for
+        recv_frame unless it is a heartbeat.
+
+        Only one recv is made, so this never waits. The start of a frame is
+        kept until the rest arrives; a client that stops part way through
+        one is not heard from, and is dropped by the heartbeat timeout.
+        """
+
+        try:
+            data = self.socket_of(client).recv(self._RECV_BYTES)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self.reconnect(client, "connection closed")
+            return
+
+        partial = self._partial.setdefault(client, bytearray())
+        partial += data
+
+        try:
+            frames = protocol.take_frames(partial)
+        except protocol.ProtocolError as e:
+            # Nothing after a bad header can be trusted, so the connection is
+            # treated as lost. A client that really is ours resumes.
+            try:
+                self.socket_of(client).shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.reconnect(client, "sent a malformed frame: " + str(e))
+            return
+
+        for frame in frames:
+            self.take_frame(client, frame)
+
+    def take_frame(self, client, frame):
+
+        self._last_heard[client] = time.monotonic()
+
+        if frame.tag == protocol.HEARTBEAT:
+            return
+
+        self.link(client).received(frame.tag, frame.payload)
+
+        if self._recorder:
+            self._recorder.record_in(client, frame)
+
+        self._received[client] = self._received.get(client, 0) + protocol.HEADER.size + len(frame.payload)
+        self._inbox.setdefault(client, deque()).append(frame)
+
+    def check_deadline(self, now, c_list):
+
+        if self._phase_deadline is None or now < self._phase_deadline:
+            return
+
+        names = []
+        for client in c_list:
+            names.append(self.get_wizard_from_client(client).name)
+
+        self.kill_connection(" and ".join(names) + " did not answer within the " +
+                             str(self._DEADLINES[self._phase]) + " second " + self._phase + " deadline.")
+
+    def reconnect(self, client, reason):
+
+        """ Wait for a client that has dropped to come back with its resume
+        token. The match carries on where it left off once it does, and ends
+        if it does not come back within the resume window. """
+
+        name = self.get_wizard_from_client(client).name
+
+        if client not in self._tokens or not self._RESUME_WINDOW:
+            self.kill_connection(name + " dropped: " + reason)
+
+        print(name + " dropped (" + reason + "), waiting " + str(self._RESUME_WINDOW) + " seconds for a resume.")
+
+        for other in self.get_clients():
+            if other is not client:
+                self.msg_client_g(name + " lost their connection. Waiting for them to come back...", other)
+
+        resumed = self._resumed.get(client, 0)
+        give_up = time.monotonic() + self._RESUME_WINDOW
+
+        while self._resumed.get(client, 0) == resumed:
+            left = give_up - time.monotonic()
+            if left <= 0:
+                self.kill_connection(name + " did not come back within " + str(self._RESUME_WINDOW) + " seconds.")
+
+            self.wait_for_resume(min(left, self._POLL_INTERVAL))
+
+    def offer_resume(self, token, sock, received):
+
+        """ Queue a reconnected client for the thread playing the match.
+        Safe to call from any thread. """
+
+        self._resumes.put((token, sock, received))
+
+    def take_resumes(self):
+
+        """ Resume every client that has come back, without waiting. """
+
+        while True:
+            try:
+                token, sock, received = self._resumes.get_nowait()
+            except queue.Empty:
+                return
+            self.resume(token, sock, received)
+
+    def wait_for_resume(self, timeout):
+
+        """ Wait up to timeout seconds for a client to come back. """
+
+        if self.server:
+            rlist, wlist, elist = select.select( [self.server] + self._hellos.sockets(), self.pending_writes(), [],
+                                                 self._hellos.timeout(timeout) )
+            for sock in wlist:
+                self.flush_outbox(self.client_of(sock))
+            for sock in rlist:
+                if sock is self.server:
+                    self.accept_resume()
+                else:
+                    self.read_hello(sock)
+            self.expire_hellos()
+        else:
+            try:
+                token, sock, received = self._resumes.get(timeout=timeout)
+            except queue.Empty:
+                return
+            self.resume(token, sock, received)
+
+        self.take_resumes()
+
+    def accept_resume(self):
+
+        """ Accept a connection on our own listening socket. Its HELLO is
+        read by read_hello as it comes in. """
+
+        sock, addr = self.server.accept()
+        print("Connection accepted from " + str(addr))
+
+        self._hellos.add(sock)
+
+    def read_hello(self, sock):
+
+        """ Read from a connection that is still saying hello. Only clients
+        coming back to this match, and spectators, are let in once it has
+        started. """
+
+        hello = self._hellos.read(sock)
+        if sock in self._hellos:
+            return
+
+        if hello and hello.get("spectate") is not None:
+            protocol.answer_hello(sock, hello)
+            self.add_spectator(sock)
+        elif not hello or not resume_session(sock, hello):
+            print("Turned away a connection, the match is already full.")
+            sock.close()
+
+    def expire_hellos(self):
+
+        for sock in self._hellos.expire():
+            print("Turned away a connection that did not say hello.")
+            sock.close()
+
+    def resume(self, token, sock, received):
+
+        """ Put a reconnected client back in place of its old connection.
+
+        The server sends its count of the bytes it has received from the
+        client, then everything the client did not get; the client does the
+        same the other way.
+        """
+
+        client = None
+        for candidate, candidate_token in self._tokens.items():
+            if candidate_token == token:
+                client = candidate
+
+        sent = self._sent.get(client, 0)
+        replay = self._replay.get(client, bytearray())
+        first = sent - len(replay)
+
+        if client is None or not first <= received <= sent:
+            print("Could not resume a client that has missed too much.")
+            sock.close()
+            return
+
+        name = self.get_wizard_from_client(client).name
+
+        # Everything the match keeps about the client stays under its first
+        # socket; only reads and writes go to the new one. The capabilities
+        # agreed on the first connection carry over.
+        sock.setblocking(True)
+        protocol.configure_socket(sock)
+        protocol.agree(sock, protocol.agreed(self.socket_of(client)))
+
+        old = self.socket_of(client)
+        old.close()
+        self._clients.pop(old, None)
+        self._sockets[client] = sock
+        self._clients[sock] = client
+
+        self._resumed[client] = self._resumed.get(client, 0) + 1
+        self._last_heard[client] = time.monotonic()
+        # The client sends again everything after the last whole frame.
+        self._partial.pop(client, None)
+
+        missed = replay[received - first:]
+        session = {"token":token, "received":self._received.get(client, 0)}
+
+        # What was waiting to go out is part of what was missed.
+        outbox = self.outbox(client)
+        outbox.clear()
+        outbox.put(protocol.pack_frame(protocol.SESSION, self.serialize(session)))
+        outbox.put(missed)
+
+        try:
+            outbox.flush(sock)
+        except OSError:
+            # Dropped again already, which the next read or write will find.
+            pass
+
+        print(name + " is back, sent " + str(len(missed)) + " bytes they missed.")
 
     def dead_response(self, data):
 
-        if data == b'':
+        if data is None:
             return True
         else:
             return False
 
-    def kill_connection(self):
-
-        print("Server shutting down.")
+    def kill_connection(self, reason=""):
 
-        c_list = self.get_clients()
+        """ Close every connection and end the match by raising
+        ConnectionLost. Only this match ends; the process keeps running. """
 
-        print("Killing clients.")
+        print("Server shutting down.")
 
-        for client in c_list:
-            client.shutdown(1)
-            client.close()
+        if reason:
+            print("Reason: " + reason)
 
-        print("Killing server.")
+        print("Killing clients and server.")
 
-        self.server.shutdown(1)
-        self.server.close()
+        self.close_connections()
 
         print("Server shut down.")
 
-        sys.exit()
+        raise ConnectionLost(reason)
 
     def msg_client_g(self, msg, client):
 
-        """ Send a generic string to the client. """
+        """ Send a generic string to the client as a one-way notice. Nothing
+        is waited for; if the client is backed up, the notice is dropped. """
 
-        self.msg_client("MSG", client)
-        msg_ack = self.recv(client)
+        seq = self._notice_seq.get(client, 0) + 1
+        self._notice_seq[client] = seq
 
-        if self.dead_response(msg_ack):
-            self.kill_connection()
-        else:
-            msg_ack = self.dec(msg_ack)
-            if msg_ack == "ACK_MSG":
-                self.msg_client(msg, client)
-                msg_ackack = self.recv(client)
+        outbox = self.outbox(client)
+        if outbox.over_high_water:
+            outbox.count_dropped_notice()
+            print("Dropped notice " + str(seq) + " for a slow client.")
+            return
 
-                if self.dead_response(msg_ackack):
-                    # Client is disconnected
-                    pass
-                else:
-                    pass
+        self.queue_bytes(client, protocol.pack_frame(protocol.NOTICE, protocol.pack_notice(seq, msg)))
 
-    def msg_client(self, msg, client):
+    def msg_client(self, msg, client, tag=protocol.CMD):
 
-        """ Encode the message (as a string) and send it to the client. """
+        """ Encode the message (as a string) and send it to the client.
+        Commands are sent as CMD frames, plain strings as TEXT frames. """
 
         print("Sending " + msg + " to client.")
-        client.send(msg.encode(self._ENC))
+        self.send_frame(client, tag, self.enc(msg))
 
     def msg_client_pp(self, msg, client):
 
-        """ Pickle an item and send it to the client. """
+        """ Encode an item and send it to the client. """
 
-        msg = self.pickle(msg)
-        client.send(msg)
+        self.msg_client_p(self.serialize(msg), client)
 
     def msg_client_p(self, msg, client):
 
-        """ Send the client a pickled item. """
+        """ Send the client an encoded item. """
 
-        client.send(msg)
+        self.send_frame(client, protocol.DATA, msg)
 
     def get_gestures(self):
 
@@ -557,7 +1352,10 @@ class Gamemaster:
 
         """ Decode encoded string and return it. """
 
-        return msg.decode(self._ENC)
+        try:
+            return msg.decode(self._ENC)
+        except UnicodeDecodeError as e:
+            self.kill_connection("A client sent text that could not be decoded: " + str(e))
 
     def enc(self, msg):
 
@@ -565,17 +1363,20 @@ class Gamemaster:
 
         return msg.encode(self._ENC)
 
-    def depickle(self, pickled_item):
+    def deserialize(self, data):
 
-        """ Return the depickled version of the item. """
+        """ Return the item encoded in data. """
 
-        return pickle.loads(pickled_item)
+        try:
+            return codec.decode(data)
+        except codec.CodecError as e:
+            self.kill_connection("A client sent a payload that could not be decoded: " + str(e))
 
-    def pickle(self, item):
+    def serialize(self, item):
 
-        """ Return the pickled version of the item. """
+        """ Return the encoded version of the item. """
 
-        return pickle.dumps(item)
+        return codec.encode(item)
 
 
     def get_client_gestures(self):
@@ -584,38 +1385,139 @@ class Gamemaster:
 
         c_list = self.get_clients()
 
+        self.begin_phase("gestures")
         self.msg_clients("GET_GESTURES")
 
+        for client in c_list:
+            self.send_status_snapshot(client)
+
         self.handle_client_gestures_and_status(c_list, required_submissions)
 
+    def get_enemy_hp(self, wizard):
+
+        """ Return the HP of the wizard's opponent. """
+
+        for other_wizard in self.wizards:
+            if other_wizard != wizard:
+                return other_wizard.hp
+
+        return 14
+
+    def get_field_monsters(self):
+
+        """ Return a dictionary of every monster on the field, in the
+        format {monster name:master name}. """
+
+        monsters = {}
+
+        for wizard in self.wizards:
+            for minion in wizard.minions:
+                monsters[minion.name] = minion.master.name
+
+        if self.field_elemental:
+            monsters[self.field_elemental.name.title()] = "nobody"
+
+        return monsters
+
+    def get_hand_histories(self, wizard):
+
+        """ Return the wizard's own hand histories as {hand:history}. """
+
+        history_dict = {"left":"", "right":""}
+
+        for hand in history_dict:
+            history_dict[hand] = wizard.get_hand(hand).show_history()
+
+        return history_dict
+
+    def build_status_snapshot(self, wizard):
+
+        """ Collect everything the client asks for with the STATUS_* and
+        REQUEST_HISTORY_* commands into a single dictionary. """
+
+        charmed_hand = wizard.charmed_hand or ""
+        paralyzed_hand = wizard.paralyzed_hand or ""
+
+        snapshot = {
+            "version":protocol.SNAPSHOT_VERSION,
+            "amnesia":wizard.amnesiac,
+            "blind":wizard.blinded,
+            "charmed":[bool(charmed_hand), charmed_hand],
+            "confusion":wizard.confused,
+            "fear":wizard.afraid,
+            "haste":wizard.hasted,
+            "hp":wizard.hp,
+            "enemy_hp":self.get_enemy_hp(wizard),
+            "monsters":self.get_field_monsters(),
+            "paralyzed":[bool(paralyzed_hand), paralyzed_hand],
+            "timestop":wizard.timestopped,
+            "history_self":self.get_hand_histories(wizard),
+            "history_others":{},
+        }
+
+        # Copied as strings, since the last snapshot sent is kept to diff
+        # against.
+        snapshot["history_others"] = wizard.get_perceived_history_strings()
+
+        return snapshot
+
+    def send_status_snapshot(self, client, full=False):
+
+        """ Push the wizard's status so that the client does not have to ask
+        for each field in turn. After the first complete snapshot only the
+        changes are sent, unless full is set. """
+
+        wizard = self.get_wizard_from_client(client)
+        snapshot = self.build_status_snapshot(wizard)
+
+        if client in self._status_sent and not full:
+            base, last = self._status_sent[client]
+            delta = status.diff_snapshot(last, snapshot, base, base + 1)
+            self._status_sent[client] = (base + 1, snapshot)
+
+            self.send_frame(client, protocol.STATUS_DELTA, self.serialize(delta))
+            print("Sent status delta " + str(base + 1) + " to " + wizard.name)
+        else:
+            state = self._status_sent.get(client, (0, None))[0] + 1
+            snapshot["state"] = state
+            self._status_sent[client] = (state, snapshot)
+
+            self.send_frame(client, protocol.STATUS, self.serialize(snapshot))
+            print("Sent status snapshot " + str(state) + " to " + wizard.name)
+
     def handle_client_gestures_and_status(self, c_list, required_submissions):
 
         gestures_got = []
 
         while len(gestures_got) < required_submissions:
 
-            rlist, wlist, elist = select.select( c_list, [], [] )
+            rlist = self.poll_clients([client for client in c_list if client not in gestures_got])
 
             for client in rlist:
 
-                request = client.recv(self._BUFFSIZE)
+                request = self.recv(client)
                 if self.response(request):
 
-                    request = request.decode(self._ENC)
+                    request = self.dec(request)
 
                     wizard = self.get_wizard_from_client(client)
 
+                    if request == "STATUS_RESYNC":
+
+                        print("Received STATUS_RESYNC from " + wizard.name)
+                        self.send_status_snapshot(client, full=True)
+
                     if request == "STATUS_AMNESIA":
 
                         print("Received STATUS_AMNESIA from " + wizard.name)
-                        status_amnesia = self.pickle(wizard.amnesiac)
+                        status_amnesia = self.serialize(wizard.amnesiac)
                         self.msg_client_p(status_amnesia, client)
                         print("Sent amnesia status [" + str(wizard.amnesiac) + "] to " + wizard.name)
 
                     if request == "STATUS_BLIND":
 
                         print("Received STATUS_BLIND from " + wizard.name)
-                        status_blind = self.pickle(wizard.blinded)
+                        status_blind = self.serialize(wizard.blinded)
                         self.msg_client_p(status_blind, client)
                         print("Sent blind status [" + str(wizard.afraid) + "] to " + wizard.name)
 
@@ -626,66 +1528,54 @@ class Gamemaster:
                             charmed = True
                         else:
                             charmed = False
-                        status_charmed = self.pickle([charmed, wizard.charmed_hand])
+                        status_charmed = self.serialize([charmed, wizard.charmed_hand])
                         self.msg_client_p(status_charmed, client)
                         print("Sent charmed status [" + str(charmed) + "] to " + wizard.name)
 
                     if request == "STATUS_CONFUSION":
 
                         print("Received STATUS_CONFUSION from " + wizard.name)
-                        status_confusion = self.pickle(wizard.confused)
+                        status_confusion = self.serialize(wizard.confused)
                         self.msg_client_p(status_confusion, client)
                         print("Sent confusion status [" + str(wizard.confused) + "] to " + wizard.name)
 
                     if request == "STATUS_FEAR":
 
                         print("Received STATUS_FEAR from " + wizard.name)
-                        status_fear = self.pickle(wizard.afraid)
+                        status_fear = self.serialize(wizard.afraid)
                         self.msg_client_p(status_fear, client)
                         print("Sent fear status [" + str(wizard.afraid) + "] to " + wizard.name)
 
                     if request == "STATUS_HASTE":
 
                         print("Received STATUS_HASTE from " + wizard.name)
-                        status_haste = self.pickle(wizard.hasted)
+                        status_haste = self.serialize(wizard.hasted)
                         self.msg_client_p(status_haste, client)
                         print("Sent haste status [" + str(wizard.hasted) + "] to " + wizard.name)
 
                     if request == "STATUS_HP":
 
                         print("Received STATUS_HP from " + wizard.name)
-                        status_hp = self.pickle(wizard.hp)
+                        status_hp = self.serialize(wizard.hp)
                         self.msg_client_p(status_hp, client)
                         print("Sent HP status [" + str(wizard.hp) + "] to " + wizard.name)
 
                     if request == "STATUS_ENEMY_HP":
 
-                        who_wiz_hp = 14
+                        who_wiz_hp = self.get_enemy_hp(wizard)
 
-                        for who_wizard in self.wizards:
-                            if who_wizard != wizard:
-                                who_wiz_hp = who_wizard.hp
-                                break
-
-                        print("Received STATUS_HP from " + wizard.name)
-                        status_enemy_hp = self.pickle(who_wiz_hp)
+                        print("Received STATUS_ENEMY_HP from " + wizard.name)
+                        status_enemy_hp = self.serialize(who_wiz_hp)
                         self.msg_client_p(status_enemy_hp, client)
                         print("Sent enemy HP status [" + str(who_wiz_hp) + "] to " + wizard.name)
 
                     if request == "STATUS_MONSTERS":
 
                         # name:master
-                        monsters = {}
-
-                        for wizard in self.wizards:
-                            for minion in wizard.minions:
-                                monsters[minion.name] = minion.master.name
-
-                        if self.field_elemental:
-                            monsters[self.field_elemental.name.title()] = "nobody"
+                        monsters = self.get_field_monsters()
 
                         print("Received STATUS_MONSTERS from " + wizard.name)
-                        status_monsters = self.pickle(monsters)
+                        status_monsters = self.serialize(monsters)
                         self.msg_client_p(status_monsters, client)
                         print("Sent monster status to " + wizard.name)
 
@@ -699,59 +1589,57 @@ class Gamemaster:
                         paralyzed = False
                         if p_hand:
                             paralyzed = True
-                        status_paralyzed = self.pickle([paralyzed, p_hand])
+                        status_paralyzed = self.serialize([paralyzed, p_hand])
                         self.msg_client_p(status_paralyzed, client)
                         print("Sent paralysis status [" + str(paralyzed) + "], [" + p_hand + "] to " + wizard.name)
 
                     if request == "STATUS_TIMESTOP":
 
                         print("Received STATUS_TIMESTOP from " + wizard.name)
-                        status_timestop = self.pickle(wizard.timestopped)
+                        status_timestop = self.serialize(wizard.timestopped)
                         self.msg_client_p(status_timestop, client)
                         print("Sent timestop status [" + str(wizard.timestopped) + "]")
 
                     if request == "REQUEST_HISTORY_SELF":
 
                         print("Received REQUEST_HISTORY_SELF from " + wizard.name)
-                        
-                        history_dict = {"left":"", "right":""}
 
-                        hands = ("left", "right")
-                        for hand in hands:
-                            history_dict[hand] = wizard.get_hand(hand).show_history()
-                            
-                        history_dict_p = self.pickle(history_dict)
+                        history_dict = self.get_hand_histories(wizard)
+
+                        history_dict_p = self.serialize(history_dict)
                         self.msg_client_p(history_dict_p, client)
 
-                        print("Pickled hand history sent to " + wizard.name)
+                        print("Encoded hand history sent to " + wizard.name)
 
                     if request == "REQUEST_HISTORY_OTHERS":
 
                         print("Received REQUEST_HISTORY_OTHERS from " + wizard.name)
 
-                        history_dict = wizard.perceived_history
+                        history_dict = wizard.get_perceived_history_strings()
 
-                        history_dict_p = self.pickle(history_dict)
+                        history_dict_p = self.serialize(history_dict)
                         self.msg_client_p(history_dict_p, client)
 
-                        print("Pickled perceived history sent to " + wizard.name)
+                        print("Encoded perceived history sent to " + wizard.name)
 
                     if request == "GESTURES_COMPLETE":
 
+                        # The encoded gestures follow the command directly.
                         print("Received GESTURES_COMPLETE from " + wizard.name)
-                        self.msg_client("RECEIVE_GESTURES", client)
-                        print("Sent RECEIVE_GESTURES to " + wizard.name)
-                        gestures_dict = client.recv(self._BUFFSIZE)
-                        gestures_dict = self.depickle(gestures_dict)
-                        wizard.c_hands = gestures_dict
-                        gestures_got.append(client)
+                        gestures_dict = self.recv(client)
+                        if self.response(gestures_dict, "Client died before sending its gestures."):
+                            gestures_dict = self.deserialize(gestures_dict)
+                            wizard.c_hands = gestures_dict
+                            gestures_got.append(client)
 
                         if len(gestures_got) < required_submissions:
                             self.wait_msg(client, "Waiting for challenger to submit gestures...")
 
     def get_gestures_from_client(self, client_to_get):
 
+        self.begin_phase("gestures")
         self.msg_client("GET_GESTURES", client_to_get)
+        self.send_status_snapshot(client_to_get)
 
         self.handle_client_gestures_and_status([client_to_get], 1)
 
@@ -762,31 +1650,31 @@ class Gamemaster:
 
             for client in rlist:
 
-                request = client.recv(self._BUFFSIZE)
+                request = self.recv(client)
                 if self.response(request):
 
-                    request = request.decode(self._ENC)
+                    request = self.dec(request)
 
                     wizard = self.get_wizard_from_client(client)
 
                     if request == "STATUS_BLIND":
 
                         print("Received STATUS_BLIND from " + wizard.name)
-                        status_blind = self.pickle(wizard.blinded)
+                        status_blind = self.serialize(wizard.blinded)
                         self.msg_client_p(status_blind, client)
                         print("Sent blind status [" + str(wizard.afraid) + "] to " + wizard.name)
 
                     if request == "STATUS_FEAR":
 
                         print("Received STATUS_FEAR from " + wizard.name)
-                        status_fear = self.pickle(wizard.afraid)
+                        status_fear = self.serialize(wizard.afraid)
                         self.msg_client_p(status_fear, client)
                         print("Sent fear status [" + str(wizard.afraid) + "] to " + wizard.name)
 
                     if request == "STATUS_HASTE":
 
                         print("Received STATUS_HASTE from " + wizard.name)
-                        status_haste = self.pickle(wizard.hasted)
+                        status_haste = self.serialize(wizard.hasted)
                         self.msg_client_p(status_haste, client)
                         print("Sent haste status [" + str(wizard.hasted) + "] to " + wizard.name)
 
@@ -801,7 +1689,7 @@ class Gamemaster:
                                 break
 
                         print("Received STATUS_HP from " + wizard.name)
-                        status_enemy_hp = self.pickle(who_wiz_hp)
+                        status_enemy_hp = self.serialize(who_wiz_hp)
                         self.msg_client_p(status_enemy_hp, client)
                         print("Sent enemy HP status [" + str(who_wiz_hp) + "] to " + wizard.name)
 
@@ -809,14 +1697,14 @@ class Gamemaster:
                     if request == "STATUS_HP":
 
                         print("Received STATUS_HP from " + wizard.name)
-                        status_hp = self.pickle(wizard.hp)
+                        status_hp = self.serialize(wizard.hp)
                         self.msg_client_p(status_hp, client)
                         print("Sent HP status [" + str(wizard.hp) + "] to " + wizard.name)
 
                     if request == "STATUS_TIMESTOP":
 
                         print("Received STATUS_TIMESTOP from " + wizard.name)
-                        status_timestop = self.pickle(wizard.timestopped)
+                        status_timestop = self.serialize(wizard.timestopped)
                         self.msg_client_p(status_timestop, client)
                         print("Sent timestop status [" + str(wizard.timestopped) + "]")
 
@@ -830,21 +1718,21 @@ class Gamemaster:
                         for hand in hands:
                             history_dict[hand] = wizard.get_hand(hand).show_history()
                             
-                        history_dict_p = self.pickle(history_dict)
+                        history_dict_p = self.serialize(history_dict)
                         self.msg_client_p(history_dict_p, client)
 
-                        print("Pickled hand history sent to " + wizard.name)
+                        print("Encoded hand history sent to " + wizard.name)
 
                     if request == "REQUEST_HISTORY_OTHERS":
 
                         print("Received REQUEST_HISTORY_OTHERS from " + wizard.name)
 
-                        history_dict = wizard.perceived_history
+                        history_dict = wizard.get_perceived_history_strings()
 
-                        history_dict_p = self.pickle(history_dict)
+                        history_dict_p = self.serialize(history_dict)
                         self.msg_client_p(history_dict_p, client)
 
-                        print("Pickled perceived history sent to " + wizard.name)
+                        print("Encoded perceived history sent to " + wizard.name)
 
                     if request == "GESTURES_COMPLETE":
 
@@ -852,7 +1740,7 @@ class Gamemaster:
                         self.msg_client("RECEIVE_GESTURES", client)
                         print("Sent RECEIVE_GESTURES to " + wizard.name)
                         gestures_dict = client.recv(self._BUFFSIZE)
-                        gestures_dict = self.depickle(gestures_dict)
+                        gestures_dict = self.deserialize(gestures_dict)
                         wizard.c_hands = gestures_dict
                         gestures_got.append(client)
                         """
@@ -909,18 +1797,17 @@ class Gamemaster:
         client = wizard.client
 
         self.msg_client("DELAYED_SPELL_RELEASE_QUERY", client)
-        if self.response(self.recv(client), "Client died while server waited for response to DELAYED_SPELL_RELEASE_QUERY."):
-            data_p = delayed_spell.name
-            self.msg_client_pp(data_p, client)
-            answer = self.recv(client)
-            if self.response(answer, "Client died while server waited for an answer on the delayed spell query."):
-                answer = self.depickle(answer)
-
-                if answer == True or answer == False:
-                    return answer
-                else:
-                    print("Received an unusual format for answer, returning False: [" + str(answer) + "]")
-                    return False
+        data_p = delayed_spell.name
+        self.msg_client_pp(data_p, client)
+        answer = self.recv(client)
+        if self.response(answer, "Client died while server waited for an answer on the delayed spell query."):
+            answer = self.deserialize(answer)
+
+            if answer == True or answer == False:
+                return answer
+            else:
+                print("Received an unusual format for answer, returning False: [" + str(answer) + "]")
+                return False
 
     def handle_gesture_phase(self, wizard):
 
@@ -1008,6 +1895,64 @@ class Gamemaster:
             if other_wizard != wizard:
                 other_wizard.add_broadcasted_gesture(wizard)
 
+        self._public_gestures.setdefault(wizard.name, []).append(self.get_public_gestures(wizard))
+
+    def get_public_gestures(self, wizard):
+
+        """ Return the latest gestures of the wizard as {hand:gesture}, as
+        anyone watching could see them. An invisible wizard can only be
+        heard snapping and clapping. """
+
+        gestures = {}
+
+        for hand in ("left", "right"):
+            gesture = wizard.get_latest_gesture(hand)
+            if wizard.invisible and gesture.lower() != "s" and gesture != "C":
+                gesture = "?"
+            gestures[hand] = gesture
+
+        return gestures
+
+    def add_spectator(self, sock):
+
+        """ Start sending the match to a spectator. May be called from any
+        thread. """
+
+        protocol.configure_socket(sock)
+
+        welcome = {"match":self.match_id,
+                   "wizards":{wizard.name:wizard.hp for wizard in self.wizards}}
+        greeting = (protocol.pack_frame(protocol.CMD, b"SPECTATE")
+                    + protocol.pack_frame(protocol.DATA, self.serialize(welcome)))
+
+        compressed = compression.capability() in protocol.agreed(sock)
+        self._spectators.add(sock, greeting, compressed)
+
+        print("A spectator is watching match " + self.match_id + " (" + str(len(self._spectators)) + " watching)")
+
+    def show_spectators(self, report):
+
+        """ Send the round to every spectator: the gestures made, where
+        everyone stands, and the round report the players got. The round is
+        put together once, whatever the number of spectators. """
+
+        gestures, self._public_gestures = self._public_gestures, {}
+
+        if not len(self._spectators):
+            return
+
+        summary = {"gestures":gestures,
+                   "wizards":{wizard.name:wizard.hp for wizard in self.wizards}}
+        data = (protocol.pack_frame(protocol.CMD, b"SPECTATOR_ROUND")
+                + protocol.pack_frame(protocol.DATA, self.serialize(summary))
+                + report)
+
+        packed = None
+        if self._COMPRESS_MIN is not None and len(data) >= self._COMPRESS_MIN:
+            packed = protocol.pack_compressed(data)
+
+        self._spectators.broadcast(data, packed)
+
     def erase_perceived_history(self, wizard):
 
         """ When a wizard is hit with Anti-spell, erase their perceived
@@ -1034,12 +1979,12 @@ class Gamemaster:
 
     def msg_client_i(self, int_to_pass, client):
 
-        bytes_i = (int_to_pass).to_bytes(4, "big")
-        client.send(bytes_i)
+        self.send_frame(client, protocol.INT, protocol.encode_int(int_to_pass))
 
-    def print_flavor_messages(self):
+    def print_flavor_messages(self, wait_for_ready=True):
 
-        """ Send the list of flavor messages to each client. """
+        """ Send the list of flavor messages to each client, then wait for
+        each client to say it is ready for the next turn. """
 
         flavor_p = []
 
@@ -1057,22 +2002,32 @@ class Gamemaster:
         for line in flavor_p:
             print(line)
 
-        flavor_p.append("\0")
+        # The report is framed once and streamed to every client, one FLAVOR
+        # frame per line, so the client can print the first line while the
+        # rest are still on their way.
+        report = [protocol.pack_frame(protocol.CMD, b"PRINT_FLAVOR")]
+        for line in flavor_p:
+            report.append(protocol.pack_frame(protocol.FLAVOR, line.encode(self._ENC)))
+        report.append(protocol.pack_frame(protocol.FLAVOR_END))
+
+        c_list = self.get_clients()
 
-        flavor_p = self.pickle(flavor_p)
-        
+        report = b"".join(report)
 
         print("Sending PRINT_FLAVOR to clients.")
-        self.msg_clients("PRINT_FLAVOR")
+        self.stream_to_clients(report, c_list)
+        self.show_spectators(report)
+
+        if not wait_for_ready:
+            return
+
+        self.begin_phase("ready")
 
-        c_list = self.get_clients()
         ready_list = []
 
         while len(ready_list) < self._NUMBER_OF_WIZARDS:
 
-            rlist, wlist, elist = select.select( c_list, [], [] )
-
-            
+            rlist = self.poll_clients([client for client in c_list if client not in ready_list])
 
             for client in rlist:
 
@@ -1080,30 +2035,6 @@ class Gamemaster:
                 if self.response(ack, "Client died during flavor phase."):
                     ack = self.dec(ack)
 
-                    if ack == "PRINT_FLAVOR_ACK":
-                        print("Received PRINT_FLAVOR_ACK from " + self.get_wizard_from_client(client).name)
-                        size = len(flavor_p)
-                        wiz = self.get_wizard_from_client(client).name
-                        print("Outgoing size is " + str(size) + " for " + wiz)
-                        self.msg_client_i(size, client)
-                        if self.response(self.recv(client), "Client died before sending SIZE_ACK"):
-                            sent_size = 0
-                            while sent_size < size:
-                                sent = client.send(flavor_p[sent_size:])
-                                print("Sent: " + str(sent) + " to " + wiz)
-                                sent_size += sent
-                                if sent == 0:
-                                    break
-                                confirmation = self.recv(client)
-                                if self.response(confirmation):
-                                    if self.dec(confirmation) == "MORE_DATA":
-                                        print("Received MORE_DATA from " + wiz)
-                                    if self.dec(confirmation) == "DATA_DONE":
-                                        print("Received DATA_DONE from " + wiz)
-                                        break
-                            sent_size = 0
-                            #self.msg_client_p(flavor_p, client)
-
                     if ack == "NEXT_TURN_READY":
                         print("Received NEXT_TURN_READY from " + self.get_wizard_from_client(client).name)
                         ready_list.append(client)
@@ -1111,6 +2042,14 @@ class Gamemaster:
                         if len(ready_list) < self._NUMBER_OF_WIZARDS:
                             self.wait_msg(client, "Waiting for challenger to review round end...")
 
+    def stream_to_clients(self, data, c_list):
+
+        """ Send the same bytes to every client. Each client is written to as
+        fast as it reads, so one slow reader does not hold up the rest. """
+
+        for client in c_list:
+            self.send_bytes(client, data)
+
     @property
     def stab_targets(self):
         return self._stab_targets
@@ -1145,7 +2084,7 @@ class Gamemaster:
 
     def clear_spell_targets(self):
 
-        self._spell_targets = []
+        self._spell_targets = SpellQueue()
 
     def add_spell_target(self, caster, target, spell):
 
@@ -1153,7 +2092,7 @@ class Gamemaster:
             for later resolution. They are stored as tuples in the argument
             format. """
 
-        self.spell_targets.append((caster, target, spell))
+        self.spell_targets.add(caster, target, spell)
 
     def get_additional_gestures(self):
 
@@ -1263,20 +2202,18 @@ class Gamemaster:
             spell_name = spell.name
 
             self.msg_client("OFFER_PERMANENCY", client)
-            if self.response(self.recv(client), "Client died during OFFER_PERMANENCY request"):
-                # OFFER_PERMANENCY_ACK
-                self.msg_client(spell_name, client)
-                choice = self.recv(client)
-                if self.response(choice, "Client died while server waited for Permanency answer."):
-                    choice = self.depickle(choice)
-
-                    if choice == True:
-                        self.add_flavor("The effects of " + spell.name + " are locked in a time loop on " + target.name + "!")
-                        caster.permanency_primed = False
-                        caster.permanency_duration = 3
-                        target.add_permanency(target, spell.name)
-                    else:
-                        print(str(choice) + " choice for permanency.")
+            self.msg_client(spell_name, client, protocol.TEXT)
+            choice = self.recv(client)
+            if self.response(choice, "Client died while server waited for Permanency answer."):
+                choice = self.deserialize(choice)
+
+                if choice == True:
+                    self.add_flavor("The effects of " + spell.name + " are locked in a time loop on " + target.name + "!")
+                    caster.permanency_primed = False
+                    caster.permanency_duration = 3
+                    target.add_permanency(target, spell.name)
+                else:
+                    print(str(choice) + " choice for permanency.")
 
     def timestopped_process_turn(self, timestopped):
 
@@ -1707,7 +2644,7 @@ class Gamemaster:
 
             delayables = []
 
-            for spell_tuple in self.spell_targets:
+            for spell_tuple in self.spell_targets.by_caster(caster):
                 s_caster, s_target, s_spell = spell_tuple
                 if s_spell.name != "Delayed Effect" and s_caster == caster:
                     delayables.append(spell_tuple)
@@ -1716,31 +2653,29 @@ class Gamemaster:
 
                 client = caster.client
 
-                self.msg_client("DELAYED_SPELL_STORE_QUERY", client)
-                if self.response(self.recv(client), "Client died while server waited for response to DELAYED_SPELL_STORE_QUERY"):
-
-                    delayable_names = []
+                delayable_names = []
 
-                    for delayable_spell_tuple in delayables:
-                        delayable_names.append(delayable_spell_tuple[2].name)
+                for delayable_spell_tuple in delayables:
+                    delayable_names.append(delayable_spell_tuple[2].name)
 
-                    self.msg_client_pp(delayable_names, client)
-                    spell_name = self.recv(client)
-                    if self.response(spell_name, "Client died while server waited for delayed spell storage spell name."):
-                        spell_name = self.dec(spell_name)
+                self.msg_client("DELAYED_SPELL_STORE_QUERY", client)
+                self.msg_client_pp(delayable_names, client)
+                spell_name = self.recv(client)
+                if self.response(spell_name, "Client died while server waited for delayed spell storage spell name."):
+                    spell_name = self.dec(spell_name)
 
-                        print("Received spell_name of " + spell_name)
+                    print("Received spell_name of " + spell_name)
 
-                        if spell_name == "none":
-                            spell = None
-                        else:
-                            # Find out what the spell is from the string returned.
-                            for spell_tuple in delayables:
-                                spell_t_name = spell_tuple[2].name
-                                print("Comparing " + spell_t_name + " with " + spell_name)
-                                if spell_t_name == spell_name:
-                                    spell = spell_tuple
-                                    break
+                    if spell_name == "none":
+                        spell = None
+                    else:
+                        # Find out what the spell is from the string returned.
+                        for spell_tuple in delayables:
+                            spell_t_name = spell_tuple[2].name
+                            print("Comparing " + spell_t_name + " with " + spell_name)
+                            if spell_t_name == spell_name:
+                                spell = spell_tuple
+                                break
 
                         
                 """
@@ -1792,7 +2727,7 @@ class Gamemaster:
 
             permanencies = []
 
-            for spell_tuple in self.spell_targets:
+            for spell_tuple in self.spell_targets.by_caster(caster):
                 s_caster, s_target, s_spell = spell_tuple
                 if s_spell.name in valid_permanencies and s_caster == caster:
                     permanencies.append(spell_tuple)
@@ -1801,26 +2736,25 @@ class Gamemaster:
 
                 client = caster.client
 
+                permanency_names = []
+                for stt_tuple in permanencies:
+                    permanency_names.append(stt_tuple[2].name)
+
                 self.msg_client("GET_PERMANENT", client)
-                if self.response(self.recv(client), "Client died before sending GET_PERMANENT_ACK"):
-                    permanency_names = []
-                    for stt_tuple in permanencies:
-                        permanency_names.append(stt_tuple[2].name)
-
-                    data_p = self.pickle(permanency_names)
-                    self.msg_client_p(data_p, client)
-                    spell_name = self.recv(client)
-                    if self.response(spell_name, "Client died before sending spell response for Permanency."):
-                        spell_name = self.dec(spell_name)
-
-                        if spell_name == "none":
-                            spell = None
-                        else:
-                            for stt_tuple in permanencies:
-                                stt_name = stt_tuple[2].name
-                                if spell_name == stt_name:
-                                    spell = stt_tuple
-                                    break
+                data_p = self.serialize(permanency_names)
+                self.msg_client_p(data_p, client)
+                spell_name = self.recv(client)
+                if self.response(spell_name, "Client died before sending spell response for Permanency."):
+                    spell_name = self.dec(spell_name)
+
+                    if spell_name == "none":
+                        spell = None
+                    else:
+                        for stt_tuple in permanencies:
+                            stt_name = stt_tuple[2].name
+                            if spell_name == stt_name:
+                                spell = stt_tuple
+                                break
 
         return spell
 
@@ -1945,7 +2879,7 @@ class Gamemaster:
 
                 too_powerful = False
 
-                for spell_targets_tuple in self.spell_targets:
+                for spell_targets_tuple in self.spell_targets.targeting(target):
                     stt_caster, stt_target, stt_spell = spell_targets_tuple
                     if target == stt_target:
                         if stt_spell.name == "Finger of Death":
@@ -1998,7 +2932,7 @@ class Gamemaster:
                 else:
                     self.add_flavor("The new Magic Mirror melds into the original!")
 
-                for spell_target_tuple in self.spell_targets:
+                for spell_target_tuple in self.spell_targets.targeting(target):
                     if spell_target_tuple is not spell_tuple:
                         stt_caster, stt_target, stt_spell = spell_target_tuple
                         if stt_target is target:
@@ -2035,7 +2969,7 @@ class Gamemaster:
 
                 spell_tuples_to_remove = []
 
-                for s_spell_tuple in self.spell_targets:
+                for s_spell_tuple in self.spell_targets.targeting(target):
                     if s_spell_tuple is not spell_tuple:
                         s_caster, s_target, s_spell = s_spell_tuple
                         if s_target == target:
@@ -2143,66 +3077,60 @@ class Gamemaster:
                 self.add_flavor(target.name + " wields the power to give life to the dead!")
 
                 self.msg_client("RAISE_DEAD", client)
-                ack = self.recv(client)
 
-                if self.response(ack, "Client died while processing RAISE_DEAD"):
-                    ack = self.dec(ack)
+                minion_graveyard_c = self.targetables_to_targetableclients(self.minion_graveyard)
+                living_targets_c = self.targetables_to_targetableclients(self.targets)
 
-                    if ack == "RAISE_DEAD_ACK":
+                data_p = [minion_graveyard_c, living_targets_c]
 
-                        minion_graveyard_c = self.targetables_to_targetableclients(self.minion_graveyard)
-                        living_targets_c = self.targetables_to_targetableclients(self.targets)
+                self.msg_client_pp(data_p, client)
+                c_target = self.recv(client)
 
-                        data_p = [minion_graveyard_c, living_targets_c]
+                if self.response(c_target, "Client died before sending target for Raise Dead."):
+                    c_target = self.dec(c_target)
 
-                        self.msg_client_pp(data_p, client)
-                        c_target = self.recv(client)
+                    found = False
+                    undead = False
 
-                        if self.response(c_target, "Client died before sending target for Raise Dead."):
-                            c_target = self.dec(c_target)
-                            
-                            found = False
-                            undead = False
-
-                            for dead in self.minion_graveyard:
-                                if dead.name == c_target:
-                                    target = dead
-                                    undead = True
-                                    found = True
-                                    break
+                    for dead in self.minion_graveyard:
+                        if dead.name == c_target:
+                            target = dead
+                            undead = True
+                            found = True
+                            break
 
-                            if not found:
-                                for alive in self.targets:
-                                    if alive.name == c_target:
-                                        target = alive
-                                        found = True
-                                        break
-
-                            if not found:
-                                print("Could not find target by the name of [" + c_target + "]")
-
-                            if undead:
-                                zombie = target
-                                self.add_flavor(zombie.name.title() + " is raised from the dead by " + caster.name + "!")
-                                zombie.hp = zombie.maxhp
-                                if type(zombie) is Minion:
-                                    zombie.master = caster
-                                    zombie.original_master = caster
-                                    zombie.master.add_minion(zombie)
-                                    self.add_target(zombie)
-                                    self.command_existing_monsters()
-                                    self.minion_graveyard.remove(zombie)
-                                elif type(zombie) is Elemental:
-                                    # Let finalize_elemental_summon() handle adding
-                                    # the target and removing from the graveyard,
-                                    # since there are special cases regarding multiple
-                                    # elementals being summoned.
-                                    self.finalize_elemental_summon(zombie.element)
+                    if not found:
+                        for alive in self.targets:
+                            if alive.name == c_target:
+                                target = alive
+                                found = True
+                                break
 
-                            else:
-                                # Living target!
-                                self.add_flavor(target.name.title() + " is revitalized by the spell!")
-                                target.hp = target.hp + 5
+                    if not found:
+                        print("Could not find target by the name of [" + c_target + "]")
+
+                    if undead:
+                        zombie = target
+                        self.add_flavor(zombie.name.title() + " is raised from the dead by " + caster.name + "!")
+                        zombie.hp = zombie.maxhp
+                        if type(zombie) is Minion:
+                            zombie.master = caster
+                            zombie.original_master = caster
+                            zombie.master.add_minion(zombie)
+                            self.add_target(zombie)
+                            self.command_existing_monsters()
+                            self.minion_graveyard.remove(zombie)
+                        elif type(zombie) is Elemental:
+                            # Let finalize_elemental_summon() handle adding
+                            # the target and removing from the graveyard,
+                            # since there are special cases regarding multiple
+                            # elementals being summoned.
+                            self.finalize_elemental_summon(zombie.element)
+
+                    else:
+                        # Living target!
+                        self.add_flavor(target.name.title() + " is revitalized by the spell!")
+                        target.hp = target.hp + 5
 
             elif spell.name == "Cure Light Wounds":
 
@@ -2270,11 +3198,8 @@ class Gamemaster:
 
                 # Is a fire storm being cast?
 
-                for s_spell_tuple in self.spell_targets:
-                    s_spell = s_spell_tuple[2]
-                    if s_spell.name == "Fire Storm":
-                        self.firestorm = True
-                        break
+                if self.spell_targets.contains_spell("Fire Storm"):
+                    self.firestorm = True
 
                 if self.firestorm:
                     self.add_flavor("The wind whistles and the temperature drops as an ice storm starts to take shape...")
@@ -2578,27 +3503,20 @@ class Gamemaster:
         client = caster.client
 
         self.msg_client("ENCHANTMENT_PARALYSIS", client)
-        print("Sent ENCHANTMENT_PARALYSIS to client, waiting on PARALYSIS_ACK")
-        ack = self.recv(client)
-        if self.response(ack, "Client died while server waited on PARALYSIS_ACK"):
-            ack = self.dec(ack)
-
-            if ack == "PARALYSIS_ACK":
-
-                self.msg_client_pp(target.name, client)
-                print("Received PARALYSIS_ACK, sent pickled target name")
-                choice = self.recv(client)
-                if self.response(choice, "Client died while server waited on paralysis choice."):
-                    choice = int(self.dec(choice))
-                    print("Received paralysis choice from client")
-
-                    if choice == 1:
-                        return "left"
-                    elif choice == 2:
-                        return "right"
-                    else:
-                        print("paralysis_choose_hand returned unknown choice.")
-                        return "left"
+        self.msg_client_pp(target.name, client)
+        print("Sent ENCHANTMENT_PARALYSIS and encoded target name to client")
+        choice = self.recv(client)
+        if self.response(choice, "Client died while server waited on paralysis choice."):
+            choice = int(self.dec(choice))
+            print("Received paralysis choice from client")
+
+            if choice == 1:
+                return "left"
+            elif choice == 2:
+                return "right"
+            else:
+                print("paralysis_choose_hand returned unknown choice.")
+                return "left"
 
     def charm_person_get_hand_and_gesture(self, caster, target):
 
@@ -2608,19 +3526,18 @@ class Gamemaster:
         client = caster.client
 
         self.msg_client("ENCHANTMENT_CHARM_PERSON", client)
-        if self.response(self.recv(client), "Client died while server waiting for response after sending CHARM_PERSON"):
-            # Send the enemy name as an encoded string.
-            self.msg_client(target.name, client)
-            data_p = self.recv(client)
-            if self.response(data_p, "Client died while server waited on charm person choices."):
-                charmed_hand, charmed_gesture = self.depickle(data_p)
-                # We are expecting it in the form "left", "c" for example.
-                if charmed_gesture == "$":
-                    target.charmed_stab_override = self.get_target(caster, "stab by " + target.name)
+        # Send the enemy name as an encoded string.
+        self.msg_client(target.name, client, protocol.TEXT)
+        data_p = self.recv(client)
+        if self.response(data_p, "Client died while server waited on charm person choices."):
+            charmed_hand, charmed_gesture = self.deserialize(data_p)
+            # We are expecting it in the form "left", "c" for example.
+            if charmed_gesture == "$":
+                target.charmed_stab_override = self.get_target(caster, "stab by " + target.name)
 
-                charm_tuple = (charmed_hand.lower(), charmed_gesture.lower())
+            charm_tuple = (charmed_hand.lower(), charmed_gesture.lower())
 
-                return charm_tuple
+            return charm_tuple
 
         """
         print(caster.name + ": Choose which of " + target.name + "\'s hands will be controlled.")
@@ -2722,7 +3639,7 @@ class Gamemaster:
 
     def get_random_target(self):
         
-        random_target = randint(0, len(self.targets)-1)
+        random_target = self.rng.randint(0, len(self.targets)-1)
         return self.targets[random_target]
 
     def check_enchantments(self, target, incoming_enchantment):
@@ -2738,7 +3655,7 @@ class Gamemaster:
 
         warp_enchantment = False
 
-        for spell_tuple in self.spell_targets:
+        for spell_tuple in self.spell_targets.targeting(target):
             st_spell = spell_tuple[2]
             st_target = spell_tuple[1]
             if st_spell.name in enchantment_spells:
@@ -2943,27 +3860,15 @@ class Gamemaster:
         target.hp = target.hp - 3
 
     def spell_list_contains(self, spell_name):
-        
-        for spell in self.spell_targets:
-            # This is a tuple of caster, target, spell.
-            name = spell[2].name
-            if name == spell_name:
-                return True
-            
-        return False        
+
+        return self.spell_targets.contains_spell(spell_name)
 
     def get_spell_tuple(self, spell_name):
         """ Return the first instance of the spell encountered in the spell
-            encountered in the spell_targets list.
+            encountered in the spell_targets list, or None.
         """
 
-        for spell_tuple in self.spell_targets:
-            spell = spell_tuple[2]
-            if spell.name == spell_name:
-                return spell_tuple
-
-        # Shouldn't happen
-        return None
+        return self.spell_targets.first(spell_name)
 
     def handle_summoning(self):
 
@@ -2985,19 +3890,17 @@ class Gamemaster:
                 client = caster.client
 
                 self.msg_client("SUMMON_ELEMENTAL", client)
-                if self.response(self.recv(client), "Client died while server waited for SUMMON_ELEMENTAL_ACK"):
-                    self.msg_client("SUMMON_ELEMENTAL_CONTINUE", client)
-                    element = self.recv(client)
-                    if self.response(element, "Client died while server waited on elemental type."):
-                        element = int(self.dec(element))
-
-                        if element == 1:
-                            self.finalize_elemental_summon("fire")
-                        elif element == 2:
-                            self.finalize_elemental_summon("ice")
-                        else:
-                            print("Received unknown element choice, using fire")
-                            self.finalize_elemental_summon("fire")
+                element = self.recv(client)
+                if self.response(element, "Client died while server waited on elemental type."):
+                    element = int(self.dec(element))
+
+                    if element == 1:
+                        self.finalize_elemental_summon("fire")
+                    elif element == 2:
+                        self.finalize_elemental_summon("ice")
+                    else:
+                        print("Received unknown element choice, using fire")
+                        self.finalize_elemental_summon("fire")
 
     def finalize_elemental_summon(self, element):
 
@@ -3065,7 +3968,7 @@ class Gamemaster:
                 summon_rank = summon_dict[spell.name][1]
 
                 monster = Minion(summon_name, summon_rank)
-                monster.name = groblenames.get_random_name()
+                monster.name = groblenames.get_random_name(self.rng)
                 if type(target) is Minion:
                     #monster.name = target.master.name + "\'s " + monster.name
                     target.master.add_minion(monster)
@@ -3129,22 +4032,17 @@ class Gamemaster:
 
                     target = minion.target
 
+                    target_list = self.targetables_to_targetableclients(self.targets)
+                    minion_c = self.targetable_to_targetableclient(minion)
+                    data_p = [target_list, minion_c]
+
                     self.msg_client("COMMAND_MONSTER", wizard.client)
-                    ack = self.recv(wizard.client)
+                    self.msg_client_pp(data_p, wizard.client)
 
-                    if self.response(ack, "Client died during COMMAND_MONSTER"):
-                        
-                        ack = self.dec(ack)
-                        if ack == "COMMAND_MONSTER_ACK":
-                            target_list = self.targetables_to_targetableclients(self.targets)
-                            minion_c = self.targetable_to_targetableclient(minion)
-                            data_p = [target_list, minion_c]
-                            self.msg_client_pp(data_p, wizard.client)
-
-                            c_target = self.recv(wizard.client)
-                            if self.response(c_target, "Client died before it could sent monster target data"):
-                                c_target = self.dec(c_target)
-                                target = self.find_target_from_ctarget(c_target)
+                    c_target = self.recv(wizard.client)
+                    if self.response(c_target, "Client died before it could sent monster target data"):
+                        c_target = self.dec(c_target)
+                        target = self.find_target_from_ctarget(c_target)
 
                                 
                     """
@@ -3216,8 +4114,6 @@ class Gamemaster:
 
         for wizard in self.wizards:
 
-            spellbook = wizard.spellbook
-
             hands = ("left", "right")
 
             spell_list = {"left":[], "right":[]}
@@ -3239,105 +4135,92 @@ class Gamemaster:
                         final_index = -1
                     while final_index <= 0:
                         if final_index == -1:
-                            hand_history = wizard.get_hand(hand).history[:-1]
+                            completed = wizard.get_hand(hand).previous_state.completed
                         else:
-                            hand_history = wizard.get_hand(hand).history
-                        for spell in spellbook.spell_list:
-                            # Only check the spell if we've made enough gestures for one.
-                            if len(spell.gesture) <= len(hand_history): 
-                                spell_slice = hand_history[-len(spell.gesture):]
-                                for i in range(0, len(spell_slice)):
-                                    # Never check C -- this must ALWAYS use both hands.
-                                    if spell.gesture[i] != "C":          
-                                        # Don't check other spells if their gestures don't align.                            
-                                        if spell_slice[i].lower() == spell.gesture[i].lower():
-                                            if spell_slice[i] != spell.gesture[i]:
-                                                if spell_slice[i].lower() == spell.gesture[i]:
-                                                    spell_slice = spell_slice.replace(spell_slice[i], spell_slice[i].lower(), 1)
-
-                                if spell_slice == spell.gesture:
-                                    #print("A match has been found for " + spell.name)
-                                    if spell.name != "Surrender":
-                                        final_gesture = spell.gesture[final_index:]
-                                        if final_gesture.upper() == final_gesture:
-                                            #print("Final gestures match.")
+                            completed = wizard.get_hand(hand).state.completed
+                        for spell in completed:
+                            #print("A match has been found for " + spell.name)
+                            if spell.name != "Surrender":
+                                final_gesture = spell.gesture[final_index:]
+                                if final_gesture.upper() == final_gesture:
+                                    #print("Final gestures match.")
+                                    if final_index == -1:
+                                        #print("Hasted one_cast setting to true")
+                                        hasted_one_cast = True
+                                    else:
+                                        #print("Non-hasted one_cast setting to true")
+                                        one_cast = True
+
+                                # one_casted will skip a second adding of the same spell.
+                                if one_cast:
+                                    #print("Entering one_cast.")
+                                    if not one_casted:
+                                        #print("We are not one_casted.")
+                                        one_casted = True
+                                        append = True
+                                        if spell.name == "Lightning Bolt (Quick)":
+                                            if wizard.used_quick_lightning:
+                                                append = False
+                                            else:
+                                                wizard.used_quick_lightning = True
+                                        
+                                        if append:
+                                            #print("Appending... from one_cast")
+                                            
                                             if final_index == -1:
-                                                #print("Hasted one_cast setting to true")
-                                                hasted_one_cast = True
+                                                #print("[one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
+                                                hasted_spell_list[hand].append((wizard, spell))
                                             else:
-                                                #print("Non-hasted one_cast setting to true")
-                                                one_cast = True
-
-                                        # one_casted will skip a second adding of the same spell.
-                                        if one_cast:
-                                            #print("Entering one_cast.")
-                                            if not one_casted:
-                                                #print("We are not one_casted.")
-                                                one_casted = True
-                                                append = True
-                                                if spell.name == "Lightning Bolt (Quick)":
-                                                    if wizard.used_quick_lightning:
-                                                        append = False
-                                                    else:
-                                                        wizard.used_quick_lightning = True
-                                                
-                                                if append:
-                                                    #print("Appending... from one_cast")
-                                                    
-                                                    if final_index == -1:
-                                                        #print("[one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
-                                                        hasted_spell_list[hand].append((wizard, spell))
-                                                    else:
-                                                        #print("[one_cast] Appended " + spell.name + " from " + wizard.name)
-                                                        spell_list[hand].append((wizard, spell))
+                                                #print("[one_cast] Appended " + spell.name + " from " + wizard.name)
+                                                spell_list[hand].append((wizard, spell))
+                                    else:
+                                        #print("We are one_casted, not proceeding with append.")
+                                        pass
+
+                                # The following conditional may be redundant
+
+                                if hasted_one_cast:
+                                    #print("Entering hasted_one_cast")
+                                    if not hasted_one_casted:
+                                        #print("We are not hasted_one_casted.")
+                                        hasted_one_casted = True
+                                        append = True
+                                        if spell.name == "Lightning Bolt (Quick)":
+                                            if wizard.used_quick_lightning:
+                                                append = False
+                                            else:
+                                                wizard.used_quick_lightning = True
+                                        
+                                        if append:
+                                            
+                                            if final_index == -1:
+                                                this_spell = (wizard, spell)
+                                                if this_spell not in hasted_spell_list["left"]:
+                                                    #print("[hasted_one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
+                                                    hasted_spell_list[hand].append(this_spell)
                                             else:
-                                                #print("We are one_casted, not proceeding with append.")
-                                                pass
-
-                                        # The following conditional may be redundant
-
-                                        if hasted_one_cast:
-                                            #print("Entering hasted_one_cast")
-                                            if not hasted_one_casted:
-                                                #print("We are not hasted_one_casted.")
-                                                hasted_one_casted = True
-                                                append = True
-                                                if spell.name == "Lightning Bolt (Quick)":
-                                                    if wizard.used_quick_lightning:
-                                                        append = False
-                                                    else:
-                                                        wizard.used_quick_lightning = True
-                                                
-                                                if append:
-                                                    
-                                                    if final_index == -1:
-                                                        this_spell = (wizard, spell)
-                                                        if this_spell not in hasted_spell_list["left"]:
-                                                            #print("[hasted_one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
-                                                            hasted_spell_list[hand].append(this_spell)
-                                                    else:
-                                                        #print("[hasted_one_cast] Appended " + spell.name + " from " + wizard.name)
-                                                        spell_list[hand].append((wizard, spell))
-                                            #else:
-                                                #print("We are hasted_one_casted, not proceeding with append.")
-                                                    
+                                                #print("[hasted_one_cast] Appended " + spell.name + " from " + wizard.name)
+                                                spell_list[hand].append((wizard, spell))
+                                    #else:
+                                        #print("We are hasted_one_casted, not proceeding with append.")
+                                            
 
+                                else:
+                                    append = True
+                                    if spell.name == "Lightning Bolt (Quick)":
+                                        if wizard.used_quick_lightning:
+                                            append = False
                                         else:
-                                            append = True
-                                            if spell.name == "Lightning Bolt (Quick)":
-                                                if wizard.used_quick_lightning:
-                                                    append = False
-                                                else:
-                                                    wizard.used_quick_lightning = True
-                                            
-                                            if append:
-                                                
-                                                if final_index == -1:
-                                                    #print("[multi_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
-                                                    hasted_spell_list[hand].append((wizard, spell))
-                                                else:
-                                                    #print("[multi_cast] Appended " + spell.name + " from " + wizard.name)
-                                                    spell_list[hand].append((wizard, spell))
+                                            wizard.used_quick_lightning = True
+                                    
+                                    if append:
+                                        
+                                        if final_index == -1:
+                                            #print("[multi_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
+                                            hasted_spell_list[hand].append((wizard, spell))
+                                        else:
+                                            #print("[multi_cast] Appended " + spell.name + " from " + wizard.name)
+                                            spell_list[hand].append((wizard, spell))
 
                         final_index = final_index + 1
                         hasted_one_cast = False
@@ -3375,8 +4258,6 @@ class Gamemaster:
 
         spells_to_cast = []
 
-        spellbook = wizard.spellbook
-
         hands = ("left", "right")
 
         spell_list = {"left":[], "right":[]}
@@ -3399,105 +4280,92 @@ class Gamemaster:
                     final_index = -1
                 while final_index <= 0:
                     if final_index == -1:
-                        hand_history = wizard.get_hand(hand).history[:-1]
+                        completed = wizard.get_hand(hand).previous_state.completed
                     else:
-                        hand_history = wizard.get_hand(hand).history
-                    for spell in spellbook.spell_list:
-                        # Only check the spell if we've made enough gestures for one.
-                        if len(spell.gesture) <= len(hand_history): 
-                            spell_slice = hand_history[-len(spell.gesture):]
-                            for i in range(0, len(spell_slice)):
-                                # Never check C -- this must ALWAYS use both hands.
-                                if spell.gesture[i] != "C":          
-                                    # Don't check other spells if their gestures don't align.                            
-                                    if spell_slice[i].lower() == spell.gesture[i].lower():
-                                        if spell_slice[i] != spell.gesture[i]:
-                                            if spell_slice[i].lower() == spell.gesture[i]:
-                                                spell_slice = spell_slice.replace(spell_slice[i], spell_slice[i].lower(), 1)
-
-                            if spell_slice == spell.gesture:
-                                print("A match has been found for " + spell.name)
-                                if spell.name != "Surrender":
-                                    final_gesture = spell.gesture[final_index:]
-                                    if final_gesture.upper() == final_gesture:
-                                        print("Final gestures match.")
+                        completed = wizard.get_hand(hand).state.completed
+                    for spell in completed:
+                        print("A match has been found for " + spell.name)
+                        if spell.name != "Surrender":
+                            final_gesture = spell.gesture[final_index:]
+                            if final_gesture.upper() == final_gesture:
+                                print("Final gestures match.")
+                                if final_index == -1:
+                                    print("Hasted one_cast setting to true")
+                                    hasted_one_cast = True
+                                else:
+                                    print("Non-hasted one_cast setting to true")
+                                    one_cast = True
+
+                            # one_casted will skip a second adding of the same spell.
+                            if one_cast:
+                                print("Entering one_cast.")
+                                if not one_casted:
+                                    print("We are not one_casted.")
+                                    one_casted = True
+                                    append = True
+                                    if spell.name == "Lightning Bolt (Quick)":
+                                        if wizard.used_quick_lightning:
+                                            append = False
+                                        else:
+                                            wizard.used_quick_lightning = True
+                                    
+                                    if append:
+                                        print("Appending... from one_cast")
+                                        
                                         if final_index == -1:
-                                            print("Hasted one_cast setting to true")
-                                            hasted_one_cast = True
+                                            print("[one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
+                                            hasted_spell_list[hand].append((wizard, spell))
                                         else:
-                                            print("Non-hasted one_cast setting to true")
-                                            one_cast = True
-
-                                    # one_casted will skip a second adding of the same spell.
-                                    if one_cast:
-                                        print("Entering one_cast.")
-                                        if not one_casted:
-                                            print("We are not one_casted.")
-                                            one_casted = True
-                                            append = True
-                                            if spell.name == "Lightning Bolt (Quick)":
-                                                if wizard.used_quick_lightning:
-                                                    append = False
-                                                else:
-                                                    wizard.used_quick_lightning = True
-                                            
-                                            if append:
-                                                print("Appending... from one_cast")
-                                                
-                                                if final_index == -1:
-                                                    print("[one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
-                                                    hasted_spell_list[hand].append((wizard, spell))
-                                                else:
-                                                    print("[one_cast] Appended " + spell.name + " from " + wizard.name)
-                                                    spell_list[hand].append((wizard, spell))
+                                            print("[one_cast] Appended " + spell.name + " from " + wizard.name)
+                                            spell_list[hand].append((wizard, spell))
+                                else:
+                                    print("We are one_casted, not proceeding with append.")
+
+                            # The following conditional may be redundant
+
+                            elif hasted_one_cast:
+                                print("Entering hasted_one_cast")
+                                if not hasted_one_casted:
+                                    print("We are not hasted_one_casted.")
+                                    hasted_one_casted = True
+                                    append = True
+                                    if spell.name == "Lightning Bolt (Quick)":
+                                        if wizard.used_quick_lightning:
+                                            append = False
                                         else:
-                                            print("We are one_casted, not proceeding with append.")
-
-                                    # The following conditional may be redundant
-
-                                    elif hasted_one_cast:
-                                        print("Entering hasted_one_cast")
-                                        if not hasted_one_casted:
-                                            print("We are not hasted_one_casted.")
-                                            hasted_one_casted = True
-                                            append = True
-                                            if spell.name == "Lightning Bolt (Quick)":
-                                                if wizard.used_quick_lightning:
-                                                    append = False
-                                                else:
-                                                    wizard.used_quick_lightning = True
-                                            
-                                            if append:
-                                                
-                                                if final_index == -1:
-                                                    this_spell = (wizard, spell)
-                                                    if this_spell not in hasted_spell_list["left"]:
-                                                        print("[hasted_one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
-                                                        hasted_spell_list[hand].append(this_spell)
-                                                else:
-                                                    print("[hasted_one_cast] Appended " + spell.name + " from " + wizard.name)
-                                                    spell_list[hand].append((wizard, spell))
+                                            wizard.used_quick_lightning = True
+                                    
+                                    if append:
+                                        
+                                        if final_index == -1:
+                                            this_spell = (wizard, spell)
+                                            if this_spell not in hasted_spell_list["left"]:
+                                                print("[hasted_one_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
+                                                hasted_spell_list[hand].append(this_spell)
                                         else:
-                                            print("We are hasted_one_casted, not proceeding with append.")
-                                                
+                                            print("[hasted_one_cast] Appended " + spell.name + " from " + wizard.name)
+                                            spell_list[hand].append((wizard, spell))
+                                else:
+                                    print("We are hasted_one_casted, not proceeding with append.")
+                                        
 
+                            else:
+                                append = True
+                                if spell.name == "Lightning Bolt (Quick)":
+                                    if wizard.used_quick_lightning:
+                                        append = False
                                     else:
-                                        append = True
-                                        if spell.name == "Lightning Bolt (Quick)":
-                                            if wizard.used_quick_lightning:
-                                                append = False
-                                            else:
-                                                wizard.used_quick_lightning = True
-                                        
-                                        if append:
-                                            
-                                            if final_index == -1:
-                                                print("[multi_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
-                                                hasted_spell_list[hand].append((wizard, spell))
-                                            else:
-                                                print("[multi_cast] Appended " + spell.name + " from " + wizard.name)
-                                                spell_list[hand].append((wizard, spell))
-                    
+                                        wizard.used_quick_lightning = True
+                                
+                                if append:
+                                    
+                                    if final_index == -1:
+                                        print("[multi_cast] HASTE appended " + spell.name + " from " + wizard.name + "(" + hand + " hand)")
+                                        hasted_spell_list[hand].append((wizard, spell))
+                                    else:
+                                        print("[multi_cast] Appended " + spell.name + " from " + wizard.name)
+                                        spell_list[hand].append((wizard, spell))
+            
                     final_index = final_index + 1
                     hasted_one_cast = False
                     hasted_one_casted = False
@@ -3531,34 +4399,28 @@ class Gamemaster:
 
         client = wizard.client
 
-        self.msg_client("MULTIPLE_SPELLS", client)
-        ack = self.recv(client)
-
-        if self.response(ack, "Client did not reply to MULTIPLE_SPELLS request."):
-            ack = self.dec(ack)
-
-            if ack == "MULTIPLE_SPELLS_ACK":
-                spell_names_l = []
-                for spell in spell_list:
-                    spell_name = spell[1]
+        spell_names_l = []
+        for spell in spell_list:
+            spell_name = spell[1]
 
             # Appended tuple (wizard, spell)
             # list full of tuples, string
-                    print("Appending " + spell_name.name)
-                    spell_names_l.append(spell_name.name)
-                
-                sl_p = self.pickle([spell_names_l, hand_casting])
+            print("Appending " + spell_name.name)
+            spell_names_l.append(spell_name.name)
 
-                self.msg_client_p(sl_p, client)
-                choice_name = self.recv(client)
+        sl_p = self.serialize([spell_names_l, hand_casting])
 
-                if self.response(choice_name, "Client did not reply after sending pickled spell choices."):
+        self.msg_client("MULTIPLE_SPELLS", client)
+        self.msg_client_p(sl_p, client)
+        choice_name = self.recv(client)
+
+        if self.response(choice_name, "Client did not reply after sending encoded spell choices."):
 
-                    choice_name = self.dec(choice_name)
+            choice_name = self.dec(choice_name)
 
-                    for spell in spell_list:
-                        if spell[1].name == choice_name:
-                            return spell
+            for spell in spell_list:
+                if spell[1].name == choice_name:
+                    return spell
 
         """
         print(wizard.name + ": Multiple spells can be casted with the gestures of your " + hand_casting + " hand.\n")
@@ -3649,7 +4511,7 @@ class Gamemaster:
         # this is using the gurps body table, but it doesn't actually have an effect
 
         hit = "face"
-        roll = randint(3, 18)
+        roll = self.rng.randint(3, 18)
         if roll < 5:
             hit = "skull"
         elif roll < 6:
@@ -3803,8 +4665,6 @@ class Gamemaster:
 
         # read the hand history.
 
-        spellbook = wizard.spellbook
-
         # compare the gesture history to all of the spell gestures.
         # was a spell cast?
 
@@ -3816,63 +4676,26 @@ class Gamemaster:
         hand_spell = {"left":"", "right":""}
 
         for hand in hands:
-            hand_history = wizard.get_hand(hand).history
-            for spell in spellbook.spell_list:
-                if len(spell.gesture) <= len(hand_history): # only check the spell if we've made enough gestures for one.
+            for spell in wizard.get_hand(hand).state.completed:
+                if spell.name != "Surrender":
+                    final_gesture = spell.gesture[-1:]
+                    if final_gesture.upper() == final_gesture:
+                        one_cast = True 
 
-                    spell_slice = hand_history[-len(spell.gesture):]
-
-                    for i in range(0, len(spell_slice)):
-                        if spell.gesture[i] != "C": # never check C -- this must ALWAYS use both hands   
-                            #print("spell_slice[" + str(i) + "] = " + spell_slice[i])
-                            #print("spell.gesture[" + str(i) + "] = " + spell.gesture[i])
-                            #print("i="+str(i)+" "+ spell_slice[i] + " != " + spell.gesture[i])    
-                            if spell_slice[i].lower() == spell.gesture[i].lower():
+                    target = self.get_target(wizard, spell.name)
+                
 
-                                # don't check other spells if their gestures don't align.
+                    if one_cast:
+                        if not one_casted:
 
-                                if spell_slice[i] != spell.gesture[i]:
+                            line = wizard.name + " casts " + spell.name + " on " + target.name + "!"
+                            wizard.set_hand_spell("left", line)
+                            one_casted = True
                             
-                                    if spell_slice[i].lower() == spell.gesture[i]:
-
-                                        spell_slice = spell_slice.replace(spell_slice[i], spell_slice[i].lower(), 1)
-
-                            # for character in sFw, do
-                            # gesture: sfw
-
-                            # if s != s (false)
-                            # pass!
-
-                            # if F != f (true)
-                            # if f == f (true)
-
-                            # if 2 (i=1,i+1) == 3 (false):
-                            # sFw = s + f + w
-
-
-
-                        # this is so a W/S/F/D in history counts as a w/s/f/d for gesture checking.
-                        # we don't want to cast C spells with c.
-                    if spell_slice == spell.gesture:
-                        if spell.name != "Surrender":
-                            final_gesture = spell.gesture[-1:]
-                            if final_gesture.upper() == final_gesture:
-                                one_cast = True 
-
-                            target = self.get_target(wizard, spell.name)
-                        
-
-                            if one_cast:
-                                if not one_casted:
-
-                                    line = wizard.name + " casts " + spell.name + " on " + target.name + "!"
-                                    wizard.set_hand_spell("left", line)
-                                    one_casted = True
-                                    
-                            else:
-                                line = wizard.name + " casts " + spell.name + " with their " + hand + " hand on " + target.name + "!"
-                                wizard.set_hand_spell(hand, line)
-                                target.add_active_spell(spell)
+                    else:
+                        line = wizard.name + " casts " + spell.name + " with their " + hand + " hand on " + target.name + "!"
+                        wizard.set_hand_spell(hand, line)
+                        target.add_active_spell(spell)
 
     def enumerate_targets(self, starting_index = 1):
 
@@ -3953,30 +4776,26 @@ class Gamemaster:
 
         targetables_c = self.targetables_to_targetableclients(self.targets)
 
-        self.msg_client("GET_TARGET", attacker.client)
-        ack = self.recv(attacker.client)
+        # Send info about what the attack is and the targets list right
+        # behind the command.
+        targets_p = self.serialize([targetables_c, attack])
 
-        if self.response(ack, "Client died while sending ack for GET_TARGET"):
-            ack = self.dec(ack)
-            
-            if ack == "GET_TARGET_ACK":
-                # Send info about what the attack is and the targets list.
-                targets_p = self.pickle([targetables_c, attack])
-                self.msg_client_p(targets_p, attacker.client)
+        self.msg_client("GET_TARGET", attacker.client)
+        self.msg_client_p(targets_p, attacker.client)
 
-                target = self.recv(attacker.client)
-                if self.response(target, "Client died while sending target choice."):
+        target = self.recv(attacker.client)
+        if self.response(target, "Client died while sending target choice."):
 
-                    # The client sent a string, so find out which target it applies to.
-                    target_name = self.dec(target)
+            # The client sent a string, so find out which target it applies to.
+            target_name = self.dec(target)
 
-                    if target_name == "self":
-                        target = attacker
-                    else:
-                        for victim in self.targets:
-                            if victim.name == target_name:
-                                target = victim
-                                break
+            if target_name == "self":
+                target = attacker
+            else:
+                for victim in self.targets:
+                    if victim.name == target_name:
+                        target = victim
+                        break
         """
         target = attacker
 
@@ -0,0 +1,142 @@
+# The last few gestures of one hand, packed four bits to a gesture into an
+# int.
+#
+# The newest gesture is kept in the lowest four bits. Adding one shifts the
+# rest up and masks off whatever falls past the oldest that is kept, so the
+# int works as a ring buffer of the last MAX_HISTORY gestures with nothing
+# to copy or rebuild. The history is only turned into a string when it is
+# shown or sent, and that string is kept until the next gesture.
+
+# Only the most recent gestures are kept; no spell is longer than this.
+MAX_HISTORY = 8
+
+BITS = 4
+
+# Every gesture a history can hold, by code: one hand, both hands, a stab,
+# a gesture that could not be seen, and a charmed hand's missing stab.
+GESTURES = "fpswdcFPSWDC$? "
+
+CODES = {gesture: code for code, gesture in enumerate(GESTURES)}
+
+# Anything else is kept as a gesture that could not be seen.
+UNKNOWN = CODES["?"]
+
+# The two gestures held in each byte of a packed history, for turning one
+# into a string a byte at a time. The one spare code reads as "?".
+PAIRS = [(GESTURES + "?")[byte >> BITS] + (GESTURES + "?")[byte & 0xF] for byte in range(256)]
+
+# What Hand.show_history shows for a hand that has made no gestures.
+NOTHING_YET = "Nothing yet."
+
+
+class GestureHistory:
+
+    """ The last gestures of one hand, oldest first. Compares equal to the
+    string of the same gestures. """
+
+    def __init__(self, gestures="", capacity=MAX_HISTORY):
+        """
+        :param gestures: Gestures to start with, oldest first
+        :param capacity: Most gestures kept
+        """
+
+        self._packed = 0
+        self._length = 0
+        self._text = ""
+
+        self._CAPACITY = capacity
+        self._MASK = (1 << (BITS * capacity)) - 1
+        self._BYTES = (BITS * capacity + 7) // 8
+
+        self.extend(gestures)
+
+    @classmethod
+    def from_shown(cls, text):
+
+        """ Return the history shown as text by show(). """
+
+        if text == NOTHING_YET:
+            return cls()
+
+        return cls(text)
+
+    @property
+    def packed(self):
+        """ The gesture codes as an int, the newest in the lowest bits. """
+        return self._packed
+
+    @property
+    def latest(self):
+        """ The newest gesture, or "" if there are none. """
+
+        if not self._length:
+            return ""
+
+        return GESTURES[self._packed & 0xF]
+
+    def append(self, gesture):
+
+        """ Add a gesture, forgetting the oldest if the history is full. An
+        empty gesture adds nothing. """
+
+        if not gesture:
+            return
+
+        self._packed = ((self._packed << BITS) | CODES.get(gesture, UNKNOWN)) & self._MASK
+
+        if self._length < self._CAPACITY:
+            self._length += 1
+
+        self._text = None
+
+    def extend(self, gestures):
+
+        for gesture in gestures:
+            self.append(gesture)
+
+    def clear(self):
+
+        self._packed = 0
+        self._length = 0
+        self._text = ""
+
+    def show(self):
+
+        """ Return the gestures, or a note saying there are none yet. """
+
+        return str(self) or NOTHING_YET
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+
+        if self._text is None:
+            pairs = "".join(map(PAIRS.__getitem__, self._packed.to_bytes(self._BYTES, "big")))
+            self._text = pairs[len(pairs) - self._length:]
+
+        return self._text
+
+    def __repr__(self):
+        return "GestureHistory(" + repr(str(self)) + ")"
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def __iter__(self):
+        return iter(str(self))
+
+    def __getitem__(self, index):
+        return str(self)[index]
+
+    def __eq__(self, other):
+
+        if isinstance(other, GestureHistory):
+            return self._length == other._length and self._packed == other._packed
+
+        if isinstance(other, str):
+            return str(self) == other
+
+        return NotImplemented
+
+    __hash__ = None
@@ -1,6 +1,6 @@
 # Static Groble Names
 
-from random import randint
+import random
 
 from waving_hands.config import DATA
 
@@ -15,9 +15,9 @@ with open(DATA["names"]["last_second"]) as f:
     last_name_secondcomp = f.read().splitlines()
 
 
-def get_random_name():
-    first = first_name_list[randint(1, len(first_name_list)-1)]
-    last_first = last_name_firstcomp[randint(1, len(last_name_firstcomp)-1)]
-    last_second = last_name_secondcomp[randint(1, len(last_name_secondcomp)-1)]
+def get_random_name(rng=random):
+    first = first_name_list[rng.randint(1, len(first_name_list)-1)]
+    last_first = last_name_firstcomp[rng.randint(1, len(last_name_firstcomp)-1)]
+    last_second = last_name_secondcomp[rng.randint(1, len(last_name_secondcomp)-1)]
 
     return f"{first.capitalize()} {last_first.capitalize()}{last_second}"
@@ -1,56 +1,78 @@
 # a hand contains the history of its gestures.
 
+from waving_hands.gesture_history import GestureHistory
+
 class Hand:
 
-    def __init__(self):
-        self._history = ""
+    # A hand given a SpellMatcher also keeps track of the spells its gestures
+    # are making, as of its latest gesture and as of the one before, which is
+    # where a hasted wizard's extra gestures are checked from.
+
+    def __init__(self, matcher=None):
+        self._gestures = GestureHistory()
+        self._matcher = matcher
+        self._state = None
+        self._previous_state = None
+        self.reset_states()
 
     def get_latest_gesture(self):
-        if self.history[:-1] == "":
+        if len(self._gestures) <= 1:
             # Nothing
             return "c"
         else:
-            return self.history[-1:]
+            return self._gestures.latest
+
+    @property
+    def gestures(self):
+        """ The GestureHistory itself, for reading without building a
+        string. """
+        return self._gestures
 
     @property
     def history(self):
-        return self._history
+        return str(self._gestures)
 
     @history.setter
     def history(self, new_history):
-        self._history = new_history
+        self._gestures = GestureHistory(new_history)
 
-    def add_gesture(self, gesture):
-        
-        new_history = []
+        # The history was rewritten rather than added to, so work out the
+        # states again from what it now holds.
+        if self._matcher:
+            new_history = str(self._gestures)
+            self._state = self._matcher.state_after(new_history)
+            self._previous_state = self._matcher.state_after(new_history[:-1])
+
+    @property
+    def state(self):
+        """ The MatchState as of the latest gesture, or None without a
+        matcher. """
+        return self._state
 
-        if len(self.history) == 8:
-            for i in range(1, len(self.history)):
-                new_history.append(self.history[i])
+    @property
+    def previous_state(self):
+        """ The MatchState as of the gesture before the latest. """
+        return self._previous_state
 
-            new_history.append(gesture)
-            new_history = "".join(new_history)
+    def reset_states(self):
+        if self._matcher:
+            self._state = self._matcher.start
+            self._previous_state = self._matcher.start
 
-            self.history = new_history
-        else:
-            self.history += gesture
+    def add_gesture(self, gesture):
+
+        if not gesture:
+            return
 
-        """
-        if len(self.history) == 1:
-            new_history = []
-            for i in range(len(self.history)):
-                new_history.append(self.history[i])
-            new_history.append(gesture)
-            self.history = "".join(new_history)
+        self._gestures.append(gesture)
 
-        self.history = self.history + gesture
-        """
+        if self._matcher:
+            self._previous_state = self._state
+            self._state = self._state.next(self._gestures.latest)
 
     def show_history(self):
-        if len(self.history) > 0:
-            return self.history
-        else:
-            return "Nothing yet."
+        return self._gestures.show()
 
     def erase_history(self):
-        self._history = ""
\ No newline at end of file
+        self._gestures.clear()
+        self.reset_states()
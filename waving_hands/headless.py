@@ -0,0 +1,45 @@
+# Matches between ScriptedClients inside one process, for simulations, bots
+# and tests. By default nothing is bound: the players reach the Gamemaster
+# over an InProcessTransport.
+
+import threading
+
+from waving_hands.gamemaster import Gamemaster
+from waving_hands.transport import InProcessTransport
+
+
+def play_match(bots, transport=None, **options):
+
+    """ Play one match between the bots, each in its own thread, with the
+    Gamemaster in this one. Extra keyword arguments go to the Gamemaster.
+
+    Returns the Gamemaster once the match is over; the bots tell whether
+    they saw it to the end.
+    """
+
+    transport = transport or InProcessTransport()
+    transport.listen()
+
+    options.setdefault("pregame", False)
+    options.setdefault("customize_wizards", False)
+
+    game = Gamemaster(players=len(bots), transport=transport, **options)
+
+    threads = []
+    for bot in bots:
+        bot.transport = transport
+        bot.connect()
+        thread = threading.Thread(target=bot.play, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        game.setup_game()
+        game.play_game()
+    finally:
+        game.close_connections()
+
+    for thread in threads:
+        thread.join()
+
+    return game
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+
+from waving_hands import codec
+from waving_hands import protocol
+from waving_hands.async_server import AsyncMatchServer
+
+log = logging.getLogger(__name__)
+
+
+class Room:
+
+    """ A group of players waiting for, or playing, a match. """
+
+    def __init__(self, name, capacity=2):
+
+        self._name = name
+        self._capacity = capacity
+        self._clients = []
+        self._match = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def clients(self):
+        return self._clients
+
+    @property
+    def match(self):
+        return self._match
+
+    @match.setter
+    def match(self, future):
+        self._match = future
+
+    @property
+    def playing(self):
+        return self._match is not None
+
+    @property
+    def full(self):
+        return len(self._clients) >= self._capacity
+
+    def open_to_players(self):
+
+        """ Return True if a new player may join this room. """
+
+        return not self.playing and not self.full
+
+    def add_client(self, client):
+
+        self._clients.append(client)
+
+    def remove_client(self, client):
+
+        self._clients.remove(client)
+
+    def summary(self):
+
+        """ Return the room as shown to clients in the lobby. """
+
+        return {"name":self.name,
+                "players":len(self.clients),
+                "capacity":self.capacity,
+                "playing":self.playing}
+
+
+class Lobby(AsyncMatchServer):
+
+    """ Accept any number of players on one port and sort them into rooms.
+
+    Each newly connected player is sent LOBBY followed by the list of rooms,
+    and answers with the name of the room it wants to join. A blank answer
+    puts it in any room that is still waiting for players. A room starts its
+    match as soon as it is full, and is removed once that match ends.
+
+    Players who hang up while their room waits are dropped from it, every
+    few seconds and again just before the match starts, and a room that
+    empties is removed.
+    """
+
+    def __init__(self, *args, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        self._rooms = {}
+        self._next_room = 1
+        self._greeting = set()
+
+        self._SWEEP_INTERVAL = 5
+
+    @property
+    def rooms(self):
+        return self._rooms
+
+    async def serve(self):
+
+        sweeping = asyncio.ensure_future(self.sweep_rooms())
+
+        try:
+            await super().serve()
+        finally:
+            sweeping.cancel()
+
+    async def sweep_rooms(self):
+
+        """ Drop the players who have hung up from every waiting room, every
+        _SWEEP_INTERVAL seconds. """
+
+        while True:
+            await asyncio.sleep(self._SWEEP_INTERVAL)
+
+            for room in list(self.rooms.values()):
+                if not room.playing:
+                    self.drop_dead_clients(room)
+
+    def drop_dead_clients(self, room):
+
+        for client in list(room.clients):
+            if not protocol.client_alive(client):
+                room.remove_client(client)
+                client.close()
+                print("A player waiting in " + room.name + " hung up.")
+
+        if not room.clients:
+            self.close_room(room)
+
+    def room_list(self):
+
+        rooms = []
+
+        for room in self.rooms.values():
+            rooms.append(room.summary())
+
+        return rooms
+
+    def create_room(self, name=""):
+
+        while not name or name in self.rooms:
+            name = "room-" + str(self._next_room)
+            self._next_room += 1
+
+        room = Room(name, self._NUMBER_OF_WIZARDS)
+        self.rooms[name] = room
+
+        print("Opened " + name)
+
+        return room
+
+    def choose_room(self, name):
+
+        """ Return the room a player asking for the given name should join. """
+
+        if name in self.rooms:
+            room = self.rooms[name]
+            if room.open_to_players():
+                return room
+            print(name + " is not open to new players, assigning another room.")
+        elif name:
+            return self.create_room(name)
+
+        for room in self.rooms.values():
+            if room.open_to_players():
+                return room
+
+        return self.create_room()
+
+    def add_player(self, client):
+
+        """ Ask a new player which room to join. """
+
+        greeting = asyncio.ensure_future(self.greet_player(client))
+        self._greeting.add(greeting)
+        greeting.add_done_callback(self._greeting.discard)
+
+    async def greet_player(self, client):
+
+        """ Ask a new player which room to join, then seat them. """
+
+        loop = asyncio.get_running_loop()
+
+        try:
+            await protocol.async_send_frame(loop, client, protocol.CMD, b"LOBBY")
+            await protocol.async_send_frame(loop, client, protocol.DATA, codec.encode(self.room_list()))
+            answer = await protocol.async_recv_frame(loop, client)
+            # The client's heartbeats can start before it has answered.
+            while answer is not None and answer.tag == protocol.HEARTBEAT:
+                answer = await protocol.async_recv_frame(loop, client)
+            if answer is not None:
+                if answer.tag != protocol.TEXT:
+                    raise protocol.ProtocolError("Expected a room name, got a " + protocol.TAG_NAMES[answer.tag] + " frame.")
+                name = answer.payload.decode(protocol.ENC).strip()
+        except (OSError, protocol.ProtocolError, UnicodeDecodeError) as e:
+            log.info("Player left the lobby: " + str(e))
+            answer = None
+
+        if answer is None:
+            client.close()
+            return
+
+        room = self.choose_room(name)
+        room.add_client(client)
+
+        print("Player joined " + room.name + " (" + str(len(room.clients)) + "/" + str(room.capacity) + ")")
+
+        if room.full:
+            # Never start a match against someone who has already gone.
+            self.drop_dead_clients(room)
+
+        if room.full:
+            self.start_room(room)
+
+    def start_room(self, room):
+
+        for client in room.clients:
+            client.setblocking(True)
+            protocol.configure_socket(client)
+
+        room.match = asyncio.ensure_future(self.run_match(room.clients))
+        self._matches.add(room.match)
+
+        def room_done(match):
+            self.match_done(match)
+            self.close_room(room)
+
+        room.match.add_done_callback(room_done)
+
+    def close_room(self, room):
+
+        """ Forget a room once its match has ended or its players have all
+        gone. """
+
+        if self.rooms.get(room.name) is room:
+            del self.rooms[room.name]
+
+        print("Closed " + room.name)
+
+
+def main(host, port, pregame=True, customize_wizards=True, players=2, deadlines=None, resume_window=60,
+         capture_dir=None):
+
+    lobby = Lobby(
+        host=host,
+        port=port,
+        pregame=pregame,
+        customize_wizards=customize_wizards,
+        players=players,
+        deadlines=deadlines,
+        resume_window=resume_window,
+        capture_dir=capture_dir,
+    )
+
+    try:
+        asyncio.run(lobby.serve())
+    except KeyboardInterrupt:
+        print("Server shut down.")
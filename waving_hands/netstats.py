@@ -0,0 +1,254 @@
+# Counters for where the time and bytes of a match go on the network.
+#
+# Traffic is counted per kind of message: the command for CMD frames
+# (GET_TARGET, PRINT_FLAVOR, ...) and the tag name for everything else
+# (STATUS_DELTA, FLAVOR, ...). What one side sends in answer to a command is
+# counted under that command, so the replies to GET_GESTURES show up next to
+# it rather than as anonymous DATA.
+#
+# A round trip is timed from the server's command to the client's first
+# answer, which on the server includes the player's thinking. On the client
+# it is timed from the client's answer to the server's next frame, which is
+# the time spent resolving the turn plus the network in between.
+#
+# Each match keeps a NetStats of its own. When the match ends it is added to
+# process_stats, the totals of every match played by this process.
+
+import threading
+import time
+
+from waving_hands import protocol
+
+
+class Histogram:
+
+    """ Counts of durations in power of two buckets of microseconds. Bucket
+    n holds durations under 2**n microseconds and at least half of that. """
+
+    BUCKETS = 32
+
+    def __init__(self):
+
+        self._counts = [0] * self.BUCKETS
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._total / self._count if self._count else 0.0
+
+    @property
+    def max(self):
+        return self._max
+
+    def add(self, seconds):
+
+        micros = int(seconds * 1e6)
+        bucket = min(micros.bit_length(), self.BUCKETS - 1)
+
+        self._counts[bucket] += 1
+        self._count += 1
+        self._total += seconds
+        if seconds > self._max:
+            self._max = seconds
+
+    def merge(self, other):
+
+        for bucket, count in enumerate(other._counts):
+            self._counts[bucket] += count
+        self._count += other._count
+        self._total += other._total
+        self._max = max(self._max, other._max)
+
+    def percentile(self, fraction):
+
+        """ Return the upper bound in seconds of the bucket holding the given
+        fraction of the durations, e.g. 0.99. """
+
+        if not self._count:
+            return 0.0
+
+        wanted = fraction * self._count
+        seen = 0
+
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if seen >= wanted:
+                return min(2 ** bucket / 1e6, self._max)
+
+        return self._max
+
+    def buckets(self):
+
+        """ Return {upper bound in microseconds:count} for the used buckets. """
+
+        return {2 ** bucket:count for bucket, count in enumerate(self._counts) if count}
+
+
+class NetStats:
+
+    """ Bytes, frames and round trips per kind of message. Safe to share
+    between threads. """
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._kinds = {}
+
+    def kind(self, name):
+
+        counters = self._kinds.get(name)
+
+        if counters is None:
+            counters = {"sent":0, "frames_sent":0, "received":0, "frames_received":0, "rtt":Histogram()}
+            self._kinds[name] = counters
+
+        return counters
+
+    def count_sent(self, name, size):
+
+        with self._lock:
+            counters = self.kind(name)
+            counters["sent"] += size
+            counters["frames_sent"] += 1
+
+    def count_received(self, name, size):
+
+        with self._lock:
+            counters = self.kind(name)
+            counters["received"] += size
+            counters["frames_received"] += 1
+
+    def count_round_trip(self, name, seconds):
+
+        with self._lock:
+            self.kind(name)["rtt"].add(seconds)
+
+    def merge(self, other):
+
+        """ Add the counters of another NetStats to ours. """
+
+        with other._lock:
+            kinds = {name:dict(counters) for name, counters in other._kinds.items()}
+
+        with self._lock:
+            for name, theirs in kinds.items():
+                ours = self.kind(name)
+                for key in ("sent", "frames_sent", "received", "frames_received"):
+                    ours[key] += theirs[key]
+                ours["rtt"].merge(theirs["rtt"])
+
+    def stats(self):
+
+        """ Return {kind:counters} with the round trips summarized. """
+
+        stats = {}
+
+        with self._lock:
+            for name, counters in sorted(self._kinds.items()):
+                rtt = counters["rtt"]
+                stats[name] = {"sent":counters["sent"],
+                               "frames_sent":counters["frames_sent"],
+                               "received":counters["received"],
+                               "frames_received":counters["frames_received"],
+                               "round_trips":rtt.count,
+                               "rtt_mean":rtt.mean,
+                               "rtt_p50":rtt.percentile(0.5),
+                               "rtt_p99":rtt.percentile(0.99),
+                               "rtt_max":rtt.max,
+                               "rtt_buckets":rtt.buckets()}
+
+        return stats
+
+    def report(self):
+
+        """ Return the counters as lines of a table, busiest kind first. """
+
+        stats = self.stats()
+        order = sorted(stats, key=lambda name: stats[name]["sent"] + stats[name]["received"], reverse=True)
+
+        lines = ["{:<28} {:>10} {:>7} {:>10} {:>7} {:>7} {:>10} {:>10}".format(
+            "kind", "sent", "frames", "received", "frames", "trips", "rtt p50", "rtt p99")]
+
+        for name in order:
+            s = stats[name]
+            lines.append("{:<28} {:>10} {:>7} {:>10} {:>7} {:>7} {:>8.2f}ms {:>8.2f}ms".format(
+                name, s["sent"], s["frames_sent"], s["received"], s["frames_received"],
+                s["round_trips"], s["rtt_p50"] * 1e3, s["rtt_p99"] * 1e3))
+
+        return lines
+
+
+def kind_of(tag, payload):
+
+    """ Return the kind a frame is counted under. """
+
+    if tag == protocol.CMD:
+        return str(payload, protocol.ENC)
+
+    return protocol.TAG_NAMES.get(tag, str(tag))
+
+
+class Link:
+
+    """ Counts the traffic of one connection into a NetStats, keeping track
+    of which command each frame belongs to. """
+
+    def __init__(self, stats, asks):
+        """
+        :param stats: NetStats to count into
+        :param asks: True on the side that sends the commands, the server
+        """
+
+        self._stats = stats
+        self._ASKS = asks
+
+        # The command being answered, and when the round trip started.
+        self._command = None
+        self._started = None
+
+    def sent(self, tag, payload):
+
+        size = protocol.HEADER.size + len(payload)
+
+        if self._ASKS:
+            name = kind_of(tag, payload)
+            if tag == protocol.CMD:
+                self._command = name
+                self._started = time.perf_counter()
+        else:
+            name = self._command or kind_of(tag, payload)
+            if self._started is None:
+                self._started = time.perf_counter()
+
+        self._stats.count_sent(name, size)
+
+    def received(self, tag, payload):
+
+        size = protocol.HEADER.size + len(payload)
+
+        if tag == protocol.NOTICE:
+            # Notices are not answers to anything.
+            self._stats.count_received("NOTICE", size)
+            return
+
+        if self._started is not None and self._command:
+            self._stats.count_round_trip(self._command, time.perf_counter() - self._started)
+        self._started = None
+
+        if self._ASKS:
+            name = self._command or kind_of(tag, payload)
+        else:
+            name = kind_of(tag, payload)
+            if tag == protocol.CMD:
+                self._command = name
+
+        self._stats.count_received(name, size)
+
+
+process_stats = NetStats()
@@ -0,0 +1,128 @@
+# Bytes waiting to be sent to one client.
+#
+# The Gamemaster never blocks on a single client's socket. Everything it
+# sends goes into that client's Outbox, which is written out whenever the
+# socket can take more without waiting. A client that reads slowly only
+# makes its own Outbox grow. The other players are not held up by it.
+#
+# An Outbox holding more than its high-water mark is backed up. Notices to
+# it are dropped. Anything the match cannot do without waits until the
+# Outbox has drained to half the mark.
+
+import socket
+
+HIGH_WATER = 1024 * 1024
+
+# Not every platform has MSG_DONTWAIT (Windows does not); without it a
+# socket is made non-blocking for just the one send.
+DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+
+
+def send_now(sock, data):
+
+    """ Send what the socket will take of data without blocking and return
+    how many bytes that was. Raises BlockingIOError if it takes none. """
+
+    if DONTWAIT:
+        return sock.send(data, DONTWAIT)
+
+    timeout = sock.gettimeout()
+    if timeout == 0.0:
+        return sock.send(data)
+
+    sock.setblocking(False)
+    try:
+        return sock.send(data)
+    finally:
+        sock.settimeout(timeout)
+
+
+class Outbox:
+
+    def __init__(self, high_water=HIGH_WATER, chunk=65536):
+        """
+        :param high_water: Bytes waiting past which the client counts as backed up
+        :param chunk: Most bytes handed to the kernel in one send
+        """
+
+        self._buffer = bytearray()
+
+        self._HIGH_WATER = high_water
+        self._LOW_WATER = high_water // 2
+        self._CHUNK = chunk
+
+        self._bytes_queued = 0
+        self._bytes_sent = 0
+        self._sends = 0
+        self._would_block = 0
+        self._peak = 0
+        self._stalls = 0
+        self._notices_dropped = 0
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def over_high_water(self):
+        return len(self._buffer) > self._HIGH_WATER
+
+    @property
+    def under_low_water(self):
+        return len(self._buffer) <= self._LOW_WATER
+
+    def put(self, data):
+
+        """ Queue bytes to be sent. """
+
+        self._buffer += data
+        self._bytes_queued += len(data)
+
+        if len(self._buffer) > self._peak:
+            self._peak = len(self._buffer)
+
+    def clear(self):
+
+        """ Forget everything waiting, e.g. when a resume replaces it. """
+
+        self._buffer = bytearray()
+
+    def flush(self, sock):
+
+        """ Send as much as the socket takes without blocking. Returns True
+        once nothing is left waiting. Socket errors are left to the caller. """
+
+        while self._buffer:
+            try:
+                sent = send_now(sock, memoryview(self._buffer)[:self._CHUNK])
+            except (BlockingIOError, InterruptedError):
+                self._would_block += 1
+                return False
+
+            self._sends += 1
+            self._bytes_sent += sent
+            del self._buffer[:sent]
+
+        return True
+
+    def count_stall(self):
+
+        """ Note that the match had to wait for this client to catch up. """
+
+        self._stalls += 1
+
+    def count_dropped_notice(self):
+
+        self._notices_dropped += 1
+
+    def stats(self):
+
+        """ Return the counters of this Outbox as a dictionary. """
+
+        return {"queued":self._bytes_queued,
+                "sent":self._bytes_sent,
+                "waiting":len(self._buffer),
+                "peak":self._peak,
+                "sends":self._sends,
+                "would_block":self._would_block,
+                "stalls":self._stalls,
+                "notices_dropped":self._notices_dropped}
@@ -0,0 +1,570 @@
+# The wire protocol shared by the Gamemaster and the SpellbinderClient.
+#
+# Every message is sent as a frame:
+#
+#   +---------+-------------------+-----------------+
+#   | tag (1) | payload length (4)| payload (n)     |
+#   +---------+-------------------+-----------------+
+#
+# The tag says what kind of payload follows, and the length is a big-endian
+# unsigned int. Because the receiver always knows how many bytes belong to a
+# message, several frames can be sent back to back without waiting for an
+# acknowledgement in between.
+#
+# A client opens every connection with a HELLO frame. A new player sends an
+# empty one; a player coming back after losing its connection sends the
+# resume token it was given in a SESSION frame, and the number of bytes of the
+# match it had received. The server answers a resume with its own count, and
+# each side sends again whatever the other missed. HEARTBEAT, HELLO and SESSION
+# frames belong to the connection rather than the match, so they are never
+# counted or sent again.
+#
+# A new player can list capabilities in its HELLO. The server answers with a
+# HELLO of its own listing those it has as well, which both sides may then
+# use. The only one so far is compression: a COMPRESSED frame holds one or
+# more frames packed back to back, compressed as in compression.py.
+#
+# A spectator says so in its HELLO, and from then on only listens; see
+# spectators.py for what it is sent.
+
+import asyncio
+from collections import namedtuple
+import socket
+import struct
+import time
+import weakref
+
+from waving_hands import codec
+from waving_hands import compression
+
+HEADER = struct.Struct("!BI")
+
+# Guard against garbage on the wire turning into a huge allocation.
+MAX_PAYLOAD = 16 * 1024 * 1024
+
+# Frame tags
+
+CMD  = 1    # A protocol command, such as GET_TARGET or GESTURES_COMPLETE
+TEXT = 2    # A plain utf-8 string, such as a target name
+DATA = 3    # A serialized object, such as a list of TargetableClients
+INT  = 4    # A four byte big-endian unsigned integer
+STATUS = 5  # A serialized wizard status snapshot, sent after GET_GESTURES
+FLAVOR = 6  # A single utf-8 line of the end of round report
+FLAVOR_END = 7  # Marks the end of the round report
+STATUS_DELTA = 8    # Changes to the last status snapshot, see snapshot.py
+NOTICE = 9  # A one-way message for the player, see pack_notice
+HEARTBEAT = 10  # Sent by a client every few seconds so the server knows it is there
+HELLO = 11      # The first frame a client sends, see pack_hello
+SESSION = 12    # The resume token and the bytes received so far, see Gamemaster.resume
+COMPRESSED = 13 # Frames packed together and compressed, see pack_compressed
+
+TAG_NAMES = {
+    CMD:  "CMD",
+    TEXT: "TEXT",
+    DATA: "DATA",
+    INT:  "INT",
+    STATUS: "STATUS",
+    FLAVOR: "FLAVOR",
+    FLAVOR_END: "FLAVOR_END",
+    STATUS_DELTA: "STATUS_DELTA",
+    NOTICE: "NOTICE",
+    HEARTBEAT: "HEARTBEAT",
+    HELLO: "HELLO",
+    SESSION: "SESSION",
+    COMPRESSED: "COMPRESSED",
+}
+
+# Bumped whenever the fields of the status snapshot change. A client that
+# receives a snapshot with a version it does not know falls back to asking
+# for each STATUS_* field on its own.
+SNAPSHOT_VERSION = 1
+
+ENC = "utf-8"
+
+Frame = namedtuple("Frame", ["tag", "payload"])
+
+# socket: the capabilities agreed with the client on it
+_agreed = weakref.WeakKeyDictionary()
+
+
+class ProtocolError(Exception):
+
+    """ Raised when the other side sends something that is not a frame. """
+
+    pass
+
+
+def pack_frame(tag, payload=b""):
+
+    """ Return the bytes for a frame with the given tag and payload. """
+
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError("Payload of " + str(len(payload)) + " bytes is too large to send.")
+
+    return HEADER.pack(tag, len(payload)) + payload
+
+
+def split_frames(data):
+
+    """ Yield (tag, payload) for each frame packed back to back in data. The
+    payloads are memoryviews into data. """
+
+    view = memoryview(data)
+    pos = 0
+
+    while pos < len(view):
+        if pos + HEADER.size > len(view):
+            raise ProtocolError("Frames end in the middle of a header.")
+
+        tag, size = HEADER.unpack_from(view, pos)
+        pos += HEADER.size
+
+        if pos + size > len(view):
+            raise ProtocolError("Frames end in the middle of a payload.")
+
+        yield tag, view[pos:pos + size]
+        pos += size
+
+
+def configure_socket(sock):
+
+    """ Turn off Nagle's algorithm so that a command frame and the data frame
+    that follows it are not held back waiting for an ACK. """
+
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (OSError, AttributeError):
+        # Not a TCP socket, e.g. a socketpair.
+        pass
+
+
+def client_alive(sock):
+
+    """ Return False if the other end of a waiting player's socket has hung
+    up. Nothing is read from it, and it is left blocking or not as it was. """
+
+    blocking = sock.getblocking()
+    sock.setblocking(False)
+
+    try:
+        return sock.recv(1, socket.MSG_PEEK) != b""
+    except (BlockingIOError, InterruptedError):
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.setblocking(blocking)
+
+
+def send_frame(sock, tag, payload=b""):
+
+    """ Send a single frame over the socket. """
+
+    sock.sendall(pack_frame(tag, payload))
+
+
+def pack_notice(seq, text):
+
+    """ Return the payload of a NOTICE frame: a four byte sequence number
+    followed by the utf-8 text. The client uses the sequence number to tell
+    whether any notices were dropped. """
+
+    return encode_int(seq) + text.encode(ENC)
+
+
+def unpack_notice(payload):
+
+    """ Return (sequence number, text) from a NOTICE payload. """
+
+    return decode_int(payload[:4]), payload[4:].decode(ENC)
+
+
+def pack_hello(resume="", received=0, caps=None, spectate=None):
+
+    """ Return the payload of a HELLO frame. A new player leaves resume blank,
+    and may offer a list of capabilities. A spectator gives the id of the
+    match to watch as spectate, or a blank one for whichever is newest. """
+
+    hello = {"resume":resume, "received":received}
+
+    if caps:
+        hello["caps"] = list(caps)
+
+    if spectate is not None:
+        hello["spectate"] = spectate
+
+    return codec.encode(hello)
+
+
+def capabilities():
+
+    """ Return the capabilities this side of the connection has. """
+
+    return [compression.capability()]
+
+
+def agree_to_hello(sock, hello):
+
+    """ Agree to the capabilities the client offered that we have as well.
+    Returns the payload of the HELLO that tells the client which those are,
+    or None if it offered none and so expects no answer. """
+
+    offered = hello.get("caps")
+
+    if not isinstance(offered, list):
+        return None
+
+    agreed = [cap for cap in capabilities() if cap in offered]
+    agree(sock, agreed)
+
+    return codec.encode({"caps":agreed})
+
+
+def answer_hello(sock, hello):
+
+    answer = agree_to_hello(sock, hello)
+
+    if answer is not None:
+        send_frame(sock, HELLO, answer)
+
+
+def agree(sock, caps):
+
+    """ Remember the capabilities agreed with the client on sock, e.g. when
+    the socket was agreed on in another process. """
+
+    _agreed[sock] = frozenset(caps)
+
+
+def agreed(sock):
+
+    return _agreed.get(sock, frozenset())
+
+
+def pack_compressed(data):
+
+    """ Return the frames packed in data as a single COMPRESSED frame, or
+    data itself if compressing would not make it smaller. """
+
+    packed = compression.compress(data)
+
+    if HEADER.size + len(packed) >= len(data):
+        return data
+
+    return pack_frame(COMPRESSED, packed)
+
+
+def unpack_compressed(payload):
+
+    """ Return the list of Frames held in a COMPRESSED payload. """
+
+    try:
+        data = compression.decompress(payload, MAX_PAYLOAD)
+    except ValueError as e:
+        raise ProtocolError(str(e))
+
+    frames = []
+
+    for tag, inner in split_frames(data):
+        if tag not in TAG_NAMES or tag in (COMPRESSED, HELLO, SESSION, HEARTBEAT):
+            raise ProtocolError("Received a compressed frame holding a frame with tag [" + str(tag) + "]")
+        frames.append(Frame(tag, bytes(inner)))
+
+    return frames
+
+
+def unpack_hello(payload):
+
+    """ Return the HELLO as a dict, or None if it is not one. """
+
+    try:
+        hello = codec.decode(payload)
+    except codec.CodecError:
+        return None
+
+    if not isinstance(hello, dict) or not isinstance(hello.get("resume", ""), str):
+        return None
+
+    if not isinstance(hello.get("spectate", ""), str):
+        return None
+
+    return hello
+
+
+class PendingHellos:
+
+    """ Accepted connections whose HELLO has not all arrived yet.
+
+    Each is read whenever select finds it ready, taking no more than the
+    HELLO frame, so a client that is slow to say hello holds up nobody but
+    itself. The sockets are non-blocking while they wait here, and blocking
+    again once they leave.
+    """
+
+    def __init__(self, timeout):
+
+        self._TIMEOUT = timeout
+
+        # socket: (when to give up on it, the bytes of its HELLO so far)
+        self._pending = {}
+
+    def add(self, sock):
+
+        sock.setblocking(False)
+        self._pending[sock] = (time.monotonic() + self._TIMEOUT, bytearray())
+
+    def sockets(self):
+        return list(self._pending)
+
+    def timeout(self, limit=None):
+
+        """ Return how long select may wait before a connection runs out of
+        time, or limit if that is sooner. """
+
+        if not self._pending:
+            return limit
+
+        left = min(deadline for deadline, data in self._pending.values()) - time.monotonic()
+        left = max(0, left)
+
+        return left if limit is None else min(limit, left)
+
+    def read(self, sock):
+
+        """ Read what a ready connection has sent of its HELLO.
+
+        Returns the HELLO once all of it is in, and None until then. The
+        connection is no longer pending once it has sent a HELLO, hung up, or
+        opened with anything else; in the last two cases None is returned.
+        """
+
+        deadline, data = self._pending[sock]
+
+        needed = HEADER.size - len(data)
+        if needed <= 0:
+            tag, size = HEADER.unpack_from(data)
+            needed += size
+
+        try:
+            chunk = sock.recv(needed)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError:
+            chunk = b""
+
+        if not chunk:
+            self.remove(sock)
+            return None
+
+        data += chunk
+
+        if len(data) < HEADER.size:
+            return None
+
+        tag, size = HEADER.unpack_from(data)
+        if tag != HELLO or size > MAX_PAYLOAD:
+            self.remove(sock)
+            return None
+
+        if len(data) < HEADER.size + size:
+            return None
+
+        self.remove(sock)
+
+        return unpack_hello(bytes(data[HEADER.size:]))
+
+    def expire(self):
+
+        """ Stop waiting on, and return, the connections that have taken too
+        long to say hello. """
+
+        now = time.monotonic()
+        expired = [sock for sock, (deadline, data) in self._pending.items() if deadline <= now]
+
+        for sock in expired:
+            self.remove(sock)
+
+        return expired
+
+    def remove(self, sock):
+
+        del self._pending[sock]
+        sock.setblocking(True)
+
+    def close(self):
+
+        for sock in self.sockets():
+            self.remove(sock)
+            sock.close()
+
+    def __contains__(self, sock):
+        return sock in self._pending
+
+    def __len__(self):
+        return len(self._pending)
+
+
+def recv_exact(sock, size):
+
+    """ Receive exactly size bytes from the socket.
+
+    Returns None if the connection closed before all of the bytes arrived.
+    """
+
+    chunks = []
+    remaining = size
+
+    while remaining > 0:
+        chunk = sock.recv(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+
+def check_header(tag, size):
+
+    """ Raise ProtocolError for a frame header no peer should send. """
+
+    if tag not in TAG_NAMES:
+        raise ProtocolError("Received a frame with unknown tag [" + str(tag) + "]")
+
+    if size > MAX_PAYLOAD:
+        raise ProtocolError("Received a frame claiming " + str(size) + " bytes of payload.")
+
+
+def take_frames(buffer):
+
+    """ Remove every whole frame from the front of a bytearray of received
+    bytes and return them as Frames, leaving any partial frame behind.
+
+    A bad header raises ProtocolError as soon as it has arrived, without
+    waiting for the payload it claims.
+    """
+
+    frames = []
+    pos = 0
+
+    while len(buffer) - pos >= HEADER.size:
+        tag, size = HEADER.unpack_from(buffer, pos)
+        check_header(tag, size)
+
+        end = pos + HEADER.size + size
+        if end > len(buffer):
+            break
+
+        frames.append(Frame(tag, bytes(buffer[pos + HEADER.size:end])))
+        pos = end
+
+    del buffer[:pos]
+
+    return frames
+
+
+def recv_frame(sock):
+
+    """ Receive a single frame from the socket.
+
+    Returns a Frame, or None if the connection was closed.
+    """
+
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+
+    tag, size = HEADER.unpack(header)
+    check_header(tag, size)
+
+    payload = recv_exact(sock, size)
+    if payload is None:
+        return None
+
+    return Frame(tag, payload)
+
+
+def encode_int(value):
+
+    """ Encode an int for an INT frame. """
+
+    return value.to_bytes(4, "big")
+
+
+def decode_int(payload):
+
+    """ Decode the payload of an INT frame. """
+
+    return int.from_bytes(payload, "big")
+
+
+async def async_recv_exact(loop, sock, size):
+
+    """ recv_exact for a non-blocking socket owned by an asyncio loop. """
+
+    chunks = []
+    remaining = size
+
+    while remaining > 0:
+        chunk = await loop.sock_recv(sock, remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+
+async def async_recv_frame(loop, sock):
+
+    """ recv_frame for a non-blocking socket owned by an asyncio loop. """
+
+    header = await async_recv_exact(loop, sock, HEADER.size)
+    if header is None:
+        return None
+
+    tag, size = HEADER.unpack(header)
+    check_header(tag, size)
+
+    payload = await async_recv_exact(loop, sock, size)
+    if payload is None:
+        return None
+
+    return Frame(tag, payload)
+
+
+async def async_answer_hello(loop, sock, hello):
+
+    """ answer_hello for a non-blocking socket owned by an asyncio loop. """
+
+    answer = agree_to_hello(sock, hello)
+
+    if answer is not None:
+        await async_send_frame(loop, sock, HELLO, answer)
+
+
+async def async_recv_hello(loop, sock, timeout):
+
+    """ Receive the HELLO a newly connected client opens with, from a
+    non-blocking socket owned by an asyncio loop.
+
+    Returns None if the client sends anything else, or nothing within timeout
+    seconds.
+    """
+
+    try:
+        frame = await asyncio.wait_for(async_recv_frame(loop, sock), timeout)
+    except (OSError, ProtocolError, asyncio.TimeoutError):
+        return None
+
+    if frame is None or frame.tag != HELLO:
+        return None
+
+    return unpack_hello(frame.payload)
+
+
+async def async_send_frame(loop, sock, tag, payload=b""):
+
+    """ send_frame for a non-blocking socket owned by an asyncio loop. """
+
+    await loop.sock_sendall(sock, pack_frame(tag, payload))
@@ -0,0 +1,208 @@
+# Play a captured match again against a fresh Gamemaster.
+#
+# The Gamemaster is set up the way the capture header says, seed included,
+# so it makes the same random choices. Each recorded connection gets a stand
+# in client that sends what the real client sent and checks that everything
+# the server sends matches the recording. Resume tokens and notices are left
+# out of the check, since they depend on timing rather than on the match.
+#
+#   python -m waving_hands.replay match.whcap [--realtime]
+
+import argparse
+import threading
+import time
+
+from waving_hands import capture
+from waving_hands import protocol
+from waving_hands.gamemaster import ConnectionLost, Gamemaster
+from waving_hands.transport import InProcessTransport
+
+UNCHECKED = (protocol.NOTICE, protocol.SESSION)
+
+
+class Replay:
+
+    """ One run of a capture against a new Gamemaster. """
+
+    def __init__(self, path, realtime=False, timeout=30):
+        """
+        :param path: Capture file to play
+        :param realtime: Wait as long between client frames as the players
+            did. Otherwise the match is played as fast as it can be
+        :param timeout: Seconds to wait for a frame before giving up on it
+        """
+
+        self._settings, records = capture.read_capture(path)
+
+        self._connections = {}
+        for record in records:
+            self._connections.setdefault(record.connection, []).append(record)
+
+        self._REALTIME = realtime
+        self._TIMEOUT = timeout
+
+        self._elapsed = 0
+        self._frames = 0
+        self._turn_times = []
+        self._mismatches = []
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return self._settings
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def frames(self):
+        """ Number of server frames that matched the capture. """
+        return self._frames
+
+    @property
+    def turns(self):
+        return len(self._turn_times)
+
+    @property
+    def turn_times(self):
+        """ Seconds from one request for gestures to the next, as seen by the
+        first player. """
+        return self._turn_times
+
+    @property
+    def mismatches(self):
+        return self._mismatches
+
+    def run(self):
+
+        """ Play the match through. Returns True if the server sent exactly
+        what was recorded. """
+
+        transport = InProcessTransport()
+
+        game = Gamemaster(
+            pregame=self._settings["pregame"],
+            customize_wizards=self._settings["customize_wizards"],
+            players=self._settings["players"],
+            transport=transport,
+            seed=self._settings["seed"],
+            heartbeat_timeout=0,
+            resume_window=0,
+        )
+
+        # Connect in the recorded order, so each socket is seated at the
+        # same wizard.
+        threads = []
+        for number in sorted(self._connections):
+            sock = transport.connect()
+            protocol.send_frame(sock, protocol.HELLO, protocol.pack_hello())
+
+            thread = threading.Thread(target=self.play_connection, args=(number, sock), daemon=True)
+            threads.append(thread)
+
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            game.setup_game()
+            game.play_game()
+        except (ConnectionLost, OSError) as e:
+            self.mismatch("The match ended early: " + str(e))
+        finally:
+            game.close_connections()
+            transport.close()
+
+        for thread in threads:
+            thread.join()
+
+        self._elapsed = time.perf_counter() - started
+
+        return not self._mismatches
+
+    def play_connection(self, number, sock):
+
+        """ Stand in for the client of one recorded connection. """
+
+        sock.settimeout(self._TIMEOUT)
+        started = time.monotonic()
+        last_turn = None
+
+        try:
+            for index, record in enumerate(self._connections[number]):
+                if record.direction == capture.IN:
+                    if self._REALTIME:
+                        time.sleep(max(0, started + record.time - time.monotonic()))
+                    protocol.send_frame(sock, record.frame.tag, record.frame.payload)
+                    continue
+
+                if record.frame.tag in UNCHECKED:
+                    continue
+
+                frame = self.next_frame(sock)
+
+                if frame != record.frame:
+                    self.mismatch("Connection " + str(number) + ", record " + str(index) + ": expected "
+                                  + describe(record.frame) + ", got " + describe(frame))
+                    return
+
+                with self._lock:
+                    self._frames += 1
+
+                if number == 0 and frame.payload == b"GET_GESTURES":
+                    now = time.perf_counter()
+                    if last_turn is not None:
+                        self._turn_times.append(now - last_turn)
+                    last_turn = now
+        except OSError as e:
+            self.mismatch("Connection " + str(number) + " failed: " + str(e))
+        finally:
+            sock.close()
+
+    def next_frame(self, sock):
+
+        """ Return the next frame from the server that the capture checks. """
+
+        while True:
+            frame = protocol.recv_frame(sock)
+            if frame is None or frame.tag not in UNCHECKED:
+                return frame
+
+    def mismatch(self, message):
+
+        with self._lock:
+            self._mismatches.append(message)
+
+
+def describe(frame):
+
+    if frame is None:
+        return "the connection closing"
+
+    payload = bytes(frame.payload[:40])
+
+    return protocol.TAG_NAMES[frame.tag] + " " + repr(payload) + ("..." if len(frame.payload) > 40 else "")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Play a captured match against a new Gamemaster")
+    parser.add_argument("capture", help="Capture file written with --capture")
+    parser.add_argument("--realtime", action="store_true", help="Keep the pauses the players took")
+    args = parser.parse_args()
+
+    replay = Replay(args.capture, realtime=args.realtime)
+    replay.run()
+
+    print("Replayed " + str(replay.turns) + " turns and " + str(replay.frames) + " frames in "
+          + "{:.3f}s".format(replay.elapsed))
+
+    for message in replay.mismatches:
+        print(message)
+
+    return 1 if replay.mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,319 @@
+from collections import deque
+
+from waving_hands import codec
+from waving_hands import netstats
+from waving_hands import protocol
+from waving_hands.transport import TcpTransport
+
+
+class ScriptedClient:
+
+    """ A headless player that speaks the client protocol without a screen
+    or keyboard. It gives the first safe answer to every question, makes the
+    same gestures every turn, and surrenders after a set number of turns.
+
+    Used to drive servers in tests and benchmarks.
+    """
+
+    def __init__(self,
+        host: str = "localhost",
+        port: int = 12345,
+        name: str = "Scripted",
+        room: str = "",
+        gestures: tuple = ("w", "s"),
+        surrender_after: int = 2,
+        transport = None,
+        compress: bool = True):
+        """
+        :param host: Server to connect to
+        :param port: Port of the server
+        :param name: Wizard name sent during customization
+        :param room: Room to ask for if the server is a lobby, blank for any
+        :param gestures: (left, right) gestures made every turn before surrendering
+        :param surrender_after: Number of turns to play before surrendering
+        :param transport: Transport to reach the server by, instead of TCP to
+            host and port
+        :param compress: Offer to take compressed frames
+        """
+
+        self._server = None
+        self._transport = transport or TcpTransport(host, port)
+        self._ENC = protocol.ENC
+
+        self._name = name
+        self._room = room
+        self._gestures = gestures
+        self._surrender_after = surrender_after
+
+        self._compress = compress
+        self._caps = []
+        self._unpacked = deque()
+
+        self._token = ""
+        self._turns = 0
+        self._notices = 0
+        self._finished = False
+
+        self._net_stats = netstats.NetStats()
+        self._link = netstats.Link(self._net_stats, asks=False)
+
+    @property
+    def server(self):
+        return self._server
+
+    @server.setter
+    def server(self, sock):
+        self._server = sock
+
+    @property
+    def transport(self):
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        self._transport = transport
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def token(self):
+        """ Resume token the server gave us, if any. """
+        return self._token
+
+    @property
+    def caps(self):
+        """ Capabilities the server agreed to. """
+        return self._caps
+
+    @property
+    def turns(self):
+        return self._turns
+
+    @property
+    def notices(self):
+        """ Number of notices received from the server. """
+        return self._notices
+
+    @property
+    def net_stats(self):
+        return self._net_stats
+
+    @property
+    def finished(self):
+        """ True once the client has seen the end of the game. """
+        return self._finished
+
+    def connect(self):
+
+        self.server = self._transport.connect()
+        protocol.configure_socket(self.server)
+        caps = protocol.capabilities() if self._compress else None
+        protocol.send_frame(self.server, protocol.HELLO, protocol.pack_hello(caps=caps))
+
+    def play(self):
+
+        """ Connect if needed and answer the server until the game ends or
+        the server hangs up. Returns True if the game ended normally. """
+
+        if not self.server:
+            self.connect()
+
+        handlers = {
+            "COMMAND_MONSTER":self.command_monster,
+            "CUSTOMIZE":self.customization,
+            "DELAYED_SPELL_RELEASE_QUERY":self.answer_no,
+            "DELAYED_SPELL_STORE_QUERY":self.answer_none,
+            "ENCHANTMENT_CHARM_PERSON":self.charm_person,
+            "ENCHANTMENT_PARALYSIS":self.choose_paralysis_target,
+            "GET_GESTURES":self.get_gestures,
+            "GET_PERMANENT":self.answer_none,
+            "GET_TARGET":self.get_target,
+            "LOBBY":self.choose_room,
+            "MULTIPLE_SPELLS":self.choose_spell,
+            "OFFER_PERMANENCY":self.answer_no,
+            "PREGAME":self.skip_data,
+            "PRINT_FLAVOR":self.round_end,
+            "RAISE_DEAD":self.raise_dead,
+            "SUMMON_ELEMENTAL":self.summon_elemental,
+        }
+
+        try:
+            while not self.finished:
+                frame = self.recv_frame()
+                if frame is None:
+                    break
+
+                command = frame.payload.decode(self._ENC)
+                handler = handlers.get(command)
+                if handler:
+                    handler()
+        finally:
+            self.close()
+
+        return self.finished
+
+    def close(self):
+
+        if self.server:
+            self.server.close()
+
+        netstats.process_stats.merge(self._net_stats)
+
+    def send(self, msg, tag=protocol.CMD):
+
+        self.send_frame(tag, msg.encode(self._ENC))
+
+    def send_p(self, item):
+
+        self.send_frame(protocol.DATA, codec.encode(item))
+
+    def send_frame(self, tag, payload):
+
+        protocol.send_frame(self.server, tag, payload)
+        self._link.sent(tag, payload)
+
+    def recv_frame(self):
+
+        """ Return the next frame that is not a notice or a resume token. """
+
+        while True:
+            if self._unpacked:
+                frame = self._unpacked.popleft()
+            else:
+                frame = protocol.recv_frame(self.server)
+                if frame is None:
+                    return None
+
+                if frame.tag == protocol.HELLO:
+                    self._caps = codec.decode(frame.payload).get("caps", [])
+                    continue
+
+                if frame.tag == protocol.COMPRESSED:
+                    self._unpacked.extend(protocol.unpack_compressed(frame.payload))
+                    continue
+
+            if frame.tag != protocol.SESSION:
+                self._link.received(frame.tag, frame.payload)
+
+            if frame.tag == protocol.NOTICE:
+                self._notices += 1
+            elif frame.tag == protocol.SESSION:
+                self._token = codec.decode(frame.payload)["token"]
+            else:
+                return frame
+
+    def recv_p(self):
+
+        """ Receive and decode the next frame. """
+
+        frame = self.recv_frame()
+        if frame is None:
+            raise ConnectionError("Server hung up mid-exchange.")
+
+        return codec.decode(frame.payload)
+
+    def choose_room(self):
+
+        self.recv_p()
+        self.send(self._room, protocol.TEXT)
+
+    def customization(self):
+
+        self.send_p({"name":self.name,
+                     "color":"grey",
+                     "taunt":"Beware!",
+                     "victory":"I win!"})
+
+    def skip_data(self):
+
+        self.recv_frame()
+
+    def get_gestures(self):
+
+        # The status snapshot is not needed to decide anything.
+        self.recv_frame()
+
+        self._turns += 1
+
+        if self.turns > self._surrender_after:
+            gestures = {"left":"p", "right":"p"}
+        else:
+            gestures = {"left":self._gestures[0], "right":self._gestures[1]}
+
+        self.send("GESTURES_COMPLETE")
+        self.send_p(gestures)
+
+    def round_end(self):
+
+        game_enders = ("less messily",
+                       "equally messily",
+                       "has won the battle",
+                       "ends in a draw",
+                       "is victorious!")
+
+        while True:
+            frame = self.recv_frame()
+            if frame is None:
+                raise ConnectionError("Server hung up during the round report.")
+            if frame.tag == protocol.FLAVOR_END:
+                break
+
+            line = frame.payload.decode(self._ENC)
+            for ender in game_enders:
+                if ender in line:
+                    self._finished = True
+
+        if not self.finished:
+            self.send("NEXT_TURN_READY")
+
+    def answer_no(self):
+
+        self.recv_frame()
+        self.send_p(False)
+
+    def answer_none(self):
+
+        self.recv_frame()
+        self.send("none", protocol.TEXT)
+
+    def choose_paralysis_target(self):
+
+        self.recv_frame()
+        self.send("1", protocol.TEXT)
+
+    def summon_elemental(self):
+
+        self.send("1", protocol.TEXT)
+
+    def charm_person(self):
+
+        self.recv_frame()
+        self.send_p(("Left", "p"))
+
+    def choose_spell(self):
+
+        spell_list, hand = self.recv_p()
+        self.send(spell_list[0], protocol.TEXT)
+
+    def raise_dead(self):
+
+        dead, living = self.recv_p()
+        target = (dead + living)[0]
+        self.send(target.name, protocol.TEXT)
+
+    def command_monster(self):
+
+        targets, minion = self.recv_p()
+
+        target = minion.target_name
+        if target == "No target":
+            target = targets[0].name
+
+        self.send(target, protocol.TEXT)
+
+    def get_target(self):
+
+        self.recv_frame()
+        self.send("self", protocol.TEXT)
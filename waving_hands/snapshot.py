@@ -0,0 +1,144 @@
+# Incremental updates to the wizard status snapshot.
+#
+# The first snapshot a client receives is complete and carries a state number.
+# Every later one is a delta against the state before it:
+#
+#   {"version":  snapshot format, as in the complete snapshot
+#    "base":     state the delta applies to
+#    "state":    state after applying it
+#    "set":      {field: value} for plain fields that changed
+#    "history_self":   {hand: [op, text]}
+#    "history_others": {wizard name: {hand: [op, text]}}
+#    "monsters_set":   {monster name: master name}
+#    "monsters_del":   [monster name, ...]}
+#
+# Empty parts are left out. A history op is either APPEND, where the new
+# history is the old one with text added and trimmed to MAX_HISTORY gestures,
+# or SET, where text is the whole new history. A turn adds one gesture per
+# hand, so a delta stays the same size however long the game runs.
+#
+# A client whose state does not match the base of a delta asks for a complete
+# snapshot with STATUS_RESYNC.
+
+from waving_hands.gesture_history import MAX_HISTORY
+
+APPEND = "a"
+SET = "s"
+
+# Fields that are sent whole whenever they change.
+PLAIN_FIELDS = ("amnesia", "blind", "charmed", "confusion", "fear", "haste",
+                "hp", "enemy_hp", "paralyzed", "timestop")
+
+
+def diff_history(old, new):
+
+    """ Return the [op, text] that turns the old history into the new one,
+    or None if they are the same. """
+
+    if old == new:
+        return None
+
+    for added in range(1, len(new) + 1):
+        if (old + new[-added:])[-MAX_HISTORY:] == new:
+            return [APPEND, new[-added:]]
+
+    return [SET, new]
+
+
+def apply_history(old, op):
+
+    action, text = op
+
+    if action == APPEND:
+        return (old + text)[-MAX_HISTORY:]
+
+    return text
+
+
+def diff_hands(old, new):
+
+    """ Diff two {hand: history} dicts. """
+
+    changes = {}
+
+    for hand, history in new.items():
+        op = diff_history(old.get(hand, ""), history)
+        if op:
+            changes[hand] = op
+
+    return changes
+
+
+def diff_snapshot(old, new, base, state):
+
+    """ Return the delta that turns snapshot old into snapshot new. """
+
+    delta = {"version":new["version"], "base":base, "state":state}
+
+    changed = {}
+    for field in PLAIN_FIELDS:
+        if old.get(field) != new[field]:
+            changed[field] = new[field]
+    if changed:
+        delta["set"] = changed
+
+    history_self = diff_hands(old.get("history_self", {}), new["history_self"])
+    if history_self:
+        delta["history_self"] = history_self
+
+    history_others = {}
+    old_others = old.get("history_others", {})
+    for name, hands in new["history_others"].items():
+        changes = diff_hands(old_others.get(name, {}), hands)
+        if changes:
+            history_others[name] = changes
+    if history_others:
+        delta["history_others"] = history_others
+
+    old_monsters = old.get("monsters", {})
+    new_monsters = new["monsters"]
+
+    monsters_set = {}
+    for name, master in new_monsters.items():
+        if old_monsters.get(name) != master:
+            monsters_set[name] = master
+    if monsters_set:
+        delta["monsters_set"] = monsters_set
+
+    monsters_del = [name for name in old_monsters if name not in new_monsters]
+    if monsters_del:
+        delta["monsters_del"] = monsters_del
+
+    return delta
+
+
+def apply_delta(old, delta):
+
+    """ Return a new snapshot made by applying delta to snapshot old. """
+
+    new = dict(old)
+    new["version"] = delta["version"]
+
+    new.update(delta.get("set", {}))
+
+    history_self = dict(old["history_self"])
+    for hand, op in delta.get("history_self", {}).items():
+        history_self[hand] = apply_history(history_self.get(hand, ""), op)
+    new["history_self"] = history_self
+
+    history_others = {}
+    for name, hands in old["history_others"].items():
+        history_others[name] = dict(hands)
+    for name, changes in delta.get("history_others", {}).items():
+        hands = history_others.setdefault(name, {})
+        for hand, op in changes.items():
+            hands[hand] = apply_history(hands.get(hand, ""), op)
+    new["history_others"] = history_others
+
+    monsters = dict(old["monsters"])
+    monsters.update(delta.get("monsters_set", {}))
+    for name in delta.get("monsters_del", []):
+        monsters.pop(name, None)
+    new["monsters"] = monsters
+
+    return new
@@ -0,0 +1,155 @@
+from collections import deque
+
+from waving_hands import codec
+from waving_hands import protocol
+from waving_hands.transport import TcpTransport
+
+
+class SpectatorClient:
+
+    """ Watches a match being played, printing each round as it comes in.
+
+    A spectator never sends anything after its HELLO. It is sent the
+    gestures each wizard made as far as anyone could see them, where each
+    wizard stands, and the round report the players read.
+    """
+
+    def __init__(self,
+        host: str = "localhost",
+        port: int = 12345,
+        match: str = "",
+        transport = None,
+        output = print):
+        """
+        :param host: Server to connect to
+        :param port: Port of the server
+        :param match: Id of the match to watch, blank for the newest one
+        :param transport: Transport to reach the server by, instead of TCP to
+            host and port
+        :param output: Called with every line to show
+        """
+
+        self._server = None
+        self._transport = transport or TcpTransport(host, port)
+        self._ENC = protocol.ENC
+
+        self._match = match
+        self._output = output
+
+        self._unpacked = deque()
+        self._rounds = 0
+
+    @property
+    def server(self):
+        return self._server
+
+    @property
+    def match(self):
+        """ Id of the match being watched, once the server has said. """
+        return self._match
+
+    @property
+    def rounds(self):
+        return self._rounds
+
+    def connect(self):
+
+        self._server = self._transport.connect()
+        protocol.configure_socket(self._server)
+
+        hello = protocol.pack_hello(caps=protocol.capabilities(), spectate=self._match)
+        protocol.send_frame(self._server, protocol.HELLO, hello)
+
+    def watch(self):
+
+        """ Show the match until the server hangs up. Returns the number of
+        rounds seen. """
+
+        if not self.server:
+            self.connect()
+
+        handlers = {
+            "PRINT_FLAVOR":self.show_report,
+            "SPECTATE":self.show_welcome,
+            "SPECTATOR_ROUND":self.show_round,
+        }
+
+        try:
+            while True:
+                frame = self.recv_frame()
+                if frame is None:
+                    break
+
+                handler = handlers.get(frame.payload.decode(self._ENC)) if frame.tag == protocol.CMD else None
+                if handler:
+                    handler()
+        finally:
+            self.server.close()
+
+        return self._rounds
+
+    def recv_frame(self):
+
+        """ Return the next frame of the match, unpacking compressed ones. """
+
+        while True:
+            if self._unpacked:
+                return self._unpacked.popleft()
+
+            frame = protocol.recv_frame(self.server)
+
+            if frame is None or frame.tag not in (protocol.HELLO, protocol.COMPRESSED):
+                return frame
+
+            if frame.tag == protocol.COMPRESSED:
+                self._unpacked.extend(protocol.unpack_compressed(frame.payload))
+
+    def recv_p(self):
+
+        frame = self.recv_frame()
+        if frame is None:
+            raise ConnectionError("Server hung up mid-round.")
+
+        return codec.decode(frame.payload)
+
+    def show_welcome(self):
+
+        welcome = self.recv_p()
+        self._match = welcome["match"]
+
+        wizards = " vs ".join(name + " (" + str(hp) + " HP)" for name, hp in welcome["wizards"].items())
+        self._output("Watching match " + self._match + ": " + wizards)
+
+    def show_round(self):
+
+        summary = self.recv_p()
+        self._rounds += 1
+
+        self._output("--- Round " + str(self._rounds) + " ---")
+
+        for name, turns in summary["gestures"].items():
+            for gestures in turns:
+                self._output(name + " gestures " + gestures["left"] + " with the left hand and "
+                             + gestures["right"] + " with the right.")
+
+        self._output(", ".join(name + ": " + str(hp) + " HP" for name, hp in summary["wizards"].items()))
+
+    def show_report(self):
+
+        while True:
+            frame = self.recv_frame()
+            if frame is None or frame.tag == protocol.FLAVOR_END:
+                break
+            self._output(frame.payload.decode(self._ENC))
+
+
+def main(host, port, match=""):
+
+    client = SpectatorClient(host=host, port=port, match=match)
+
+    try:
+        rounds = client.watch()
+    except KeyboardInterrupt:
+        return
+
+    print("The match is over, after " + str(rounds) + " rounds.")
@@ -0,0 +1,177 @@
+# The spectators of one match.
+#
+# Spectators see what both players see: the round report, and the gestures
+# each wizard made as far as anyone could see them. Each round is encoded
+# once, and the same bytes are queued for every spectator; a spectator's
+# queue only holds views of those bytes, so a few hundred spectators cost
+# no more memory than one.
+#
+# Nothing here ever blocks. Whatever a spectator's socket will not take
+# right away waits in its queue, and goes out whenever the Gamemaster has a
+# moment. A spectator that falls too far behind is dropped, so a crowd of
+# slow connections never holds up the duel itself.
+
+from collections import deque
+import socket
+import threading
+
+HIGH_WATER = 256 * 1024
+
+
+class Watcher:
+
+    """ One spectator's connection and the bytes waiting to go to it. """
+
+    def __init__(self, sock, compressed):
+
+        self.sock = sock
+        self.compressed = compressed
+        self.waiting = deque()
+        self.size = 0
+
+    def put(self, data):
+
+        self.waiting.append(memoryview(data))
+        self.size += len(data)
+
+    def flush(self):
+
+        """ Send as much as the socket takes without blocking. Socket errors
+        are left to the caller. """
+
+        while self.waiting:
+            view = self.waiting[0]
+
+            try:
+                sent = self.sock.send(view)
+            except (BlockingIOError, InterruptedError):
+                return
+
+            self.size -= sent
+            if sent == len(view):
+                self.waiting.popleft()
+            else:
+                self.waiting[0] = view[sent:]
+
+
+class Spectators:
+
+    """ Every spectator of a match. Spectators may be added from any thread;
+    everything else is done by the Gamemaster's. """
+
+    def __init__(self, high_water=HIGH_WATER):
+        """
+        :param high_water: Bytes waiting past which a spectator is dropped
+        """
+
+        self._watchers = {}
+        self._lock = threading.Lock()
+
+        self._HIGH_WATER = high_water
+
+        self._joined = 0
+        self._dropped = 0
+        self._rounds = 0
+
+    def __len__(self):
+        return len(self._watchers)
+
+    def add(self, sock, greeting, compressed=False):
+
+        """ Start sending the match to a new spectator, beginning with the
+        greeting bytes.
+
+        :param compressed: The spectator takes COMPRESSED frames
+        """
+
+        # Nothing is ever read from a spectator, so its socket can be left
+        # non-blocking for good.
+        sock.setblocking(False)
+        watcher = Watcher(sock, compressed)
+
+        with self._lock:
+            self._watchers[sock] = watcher
+            self._joined += 1
+            self.send(watcher, greeting)
+
+    def broadcast(self, data, packed=None):
+
+        """ Queue the same bytes for every spectator.
+
+        :param data: Frames to send
+        :param packed: The same frames as a COMPRESSED frame, for the
+            spectators that take them
+        """
+
+        with self._lock:
+            self._rounds += 1
+            for watcher in list(self._watchers.values()):
+                if packed is not None and watcher.compressed:
+                    self.send(watcher, packed)
+                else:
+                    self.send(watcher, data)
+
+    def send(self, watcher, data):
+
+        watcher.put(data)
+
+        if watcher.size > self._HIGH_WATER:
+            self.drop(watcher, "fell too far behind")
+            return
+
+        self.flush_watcher(watcher)
+
+    def flush_watcher(self, watcher):
+
+        try:
+            watcher.flush()
+        except OSError:
+            self.drop(watcher, "went away")
+
+    def pending(self):
+
+        """ Return the sockets of spectators with bytes waiting. """
+
+        with self._lock:
+            return [sock for sock, watcher in self._watchers.items() if watcher.waiting]
+
+    def flush(self, sock):
+
+        """ Send what the socket will take of its spectator's queue. """
+
+        with self._lock:
+            watcher = self._watchers.get(sock)
+            if watcher:
+                self.flush_watcher(watcher)
+
+    def drop(self, watcher, reason):
+
+        self._watchers.pop(watcher.sock, None)
+        self._dropped += 1
+
+        print("Dropped a spectator that " + reason + ".")
+
+        watcher.sock.close()
+
+    def close(self):
+
+        """ Give every spectator one last chance to take what is waiting,
+        then hang up on them all. """
+
+        with self._lock:
+            for watcher in list(self._watchers.values()):
+                try:
+                    watcher.flush()
+                    watcher.sock.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                watcher.sock.close()
+
+            self._watchers = {}
+
+    def stats(self):
+
+        return {"watching":len(self._watchers),
+                "joined":self._joined,
+                "dropped":self._dropped,
+                "rounds":self._rounds}
@@ -2,31 +2,26 @@ class Spell:
 
     """ A spell doesn't know what it does -- it just holds data.
         Basically, it's a struct!
+
+        Spells are shared by every wizard in the process, so they never
+        change.
     """
 
-    def __init__(self, name, gesture, desc, kill):
+    def __init__(self, name, gesture, desc, kill, duration=0):
         self._name = name
         self._gesture = gesture
         self._desc = desc
         self._kill = kill
-        self._has_time = False
-        self._time_remaining = 0
+        self._duration = duration
 
     @property
     def has_time(self):
-        return self._has_time
-
-    @has_time.setter
-    def has_time(self, bool):
-        self._has_time = bool
+        return self._duration > 0
 
     @property
-    def time_remaining(self):
-        return self._time_remaining
-    
-    @time_remaining.setter
-    def time_remaining(self, value):
-        self._time_remaining = value
+    def duration(self):
+        """ Turns the spell lasts once cast, or 0. """
+        return self._duration
 
     @property
     def name(self):
@@ -0,0 +1,159 @@
+# Spell detection for many hand histories at once, with NumPy.
+#
+# This is for simulations and analysis, not the game itself, which follows
+# each hand one gesture at a time with a SpellMatcher. NumPy is optional; it
+# comes with the "batch" extra, and only this module needs it.
+#
+# Histories are given as a uint8 matrix with one row per history and one
+# column per gesture, newest in the last column, each gesture as its code
+# from gesture_history.GESTURES. A history shorter than the matrix is padded
+# at the front with PAD, which no spell gesture fits.
+#
+# For every column, a BatchMatcher has a table from gesture code to a
+# bitmask of the spells that gesture fits in that column: the spell's own
+# gesture there if the spell reaches back that far, or any gesture at all if
+# it does not. A history completes a spell when the spell's bit survives
+# ANDing together the masks of all its columns, so a whole batch takes one
+# table lookup and one AND per column, however many spells there are. A
+# hasted wizard's first set of gestures is checked by the same tables built
+# one column to the left, as if the last gesture had not been made.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from waving_hands.gesture_history import BITS, CODES, GESTURES, MAX_HISTORY, UNKNOWN
+
+# The spare code, for the front of a history shorter than the matrix.
+PAD = len(GESTURES)
+
+WORD = 64
+
+
+def require_numpy():
+
+    if numpy is None:
+        raise ImportError("Batch spell detection needs NumPy; install waving_hands[batch].")
+
+
+def encode_histories(histories, width=MAX_HISTORY):
+
+    """ Return the histories, strings or GestureHistories, as a uint8 code
+    matrix of the given width. Only the last width gestures of each are
+    kept. """
+
+    require_numpy()
+
+    histories = [str(history)[-width:].rjust(width, "\0") for history in histories]
+    if not histories:
+        return numpy.zeros((0, width), dtype=numpy.uint8)
+
+    lookup = numpy.full(256, UNKNOWN, dtype=numpy.uint8)
+    for gesture, code in CODES.items():
+        lookup[ord(gesture)] = code
+    lookup[0] = PAD
+
+    raw = numpy.frombuffer("".join(histories).encode("ascii", "replace"), dtype=numpy.uint8)
+
+    return lookup[raw].reshape(len(histories), width)
+
+
+def encode_packed(packed, lengths, width=MAX_HISTORY):
+
+    """ Return a code matrix from GestureHistory.packed values and the
+    lengths of the histories, as two sequences of the same length. """
+
+    require_numpy()
+
+    packed = numpy.asarray(packed, dtype=numpy.uint64)
+    lengths = numpy.asarray(lengths)
+
+    shifts = numpy.arange(width - 1, -1, -1, dtype=numpy.uint64) * numpy.uint64(BITS)
+    codes = ((packed[:, None] >> shifts[None, :]) & numpy.uint64(0xF)).astype(numpy.uint8)
+
+    codes[numpy.arange(width)[None, :] < (width - lengths)[:, None]] = PAD
+
+    return codes
+
+
+class BatchMatcher:
+
+    """ The spells of a spellbook, compiled for finding the spells each of a
+    batch of histories completes. """
+
+    def __init__(self, spells, width=MAX_HISTORY):
+        """
+        :param spells: The Spells to match, in the order of the result's
+            columns
+        :param width: Columns of the code matrices to be matched
+        """
+
+        require_numpy()
+
+        self._spells = tuple(spells)
+        self._width = width
+        self._words = max(1, -(-len(self._spells) // WORD))
+
+        self._tables = self.build_tables(0)
+        self._hasted_tables = self.build_tables(1)
+
+    @property
+    def spells(self):
+        return self._spells
+
+    def build_tables(self, skip):
+
+        """ Return the (width, codes, words) uint64 masks for histories whose
+        last skip gestures are left out. """
+
+        width = self._width
+        gestures = GESTURES + "\0"
+        tables = numpy.zeros((width, len(gestures), self._words), dtype=numpy.uint64)
+
+        for index, spell in enumerate(self._spells):
+            word, bit = divmod(index, WORD)
+            bit = numpy.uint64(1 << bit)
+
+            # The column the spell's first gesture falls in.
+            first = width - skip - len(spell.gesture)
+            if first < 0:
+                continue
+
+            for column in range(width):
+                position = column - first
+
+                for code, gesture in enumerate(gestures):
+                    if position < 0 or position >= len(spell.gesture):
+                        fits = True
+                    else:
+                        wanted = spell.gesture[position]
+                        fits = code != PAD and (gesture == wanted or (wanted.islower() and gesture.lower() == wanted))
+
+                    if fits:
+                        tables[column, code, word] |= bit
+
+        return tables
+
+    def completions(self, codes, hasted=False):
+
+        """ Return a bool matrix with a row for each history in the code
+        matrix and a column for each spell, True where the history completes
+        the spell. With hasted, the last gesture of each history is left out,
+        as for the first set of a hasted wizard's gestures; a spell as long
+        as the matrix is wide then cannot be completed, so give one more
+        column than the longest spell to see those. """
+
+        codes = numpy.asarray(codes, dtype=numpy.uint8)
+        if codes.ndim != 2 or codes.shape[1] != self._width:
+            raise ValueError("Expected a code matrix with " + str(self._width) + " columns.")
+
+        tables = self._hasted_tables if hasted else self._tables
+
+        masks = tables[0][codes[:, 0]]
+        for column in range(1, self._width):
+            masks &= tables[column][codes[:, column]]
+
+        bits = numpy.unpackbits(masks.astype("<u8").view(numpy.uint8), axis=1, bitorder="little")
+
+        return bits[:, :len(self._spells)].astype(bool)
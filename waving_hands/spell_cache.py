@@ -0,0 +1,115 @@
+# A compiled copy of each spellbook file, so that a new process can skip
+# reading and parsing the text.
+#
+# Each spellbook file gets one cache file, named after a hash of its path.
+# The cache holds the spells as parsed, the sha256 of the text they were
+# parsed from, and the modification time and size the file had then:
+#
+#   {"version": CACHE_VERSION, "path": real path, "mtime_ns": int,
+#    "size": int, "digest": sha256 hex, "spells": str}
+#
+# encoded with the codec. The spells are the name, gesture, desc and kill of
+# each spell in turn, joined by NUL characters into one string, which is
+# quicker to decode and split than a list of them.
+#
+# If the file's time and size still match, the text is not read at all; if
+# only its time changed, the text is read and hashed but not parsed. The
+# cache is only ever a shortcut: anything wrong with it means the file is
+# parsed as if there were none.
+
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+
+from waving_hands import codec
+
+log = logging.getLogger(__name__)
+
+# Bumped whenever the layout above or the way spellbooks are parsed changes.
+CACHE_VERSION = 1
+
+SEP = "\0"
+
+CACHE_DIR = pathlib.Path(os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache") / "waving_hands"
+
+FIELDS = 4
+
+
+def cache_path(path):
+
+    name = hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:32]
+
+    return pathlib.Path(CACHE_DIR) / ("spellbook-" + name + ".cache")
+
+
+def read(path):
+
+    """ Return the cache entry for the spellbook at the real path, or None
+    if there is none or it cannot be used. """
+
+    try:
+        with open(cache_path(path), "rb") as f:
+            entry = codec.decode(f.read())
+    except (OSError, ValueError):
+        # ValueError covers CodecError and text that is not utf-8.
+        return None
+
+    if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION or entry.get("path") != str(path):
+        return None
+
+    spells = entry.get("spells")
+    if not isinstance(spells, str) or (spells and (spells.count(SEP) + 1) % FIELDS):
+        return None
+
+    if not all(isinstance(entry.get(key), int) for key in ("mtime_ns", "size")):
+        return None
+
+    if not isinstance(entry.get("digest"), str):
+        return None
+
+    return entry
+
+
+def spells_of(entry):
+
+    """ Return the (name, gesture, desc, kill) of each spell in an entry. """
+
+    if not entry["spells"]:
+        return []
+
+    fields = entry["spells"].split(SEP)
+
+    return list(zip(*[iter(fields)] * FIELDS))
+
+
+def write(path, stat, digest, spells):
+
+    """ Save the spells parsed from the spellbook at the real path. Failing
+    to is only logged. """
+
+    entry = {"version":CACHE_VERSION,
+             "path":str(path),
+             "mtime_ns":stat.st_mtime_ns,
+             "size":stat.st_size,
+             "digest":digest,
+             "spells":SEP.join(field for spell in spells for field in spell)}
+
+    target = cache_path(path)
+
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written aside and renamed into place, so that another process never
+        # reads half a cache.
+        fd, temp = tempfile.mkstemp(dir=str(target.parent), prefix=target.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(codec.encode(entry))
+            os.replace(temp, str(target))
+        except BaseException:
+            os.unlink(temp)
+            raise
+    except OSError as e:
+        log.debug("Could not write spellbook cache %s: %s", target, e)
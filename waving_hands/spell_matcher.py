@@ -0,0 +1,215 @@
+# Follows the spells a hand's gestures are making, one gesture at a time.
+#
+# A spell is completed when its gestures are the last ones the hand made. A
+# lowercase gesture in the spellbook may be made with one hand or both, so it
+# matches either case in the hand's history; an uppercase one, such as the
+# clap C, has to be made with both hands and only matches itself.
+#
+# Where a hand stands is a MatchState: every spell whose first few gestures
+# are the hand's last few, and how many of them have been made. Each new
+# gesture moves the hand from one state to the next. The states are built
+# the first time some hand reaches them and kept, along with the moves out of
+# them, so after the first few turns of a match each gesture costs one dict
+# lookup however many spells there are.
+#
+# States and moves are only ever added, and a state is never changed once it
+# is built, so hands in different threads may share one SpellMatcher. Two
+# threads building the same state at once each get the one that was kept.
+#
+# The same states say how close a hand is to every spell. The most gestures
+# of a spell a state has made is the longest overlap between the end of the
+# history and the start of the spell, and the rest of the spell is the
+# shortest way to finish it: any shorter way would mean more of it had been
+# made already. So a forecast is worked out once per state, from the state
+# alone, and kept with it.
+
+import bisect
+from collections import namedtuple
+
+# A spell, how many more gestures it takes, and which, oldest first. An
+# uppercase gesture in the continuation needs both hands.
+Forecast = namedtuple("Forecast", ["spell", "remaining", "continuation"])
+
+
+class MatchState:
+
+    """ The spells a hand is part way through or has just completed. Built
+    by a SpellMatcher, never directly. """
+
+    def __init__(self, matcher, progress):
+
+        self._matcher = matcher
+        self._progress = progress
+        self._moves = {}
+        self._forecast = None
+        self._remaining = None
+
+        spells = matcher.spells
+        self._completed = tuple(spells[index] for index, made in sorted(progress)
+                                if made == len(spells[index].gesture))
+        self._in_progress = tuple((spells[index], made) for index, made in sorted(progress)
+                                  if made < len(spells[index].gesture))
+
+    @property
+    def progress(self):
+        """ frozenset of (index in the spellbook, gestures made) for every
+        spell the hand's last gestures are the start of. """
+        return self._progress
+
+    @property
+    def completed(self):
+        """ The spells completed by the latest gesture, in spellbook order. """
+        return self._completed
+
+    @property
+    def in_progress(self):
+        """ (Spell, gestures made) for every spell the hand's last gestures are
+        the start of but not the whole of, in spellbook order. """
+        return self._in_progress
+
+    @property
+    def forecast(self):
+        """ A Forecast for every spell, the soonest finished first and
+        spellbook order after that. """
+
+        if self._forecast is None:
+            forecast = self._matcher.forecast(self)
+            # Set last, so that another thread never sees it without the
+            # remaining counts within() needs.
+            self._remaining = [entry.remaining for entry in forecast]
+            self._forecast = forecast
+
+        return self._forecast
+
+    def within(self, horizon):
+
+        """ Return the Forecasts of the spells that can be finished in
+        horizon more gestures or fewer. """
+
+        forecast = self.forecast
+
+        # The forecast is sorted soonest first, so it is cut where the spells
+        # that are too far off start.
+        return forecast[:bisect.bisect_right(self._remaining, horizon)]
+
+    def next(self, gesture):
+
+        """ Return the state after one more gesture. """
+
+        state = self._moves.get(gesture)
+
+        if state is None:
+            state = self._matcher.move(self, gesture)
+            self._moves[gesture] = state
+
+        return state
+
+
+class SpellMatcher:
+
+    """ The spells of a spellbook, compiled for following what a hand is
+    casting. """
+
+    def __init__(self, spells):
+        """
+        :param spells: The Spells to match, in the order they should be
+            returned in
+        """
+
+        self._spells = tuple(spells)
+        self._longest = max((len(spell.gesture) for spell in self._spells), default=0)
+
+        # frozenset of (index, made): the MatchState for it
+        self._states = {}
+
+        self._start = self.state(frozenset())
+
+    @property
+    def spells(self):
+        return self._spells
+
+    @property
+    def longest(self):
+        """ The most gestures any one spell takes. """
+        return self._longest
+
+    @property
+    def start(self):
+        """ The state of a hand that has made no gestures. """
+        return self._start
+
+    def state(self, progress):
+
+        state = self._states.get(progress)
+
+        if state is None:
+            state = self._states.setdefault(progress, MatchState(self, progress))
+
+        return state
+
+    def move(self, state, gesture):
+
+        """ Build the state that gesture leads to from state. """
+
+        progress = set()
+
+        for index, made in state.progress:
+            if self.fits(self._spells[index].gesture, made, gesture):
+                progress.add((index, made + 1))
+
+        for index, spell in enumerate(self._spells):
+            if self.fits(spell.gesture, 0, gesture):
+                progress.add((index, 1))
+
+        return self.state(frozenset(progress))
+
+    def forecast(self, state):
+
+        """ Build the forecast for state; see MatchState.forecast. """
+
+        # index: the most gestures of the spell made
+        made = {}
+        for index, count in state.progress:
+            if count < len(self._spells[index].gesture) and count > made.get(index, 0):
+                made[index] = count
+
+        forecast = []
+        for index, spell in enumerate(self._spells):
+            count = made.get(index, 0)
+            forecast.append(Forecast(spell, len(spell.gesture) - count, spell.gesture[count:]))
+
+        # Stable, so spells as close as each other stay in spellbook order.
+        forecast.sort(key=lambda entry: entry.remaining)
+
+        return tuple(forecast)
+
+    def fits(self, spell_gesture, made, gesture):
+
+        """ Return True if gesture is the next one of spell_gesture after the
+        first made. """
+
+        if made >= len(spell_gesture):
+            return False
+
+        wanted = spell_gesture[made]
+
+        return gesture == wanted or (wanted.islower() and gesture.lower() == wanted)
+
+    def state_after(self, history):
+
+        """ Return the state of a hand whose history this is. Only the last
+        gestures a spell could take are looked at. """
+
+        state = self._start
+
+        for gesture in history[max(len(history) - self._longest, 0):]:
+            state = state.next(gesture)
+
+        return state
+
+    def matches(self, history):
+
+        """ Return the spells completed by the last gestures of history, in
+        spellbook order. """
+
+        return list(self.state_after(history).completed)
@@ -0,0 +1,205 @@
+# The spells cast this turn, waiting to be resolved.
+#
+# Each is a (caster, target, spell) tuple, kept in the order it was cast,
+# which is the order the Gamemaster resolves spells of the same name in.
+# Turn resolution mostly asks questions of the queue: is any Raise Dead
+# being cast, which is the first, what is being cast at this target or by
+# this caster. A plain list answers each of these by scanning every spell,
+# so a turn with many spells of one name took time on the square of them.
+#
+# Here every spell is a node in one list, in the order it was added, and
+# indexes by spell, by spell name, by caster and by target hold the
+# positions of the nodes. Removing a spell only blanks its node; the
+# indexes drop blanked positions as they come across them, so every
+# question costs one dict lookup plus, now and then, clearing out spells
+# already gone. The caster and target indexes are built again, without the
+# blanks, once more than half of what they hold is blank. Nodes are never
+# moved and an index being rebuilt is replaced rather than changed, so
+# spells may be added or removed while the queue is being walked without
+# upsetting the walk.
+# The queue only lives for one turn, so the blanked nodes are never
+# reclaimed.
+
+from collections import deque
+
+
+class SpellQueue:
+
+    """ (caster, target, spell) tuples in the order they were added, indexed
+    by spell name, caster and target. Iterates, tests membership and
+    removes as the list it replaced did. """
+
+    def __init__(self, spell_tuples=()):
+
+        # The tuple at each position, or None once it has been removed.
+        self._nodes = []
+        self._count = 0
+
+        # key: deque (or list) of positions in _nodes, oldest first
+        self._by_tuple = {}
+        self._by_name = {}
+        self._by_caster = {}
+        self._by_target = {}
+
+        # caster or target: how many of its positions are still queued
+        self._casting = {}
+        self._targeted = {}
+
+        for caster, target, spell in spell_tuples:
+            self.add(caster, target, spell)
+
+    def add(self, caster, target, spell):
+
+        """ Queue a spell behind the others. """
+
+        spell_tuple = (caster, target, spell)
+        position = len(self._nodes)
+
+        self._nodes.append(spell_tuple)
+        self._count += 1
+
+        self._by_tuple.setdefault(spell_tuple, deque()).append(position)
+        self._by_name.setdefault(spell.name, deque()).append(position)
+        self._by_caster.setdefault(caster, []).append(position)
+        self._by_target.setdefault(target, []).append(position)
+        self._casting[caster] = self._casting.get(caster, 0) + 1
+        self._targeted[target] = self._targeted.get(target, 0) + 1
+
+    def first_position(self, index, key):
+
+        """ Return the first position under key in one of the deque indexes
+        whose spell has not been removed, or None. """
+
+        positions = index.get(key)
+
+        if not positions:
+            return None
+
+        nodes = self._nodes
+        while positions and nodes[positions[0]] is None:
+            positions.popleft()
+
+        if not positions:
+            del index[key]
+            return None
+
+        return positions[0]
+
+    def remove(self, spell_tuple):
+
+        """ Remove the first queued spell equal to spell_tuple. Raises
+        ValueError if there is none. """
+
+        position = self.first_position(self._by_tuple, spell_tuple)
+
+        if position is None:
+            raise ValueError("SpellQueue.remove(x): x not in queue")
+
+        self._by_tuple[spell_tuple].popleft()
+        self._nodes[position] = None
+        self._count -= 1
+
+        caster, target, spell = spell_tuple
+        self._casting[caster] -= 1
+        self._targeted[target] -= 1
+
+    def contains_spell(self, spell_name):
+
+        """ Return True if a spell with this name is queued. """
+
+        return self.first_position(self._by_name, spell_name) is not None
+
+    def first(self, spell_name):
+
+        """ Return the first queued spell with this name, or None. """
+
+        position = self.first_position(self._by_name, spell_name)
+
+        if position is None:
+            return None
+
+        return self._nodes[position]
+
+    def pop_first(self, spell_name):
+
+        """ Remove and return the first queued spell with this name, or
+        None if there is none. """
+
+        spell_tuple = self.first(spell_name)
+
+        if spell_tuple is not None:
+            self.remove(spell_tuple)
+
+        return spell_tuple
+
+    def by_caster(self, caster):
+
+        """ Yield the queued spells cast by caster, in order. """
+
+        return self.walk(self.live_positions(self._by_caster, self._casting, caster))
+
+    def targeting(self, target):
+
+        """ Yield the queued spells cast at target, in order. """
+
+        return self.walk(self.live_positions(self._by_target, self._targeted, target))
+
+    def live_positions(self, index, live, key):
+
+        """ Return the positions under key in the caster or target index,
+        built again first if most of them have been removed. """
+
+        positions = index.get(key, ())
+
+        if len(positions) > 2 * live.get(key, 0) + 8:
+            nodes = self._nodes
+            positions = [position for position in positions if nodes[position] is not None]
+            index[key] = positions
+
+        return positions
+
+    def walk(self, positions):
+
+        # By index, so that spells added while the queue is walked are
+        # reached too.
+        nodes = self._nodes
+        i = 0
+        while i < len(positions):
+            spell_tuple = nodes[positions[i]]
+            if spell_tuple is not None:
+                yield spell_tuple
+            i += 1
+
+    def clear(self):
+
+        self._nodes = []
+        self._count = 0
+        self._by_tuple = {}
+        self._by_name = {}
+        self._by_caster = {}
+        self._by_target = {}
+        self._casting = {}
+        self._targeted = {}
+
+    def __iter__(self):
+
+        nodes = self._nodes
+        i = 0
+        while i < len(nodes):
+            spell_tuple = nodes[i]
+            if spell_tuple is not None:
+                yield spell_tuple
+            i += 1
+
+    def __contains__(self, spell_tuple):
+
+        if not isinstance(spell_tuple, tuple):
+            return False
+
+        return self.first_position(self._by_tuple, spell_tuple) is not None
+
+    def __len__(self):
+        return self._count
+
+    def __repr__(self):
+        return "SpellQueue(" + repr(list(self)) + ")"
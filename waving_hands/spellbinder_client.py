@@ -1,28 +1,35 @@
+from collections import deque
 from random import randint
 
 import curses
 import os
-import pickle
 import select
-import socket
 import sys
+import threading
 import time
 
-from waving_hands.spellbook import Spellbook
+from waving_hands.gesture_history import GestureHistory
+from waving_hands import spellbook
 from waving_hands.targetable_client import TargetableClient
 from waving_hands.config import DATA
+from waving_hands.transport import TcpTransport
+from waving_hands import codec
+from waving_hands import netstats
+from waving_hands import protocol
+from waving_hands import snapshot as status
 
 class SpellbinderClient:
 
-    def __init__(self, host: str = "localhost", port: int = 12345):
+    def __init__(self, host: str = "localhost", port: int = 12345, room: str = None, transport=None):
 
         self._server = None
+        self._transport = transport or TcpTransport(host, port)
+        self._room      = room
 
         self._HOST      = host
         self._PORT      = port
         self._HOST_ADDR = (self._HOST, self._PORT)
-        self._ENC       = "utf-8"
-        self._BUFFSIZE  = 1024
+        self._ENC       = protocol.ENC
 
         self._screen    = None
         self._MAX_WIDTH = 79
@@ -34,7 +41,7 @@ class SpellbinderClient:
         self._hp        = 14
         self._name      = "Merlin"
 
-        self._spellbook = Spellbook(DATA["spellbook"])
+        self._spellbook = spellbook.load(DATA["spellbook"])
         self._hands     = {}
         self._perceived_history = {}
         self._monsters  = {}
@@ -49,6 +56,50 @@ class SpellbinderClient:
         self._charmed_hand = ""
         self._paralyzed_hand = ""
 
+        # The last status snapshot and its state number, for applying deltas.
+        self._status = None
+        self._status_state = 0
+
+        # Capabilities the server agreed to, and frames unpacked from a
+        # COMPRESSED frame that have not been handled yet.
+        self._caps = []
+        self._unpacked = deque()
+
+        # Sequence number of the last notice from the server.
+        self._notice_seq = 0
+
+        # Resume token from the server, bytes of the match sent and received,
+        # and the most recent bytes sent, kept to send again after a resume.
+        self._token = ""
+        self._sent = 0
+        self._received = 0
+        self._sent_log = bytearray()
+
+        # Bytes and round trips per kind of message. A round trip here is
+        # the wait from our answer to the server's next frame.
+        self._net_stats = netstats.NetStats()
+        self._link = netstats.Link(self._net_stats, asks=False)
+
+        # Held while sending, so heartbeats do not land in the middle of a frame.
+        self._send_lock = threading.RLock()
+        self._stopping = threading.Event()
+
+        self._HEARTBEAT_INTERVAL = 5
+        self._RESUME_WINDOW = 60
+        self._REPLAY_BYTES = 256 * 1024
+
+    @property
+    def net_stats(self):
+        return self._net_stats
+
+    @property
+    def room(self):
+        return self._room
+
+    @room.setter
+    def room(self, name):
+        self._room = name
+
     @property
     def autospell(self):
         return self._autospell
@@ -87,7 +138,8 @@ class SpellbinderClient:
 
     @hands.setter
     def hands(self, new_dict):
-        self._hands = new_dict
+        # Histories arrive as the strings Hand.show_history sends.
+        self._hands = {hand:GestureHistory.from_shown(history) for hand, history in new_dict.items()}
 
     @property
     def haste_turn_two(self):
@@ -143,7 +195,8 @@ class SpellbinderClient:
 
     @perceived_history.setter
     def perceived_history(self, new_dict):
-        self._perceived_history = new_dict
+        self._perceived_history = {name:{hand:GestureHistory.from_shown(history) for hand, history in hands.items()}
+                                   for name, hands in new_dict.items()}
 
     @property
     def screen(self):
@@ -199,10 +252,7 @@ class SpellbinderClient:
 
                         command = self.dec(command)
 
-                        if command == "MSG":
-                            self.dmsg("Received MSG request")
-                            self.receive_msg()
-                        elif command == "COMMAND_MONSTER":
+                        if command == "COMMAND_MONSTER":
                             self.command_monster()
                         elif command == "CUSTOMIZE":
                             self.customization()
@@ -214,6 +264,8 @@ class SpellbinderClient:
                             self.choose_charm_person_info()
                         elif command == "ENCHANTMENT_PARALYSIS":
                             self.choose_paralysis_target()
+                        elif command == "LOBBY":
+                            self.choose_room()
                         elif command == "GET_GESTURES":
                             self.get_gestures()
                         elif command == "GET_PERMANENT":
@@ -242,12 +294,39 @@ class SpellbinderClient:
             for monster in self.monsters:
                 self.print_t(monster + ", " + self.monsters[monster] + "\'s minion")
 
+    def choose_room(self):
+
+        """ Tell a lobby server which room to join. The room given on the
+        command line is used if there is one, otherwise ask. A blank name
+        joins any room that is waiting for players. """
+
+        rooms = self.recv()
+
+        if not self.response(rooms, "Server died while sending the room list."):
+            return
+
+        rooms = self.deserialize(rooms)
+
+        if self.room is None:
+            self.clear_screen()
+
+            if rooms:
+                self.print_t("Rooms:\n")
+                for room in rooms:
+                    state = "playing" if room["playing"] else "waiting"
+                    self.print_t("{0} ({1}/{2}, {3})".format(room["name"], room["players"], room["capacity"], state))
+            else:
+                self.print_t("There are no rooms yet.")
+
+            self.room = input("\nRoom to join (blank for any): ").strip()
+
+        self.send(self.room, tag=protocol.TEXT)
+
     def get_permanency(self):
 
-        self.send("GET_PERMANENT_ACK")
         permanencies = self.recv()
-        if self.response(permanencies, "Server died before sending pickled permanencies."):
-            permanencies = self.depickle(permanencies)
+        if self.response(permanencies, "Server died before sending encoded permanencies."):
+            permanencies = self.deserialize(permanencies)
 
             self.clear_screen()
 
@@ -273,14 +352,13 @@ class SpellbinderClient:
                     except ValueError:
                         self.print_t("Your choice is invalid.")
 
-            self.send_p(self.pickle(choice))
+            self.send(choice)
 
             self.wait_msg()
 
 
     def offer_permanency(self):
 
-        self.send("OFFER_PERMANENCY_ACK")
         spell_name = self.recv()
         if self.response(spell_name, "Server died before sending Permanency spell name."):
             spell_name = self.dec(spell_name)
@@ -296,16 +374,15 @@ class SpellbinderClient:
                 else:
                     self.print_t("Your choice is invalid.")
 
-            self.send_p(self.pickle(choice))
+            self.send_p(self.serialize(choice))
 
             self.wait_msg()
 
     def delayed_spell_store_query(self):
 
-        self.send("DELAYED_SPELL_STORE_QUERY_ACK", True)
         data_p = self.recv()
-        if self.response(data_p, "Server died while sending pickled delayed spell storage info to client."):
-            delayable_names = self.depickle(data_p)
+        if self.response(data_p, "Server died while sending encoded delayed spell storage info to client."):
+            delayable_names = self.deserialize(data_p)
 
             self.clear_screen()
 
@@ -337,10 +414,9 @@ class SpellbinderClient:
 
     def delayed_spell_release_query(self):
 
-        self.send("DELAYED_SPELL_RELEASE_QUERY_ACK", True)
         data_p = self.recv()
-        if self.response(data_p, "Server died while sending pickled delayed spell release info to client."):
-            delayed_spell_name = self.depickle(data_p)
+        if self.response(data_p, "Server died while sending encoded delayed spell release info to client."):
+            delayed_spell_name = self.deserialize(data_p)
 
             while True:
 
@@ -357,7 +433,7 @@ class SpellbinderClient:
                     self.print_t("Your choice is invalid.")
 
             self.wait_msg()
-            self.send_p(self.pickle(choice))
+            self.send_p(self.serialize(choice))
 
     def wait_msg(self):
 
@@ -367,8 +443,6 @@ class SpellbinderClient:
 
     def choose_charm_person_info(self):
 
-        self.send("CHARM_PERSON_ACK")
-        self.print_t("Send CHARM_PERSON_ACK to server.")
         enemy_name = self.recv()
         if self.response(enemy_name, "Server died while client waited for charm person enemy name."):
             enemy_name = self.dec(enemy_name)
@@ -419,48 +493,41 @@ class SpellbinderClient:
                     self.print_t("Your choice is invalid.")
 
             data_p = (charmed_hand, charmed_gesture)
-            self.send_p(self.pickle(data_p))
-            self.print_t("Sent pickled charm person info to server.")
+            self.send_p(self.serialize(data_p))
+            self.print_t("Sent encoded charm person info to server.")
 
     def summon_elemental(self):
 
-        self.send("SUMMON_ACK")
-        self.print_t("Sent SUMMON_ACK to server, waiting on response")
-
-        if self.response(self.recv(), "Server died while client was waiting for response to SUMMON_ACK."):
-
-            self.clear_screen()
+        self.clear_screen()
 
-            self.print_t(self.name + ": What type of elemental will you summon?\n")
+        self.print_t(self.name + ": What type of elemental will you summon?\n")
 
-            hands = ("Fire Elemental", "Ice Elemental")
+        hands = ("Fire Elemental", "Ice Elemental")
 
-            for i,hand in enumerate(hands, 1):
-                self.print_t(str(i) + ". " + hand)
+        for i,hand in enumerate(hands, 1):
+            self.print_t(str(i) + ". " + hand)
 
-            choice = 0
+        choice = 0
 
-            while True:
-                try:
-                    choice = int(input("\nChoose a type (by number): "))
-                    if choice > 0 and choice < 3:
-                        break
-                    else:
-                        self.print_t("Your choice is invalid.")
-                except ValueError:
+        while True:
+            try:
+                choice = int(input("\nChoose a type (by number): "))
+                if choice > 0 and choice < 3:
+                    break
+                else:
                     self.print_t("Your choice is invalid.")
+            except ValueError:
+                self.print_t("Your choice is invalid.")
 
-            self.print_t("Sending choice " + str(choice) + " to server.")
-            self.send(str(choice))
+        self.print_t("Sending choice " + str(choice) + " to server.")
+        self.send(str(choice))
 
     def choose_paralysis_target(self):
 
-        self.send("PARALYSIS_ACK")
-        self.print_t("Sent PARALYSIS_ACK to server, waiting on pickled data")
         target_name = self.recv()
 
-        if self.response(target_name, "Server died while client was waiting for pickled paralysis data."):
-            target_name = self.depickle(target_name)
+        if self.response(target_name, "Server died while client was waiting for encoded paralysis data."):
+            target_name = self.deserialize(target_name)
 
             self.clear_screen()
 
@@ -491,13 +558,10 @@ class SpellbinderClient:
 
         """ Receive a pregame flavor list and iterate through it. """
 
-        self.send("PREGAME_ACK")
         pregame_flavor = self.recv()
 
-        if self.response(pregame_flavor, "Server died while sending pickled pregame flavor list."):
-            pregame_flavor = self.depickle(pregame_flavor)
-
-            self.send("PREGAME_COMPLETE")
+        if self.response(pregame_flavor, "Server died while sending encoded pregame flavor list."):
+            pregame_flavor = self.deserialize(pregame_flavor)
 
             self.clear_screen()
 
@@ -518,11 +582,10 @@ class SpellbinderClient:
 
         """ Multiple spells are being cast -- choose one. """
 
-        self.send("MULTIPLE_SPELLS_ACK")
         data_p = self.recv()
 
-        if self.response(data_p, "Server died while client waited for multiple spells pickle."):
-            spell_list, hand_casting = self.depickle(data_p)
+        if self.response(data_p, "Server died while client waited for multiple spells data."):
+            spell_list, hand_casting = self.deserialize(data_p)
 
             self.clear_screen()
 
@@ -548,83 +611,62 @@ class SpellbinderClient:
 
     def round_end(self):
 
-        """ Receive the list containing all of the round's flavor messages,
-        and then print them one-by-one. Ask for confirmation before continuing.
+        """ Receive the round's flavor messages one line at a time and print
+        each one as it arrives. Ask for confirmation before continuing.
         """
 
         self.print_t("Receiving PRINT_FLAVOR.")
-        self.send("PRINT_FLAVOR_ACK")
-        self.print_t("Sent PRINT_FLAVOR_ACK")
-
-        size = self.recv()
-        if self.response(size, "Server died before data size was sent"):
-            size = int.from_bytes(size, "big")
-            self.print_t("Incoming size is " + str(size))
-            self.send("SIZE_ACK")
-
-            flavor_list = b""
-            while len(flavor_list) < size:
-                self.print_t("Receiving...")
-                data = self.recv(4096)
-                if not data:
-                    break
-                flavor_list += data
-                self.print_t("Size is now " + str(len(flavor_list)))
-                if "\0" in self.depickle(flavor_list):
-                    # EOF
-                    break
-                if len(flavor_list) < size:
-                    self.send("MORE_DATA")
-                    self.print_t("Sent MORE_DATA request")
 
-            self.send("DATA_DONE")
-            self.print_t("Sent DATA_DONE request")
+        self.clear_screen()
 
-        if self.response(flavor_list, "Server died before sending flavor list."):
-            flavor_list = self.depickle(flavor_list)
+        game_ending = False
+        time_stopping = False
 
-            self.clear_screen()
+        while True:
+            frame = self.recv_frame()
 
-            game_ending = False
-            time_stopping = False
+            if not self.response(frame, "Server died before sending flavor list."):
+                return
 
-            for line in flavor_list:
-                if line == "\0":
-                    continue
-                ending = self.check_for_game_end(line)
-                if self.check_for_timestop_end(line):
-                    time_stopping = False
-                if not ending:
-                    if not time_stopping:
-                        if "blind" in self.enchantments:
-                            # Ignore any strings that do not have our name.
-                            if line.find(self.name) > -1:
-                                # It's here.
-                                self.print_t(line)
-                                time.sleep(self.sleep_time)
-                        else:
-                            self.print_t(line)
-                            time.sleep(self.sleep_time)
-                        time_stopping = self.check_for_timestop(line)
-                    else:
-                        # When timestopped, remove any lines that do not include our name.
+            if frame.tag == protocol.FLAVOR_END:
+                break
+
+            line = self.dec(frame.payload)
+
+            ending = self.check_for_game_end(line)
+            if self.check_for_timestop_end(line):
+                time_stopping = False
+            if not ending:
+                if not time_stopping:
+                    if "blind" in self.enchantments:
+                        # Ignore any strings that do not have our name.
                         if line.find(self.name) > -1:
-                            # Our name is here. Further review...
+                            # It's here.
                             self.print_t(line)
                             time.sleep(self.sleep_time)
-
+                    else:
+                        self.print_t(line)
+                        time.sleep(self.sleep_time)
+                    time_stopping = self.check_for_timestop(line)
                 else:
-                    game_ending = True
-                    self.print_t(line)
-                    time.sleep(self.sleep_time)
-
-            input("\nPress enter to continue.")
+                    # When timestopped, remove any lines that do not include our name.
+                    if line.find(self.name) > -1:
+                        # Our name is here. Further review...
+                        self.print_t(line)
+                        time.sleep(self.sleep_time)
 
-            if game_ending:
-                self.print_t("\nThank you for playing Richard Bartle's Spellbinder!\n")
-                self.kill_connection("GAME OVER")
             else:
-                self.send("NEXT_TURN_READY")
+                game_ending = True
+                self.print_t(line)
+                time.sleep(self.sleep_time)
+
+        input("\nPress enter to continue.")
+
+        if game_ending:
+            self.print_t("\nThank you for playing Richard Bartle's Spellbinder!\n")
+            self.kill_connection("GAME OVER")
+        else:
+            self.send("NEXT_TURN_READY")
 
     def check_for_timestop(self, line):
 
@@ -658,15 +700,11 @@ class SpellbinderClient:
 
         """ Choose a target and either raise it from the dead or heal it. """
 
-        
-
-        self.send("RAISE_DEAD_ACK")
-
         # Receive a list in the format [list minion_graveyard, list living_targets]
         p_data = self.recv()
 
-        if self.response(p_data, "Server died before sending Raise Dead pickle data"):
-            dead, living = self.depickle(p_data)
+        if self.response(p_data, "Server died before sending Raise Dead data"):
+            dead, living = self.deserialize(p_data)
 
             target = "No target"
 
@@ -740,12 +778,13 @@ class SpellbinderClient:
 
         self.clear_screen()
 
-        self.send("COMMAND_MONSTER_ACK")
-
-        # Receive a list in the format [list targets, string
+        # Receive a list in the format [list targets, TargetableClient minion]
         p_data = self.recv()
 
-        targets, minion = self.depickle(p_data)
+        if not self.response(p_data, "Server died before sending monster command data."):
+            return
+
+        targets, minion = self.deserialize(p_data)
         target = minion.target_name
 
         while True:
@@ -806,16 +845,17 @@ class SpellbinderClient:
 
     def get_target(self):
 
-        """ Received an attack name and a pickled target list from the server. """
+        """ Received an attack name and an encoded target list from the server. """
 
         self.clear_screen()
 
-        self.send("GET_TARGET_ACK")
-        
         # Receive a list in the format [list targets, string attack]
         p_data = self.recv()
 
-        targets, attack = self.depickle(p_data)
+        if not self.response(p_data, "Server died before sending target data."):
+            return
+
+        targets, attack = self.deserialize(p_data)
 
         target = "self"
 
@@ -888,30 +928,26 @@ class SpellbinderClient:
 
     def dead_response(self, data):
 
-        """ Returns True if the encoded data passed is a blank bytestring,
-        otherwise returns False. """
+        """ Returns True if the data passed is None, which recv() returns
+        once the server has closed the connection, otherwise returns False. """
 
-        if data == b'':
+        if data is None:
             return True
         else:
             return False
 
-    def receive_msg(self):
+    def show_notice(self, payload):
 
-        """ Prepare to receive a message.  Send the server ACK_MSG. Receive
-        message. Send the server ACKACK_MSG to confirm it was received, then
-        print to the client. """
+        """ Print a notice from the server. Notices can arrive between any two
+        frames and are never answered. """
 
-        self.dmsg("Sending ACK_MSG")
-        self.send("ACK_MSG")
-        self.dmsg("Sent ACK_MSG")
+        seq, text = protocol.unpack_notice(payload)
 
-        gen_msg = self.recv()
-        if self.dead_response(gen_msg):
-            self.kill_connection("Server died during MSG.")
-        else:
-            self.print_t(self.dec(gen_msg))
-            self.send("ACKACK_MSG")
+        if seq != self._notice_seq + 1:
+            self.dmsg("Missed " + str(seq - self._notice_seq - 1) + " notices from the server.")
+        self._notice_seq = seq
+
+        self.print_t(text)
 
     def clear_enchantments(self):
 
@@ -978,7 +1014,7 @@ class SpellbinderClient:
             amnesia = self.recv()
 
             if self.response(amnesia, "Server stopped communicating during the STATUS_AMNESIA request."):
-                amnesia = self.depickle(amnesia)
+                amnesia = self.deserialize(amnesia)
 
                 if amnesia:
                     self.add_enchantment("amnesia")
@@ -987,7 +1023,7 @@ class SpellbinderClient:
             blind = self.recv()
 
             if self.response(blind, "Server stopped communicating during the STATUS_BLIND request."):
-                blind = self.depickle(blind)
+                blind = self.deserialize(blind)
 
                 if blind:
                     self.add_enchantment("blind")
@@ -996,7 +1032,7 @@ class SpellbinderClient:
             charmed = self.recv()
 
             if self.response(charmed, "Server stopped communicating during the STATUS_CHARMED request."):
-                charmed, charmed_hand = self.depickle(charmed)
+                charmed, charmed_hand = self.deserialize(charmed)
 
                 if charmed:
                     self.charmed_hand = charmed_hand
@@ -1006,7 +1042,7 @@ class SpellbinderClient:
             confusion = self.recv()
 
             if self.response(confusion, "Server stopped communicating during the STATUS_CONFUSION request."):
-                confusion = self.depickle(confusion)
+                confusion = self.deserialize(confusion)
 
                 if confusion:
                     self.add_enchantment("confusion")
@@ -1015,7 +1051,7 @@ class SpellbinderClient:
             fear = self.recv()
             
             if self.response(fear, "Server stopped communicating during the STATUS_FEAR request."):
-                fear = self.depickle(fear)
+                fear = self.deserialize(fear)
                 
                 if fear:
                     self.add_enchantment("fear")
@@ -1024,25 +1060,25 @@ class SpellbinderClient:
             haste = self.recv()
 
             if self.response(haste, "Server stopped communicating during the STATUS_HASTE request."):
-                self.hasted = self.depickle(haste)
+                self.hasted = self.deserialize(haste)
 
             self.send("STATUS_HP")
             hp = self.recv()
 
             if self.response(hp, "Server stopped communicating during the STATUS_HP request."):
-                self.hp = self.depickle(hp)
+                self.hp = self.deserialize(hp)
 
             self.send("STATUS_ENEMY_HP")
             enemy_hp = self.recv()
 
             if self.response(enemy_hp, "Server stopped communicating during the STATUS_ENEMY_HP request."):
-                self.enemy_hp = self.depickle(enemy_hp)
+                self.enemy_hp = self.deserialize(enemy_hp)
 
             self.send("STATUS_MONSTERS")
             monsters = self.recv()
 
             if self.response(monsters, "Server stopped communicating during the STATUS_MONSTERS request."):
-                monsters = self.depickle(monsters)
+                monsters = self.deserialize(monsters)
 
                 if monsters:
                     self.monsters = monsters
@@ -1051,7 +1087,7 @@ class SpellbinderClient:
             paralysis = self.recv()
 
             if self.response(paralysis, "Server stopped communicating during the STATUS_PARALYZED request."):
-                paralysis, paralyzed_hand = self.depickle(paralysis)
+                paralysis, paralyzed_hand = self.deserialize(paralysis)
 
                 if paralysis:
                     self.paralyzed_hand = paralyzed_hand
@@ -1061,27 +1097,236 @@ class SpellbinderClient:
             timestop = self.recv()
 
             if self.response(timestop, "Server stopped communicating during the STATUS_TIMESTOP request."):
-                self.timestopped = self.depickle(timestop)
+                self.timestopped = self.deserialize(timestop)
+
+    def receive_status(self):
+
+        """ Receive a status snapshot or delta and return the complete
+        snapshot, asking the server for a full one if a delta does not follow
+        on from the snapshot we have. """
+
+        frame = self.recv_frame()
+
+        if not self.response(frame, "Server died before sending the status snapshot."):
+            return None
+
+        data = self.deserialize(frame.payload)
+
+        if frame.tag == protocol.STATUS_DELTA:
+            if self._status is not None and data["base"] == self._status_state:
+                self._status = status.apply_delta(self._status, data)
+                self._status_state = data["state"]
+                return self._status
+
+            self.dmsg("Status delta does not follow state " + str(self._status_state) + ", resyncing.")
+            self.send("STATUS_RESYNC")
+            return self.receive_status()
+
+        self._status = data
+        self._status_state = data.get("state", 0)
+
+        return self._status
 
-    def send(self, msg, reason=False):
+    def apply_status_snapshot(self, snapshot):
+
+        """ Update the wizard's status from a snapshot sent by the server. """
+
+        self.clear_enchantments()
+
+        for enchantment in ("amnesia", "blind", "confusion", "fear"):
+            if snapshot[enchantment]:
+                self.add_enchantment(enchantment)
+
+        charmed, charmed_hand = snapshot["charmed"]
+        if charmed:
+            self.charmed_hand = charmed_hand
+            self.add_enchantment("charmed")
+
+        paralysis, paralyzed_hand = snapshot["paralyzed"]
+        if paralysis:
+            self.paralyzed_hand = paralyzed_hand
+            self.add_enchantment("paralyzed")
+
+        self.hasted = snapshot["haste"]
+        self.hp = snapshot["hp"]
+        self.enemy_hp = snapshot["enemy_hp"]
+        self.monsters = snapshot["monsters"]
+        self.timestopped = snapshot["timestop"]
+
+        self.hands = snapshot["history_self"]
+        self.perceived_history = snapshot["history_others"]
+
+    def send(self, msg, reason=False, tag=protocol.CMD):
 
         """ Send to server as an encoded string. """
 
         if reason:
             self.print_t("Sending " + msg + " to server.")
 
-        self.server.send(msg.encode(self._ENC))
+        self.send_frame(tag, msg.encode(self._ENC))
+
+    def send_frame(self, tag, payload=b""):
+
+        """ Send a frame of the match. If the connection has dropped, resume
+        the session first; the frame is sent again as part of the resume. """
 
-    def recv(self, buff=0):
+        data = protocol.pack_frame(tag, payload)
 
-        """ Receive from server. """
+        with self._send_lock:
+            self._sent += len(data)
+            self._sent_log += data
+            if len(self._sent_log) > self._REPLAY_BYTES:
+                del self._sent_log[:len(self._sent_log) - self._REPLAY_BYTES]
 
-        if buff == 0:
-            buff = self._BUFFSIZE
+            self._link.sent(tag, payload)
+
+            try:
+                self.server.sendall(data)
+            except OSError:
+                if not self.resume():
+                    self.kill_connection("Lost the connection to the server.")
+
+    def recv(self):
+
+        """ Receive the payload of the next frame from the server.
+        Returns None if the server has closed the connection. """
+
+        frame = self.recv_frame()
+
+        if frame is None:
+            return None
+
+        return frame.payload
+
+    def recv_frame(self):
+
+        """ Receive the next whole frame from the server, printing any
+        notices that arrive first. If the connection drops, resume the
+        session; None is returned only if that fails. """
 
         self.dmsg("Receiving message...")
 
-        return self.server.recv(buff)
+        while True:
+            if self._unpacked:
+                frame = self._unpacked.popleft()
+            else:
+                frame = self.read_frame()
+
+                if frame is None:
+                    if self.resume():
+                        continue
+                    return None
+
+                if frame.tag == protocol.SESSION:
+                    self.start_session(frame.payload)
+                    continue
+
+                if frame.tag == protocol.HELLO:
+                    self._caps = self.deserialize(frame.payload).get("caps", [])
+                    continue
+
+                self._received += protocol.HEADER.size + len(frame.payload)
+
+                if frame.tag == protocol.COMPRESSED:
+                    self._unpacked.extend(protocol.unpack_compressed(frame.payload))
+                    continue
+
+            self._link.received(frame.tag, frame.payload)
+
+            if frame.tag != protocol.NOTICE:
+                return frame
+
+            self.show_notice(frame.payload)
+
+    def read_frame(self):
+
+        try:
+            return protocol.recv_frame(self.server)
+        except OSError:
+            return None
+
+    def start_session(self, payload):
+
+        """ Keep the resume token the server sends once we are in a match.
+        The match starts here, so this is where counting bytes starts. """
+
+        session = self.deserialize(payload)
+
+        with self._send_lock:
+            self._token = session["token"]
+            self._sent = 0
+            self._received = 0
+            self._sent_log = bytearray()
+
+    def resume(self):
+
+        """ Reconnect after losing the server and carry on with the match
+        from where it was. Returns False if there is no match to go back to,
+        or the server cannot be reached within the resume window. """
+
+        if not self._token:
+            return False
+
+        self.print_t("Lost the connection to the server, reconnecting...")
+
+        give_up = time.monotonic() + self._RESUME_WINDOW
+
+        with self._send_lock:
+            self.server.close()
+
+            while time.monotonic() < give_up:
+                try:
+                    sock = self._transport.connect(timeout=self._HEARTBEAT_INTERVAL)
+                except OSError:
+                    time.sleep(1)
+                    continue
+
+                protocol.configure_socket(sock)
+
+                try:
+                    protocol.send_frame(sock, protocol.HELLO, protocol.pack_hello(self._token, self._received))
+                    answer = protocol.recv_frame(sock)
+                except OSError:
+                    answer = None
+
+                # The server is there but no longer has our match.
+                if answer is None or answer.tag != protocol.SESSION:
+                    sock.close()
+                    return False
+
+                received = self.deserialize(answer.payload)["received"]
+                first = self._sent - len(self._sent_log)
+                if not first <= received <= self._sent:
+                    sock.close()
+                    return False
+
+                self.server = sock
+
+                try:
+                    sock.sendall(self._sent_log[received - first:])
+                except OSError:
+                    continue
+
+                self.print_t("Reconnected.")
+                return True
+
+        return False
+
+    def start_heartbeat(self):
+
+        """ Let the server know we are still here while the player thinks. """
+
+        threading.Thread(target=self.heartbeat_loop, daemon=True).start()
+
+    def heartbeat_loop(self):
+
+        while not self._stopping.wait(self._HEARTBEAT_INTERVAL):
+            with self._send_lock:
+                try:
+                    protocol.send_frame(self.server, protocol.HEARTBEAT)
+                except OSError:
+                    # Noticed and dealt with by the next send or receive.
+                    pass
 
     def dmsg(self, msg: str) -> None:
 
@@ -1096,23 +1341,23 @@ class SpellbinderClient:
 
         return msg.decode(self._ENC)
 
-    def send_p(self, pickled_item):
+    def send_p(self, encoded_item):
 
-        """ Send a pickled item. """
+        """ Send an encoded item. """
 
-        self.server.send(pickled_item)
+        self.send_frame(protocol.DATA, encoded_item)
 
-    def depickle(self, pickled_item):
+    def deserialize(self, data):
 
-        """ Return the depickled version of the item. """
+        """ Return the item encoded in data. """
 
-        return pickle.loads(pickled_item)
+        return codec.decode(data)
 
-    def pickle(self, item):
+    def serialize(self, item):
 
-        """ Return the pickled version of the item. """
+        """ Return the encoded version of the item. """
 
-        return pickle.dumps(item)
+        return codec.encode(item)
 
     def get_gestures(self):
 
@@ -1121,22 +1366,24 @@ class SpellbinderClient:
 
         # TODO: For @, the wizard calls self._spellbook.list_spells()
 
-        self.get_wizard_status("gesture")
+        # The server pushes a status snapshot, or the changes since the last
+        # one, right after GET_GESTURES. Only ask for each field in turn if it
+        # is a snapshot we do not understand.
+        snapshot = self.receive_status()
+
+        if snapshot and snapshot.get("version") == protocol.SNAPSHOT_VERSION:
+            self.apply_status_snapshot(snapshot)
+        else:
+            self.get_wizard_status("gesture")
 
-        self.get_history()
-        self.get_history_others()
+            self.get_history()
+            self.get_history_others()
 
         gestures_d = self.prompt_for_gestures()
 
+        # The gestures follow the command without waiting for the server.
         self.send("GESTURES_COMPLETE")
-
-        confirmation = self.recv()
-
-        if self.response(confirmation, "Server stopped communicating during the GESTURES_COMPLETE request."):
-            confirmation = self.dec(confirmation)
-            if confirmation == "RECEIVE_GESTURES":
-                gestures_d_p = self.pickle(gestures_d)
-                self.send_p(gestures_d_p)
+        self.send_p(self.serialize(gestures_d))
 
     def show_hp(self):
 
@@ -1213,6 +1460,13 @@ class SpellbinderClient:
                                 spell_desc = self.spellbook.show_spell_desc_gesture_sort(num)
                                 print("")
                                 self.print_t(spell_desc)
+                            elif gestures[:2] == "@n" and len(gestures) > 2 and gestures[2] in "lr":
+                                hand_s = "left" if gestures[2] == "l" else "right"
+                                try:
+                                    horizon = int(gestures[3:] or 2)
+                                    self.spellbook.show_forecast(self.hands[hand_s], horizon)
+                                except ValueError:
+                                    print("Please enter a number of gestures to look ahead by.")
                             elif gestures[:2] == "@#" and len(gestures) > 3:
                                 hand_s = gestures[2]
                                 num = gestures[3:]
@@ -1335,6 +1589,7 @@ class SpellbinderClient:
             "\n@g:   Consult your spellbook, sorted by gesture" +
             "\n@g#:  See spell description, per gesture-sorted numeral"
             "\n@#hX: See what spells can be made with the last X gestures of your h hand.\nUsage examples:  @#r1 (See what can be made from the last gesture of the right hand)\n                 @#L3 (See what can be made from the last 3 gestures of the left hand)\n" +
+            "\n@nhX: See the spells your h hand can complete within X more gestures (2 if left out), and how.\nUsage examples:  @nr  (What the right hand could complete in the next 2 gestures)\n                 @nl3 (What the left hand could complete in the next 3 gestures)\n" +
             "\n#:    Toggle auto-opening of spellbook."
             "\nH:    See previous gestures." +
             "\n!:    Cancel your current gestures and repeat your turn." +
@@ -1359,7 +1614,7 @@ class SpellbinderClient:
         your_hands = ("left", "right")
         for hand in your_hands:
             prehistory_line = "Your " + hand + " hand history: "
-            self.print_t("{0:{width}} {1}".format(prehistory_line, self.hands[hand], width = prehistory_len))
+            self.print_t("{0:{width}} {1}".format(prehistory_line, self.hands[hand].show(), width = prehistory_len))
 
         if self.perceived_history:
             for other_wizard in self.perceived_history:
@@ -1384,7 +1639,7 @@ class SpellbinderClient:
         my_history = self.recv()
 
         if self.response(my_history, "Server died after sending client's hand history dictionary."):
-            self.hands = self.depickle(my_history)
+            self.hands = self.deserialize(my_history)
 
     def get_history_others(self):
 
@@ -1394,7 +1649,7 @@ class SpellbinderClient:
         others_history = self.recv()
 
         if self.response(others_history, "Server died after sending other's hand history dictionary."):
-            self.perceived_history = self.depickle(others_history)
+            self.perceived_history = self.deserialize(others_history)
 
     def response(self, data, kill_msg=""):
 
@@ -1466,7 +1721,7 @@ class SpellbinderClient:
         self.dmsg("This client is " + cust_d["name"])
         self.name = cust_d["name"]
 
-        cust_d = self.pickle(cust_d)
+        cust_d = self.serialize(cust_d)
         self.send_p(cust_d)
 
         """
@@ -1483,7 +1738,7 @@ class SpellbinderClient:
         spellbook_c = b"".join(spellbook_c)
 
         if self.response(spellbook_c, "Server died while receiving spellbook"):
-            spellbook_c = self.depickle(spellbook_c)
+            spellbook_c = self.deserialize(spellbook_c)
             self.spellbook = spellbook_c
 
             self.send("ACK_SPELLBOOK")
@@ -1496,10 +1751,21 @@ class SpellbinderClient:
 
         self.print_t("Killing connection to server.")
 
+        self._stopping.set()
+
         if reason:
             self.print_t("Reason: " + reason)
 
-        self.server.shutdown(1)
+        netstats.process_stats.merge(self._net_stats)
+        if self.debug:
+            for line in self._net_stats.report():
+                self.print_t(line)
+
+        try:
+            self.server.shutdown(1)
+        except OSError:
+            # Already gone.
+            pass
         self.server.close()
 
         self.print_t("Server closed.")
@@ -1508,13 +1774,12 @@ class SpellbinderClient:
 
     def make_server_connection(self):
 
-        self.server = socket.socket()
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
         self.clear_screen()
 
         try:
-            self.server.connect(self._HOST_ADDR)
+            self.server = self._transport.connect()
+            protocol.configure_socket(self.server)
+            protocol.send_frame(self.server, protocol.HELLO, protocol.pack_hello(caps=protocol.capabilities()))
             self.print_t("Connected to server!")
         except:
             self.print_t("Unable to connect to server!")
@@ -1526,12 +1791,13 @@ class SpellbinderClient:
         self.screen = screen
 
         self.make_server_connection()
+        self.start_heartbeat()
         self.connection_loop()
         self.kill_connection()
 
-def main(host, port, screen=None):
+def main(host, port, screen=None, room=None):
 
-    client = SpellbinderClient(host=host, port=port)
+    client = SpellbinderClient(host=host, port=port, room=room)
     client.setup(screen)
 
     curses.nocbreak()
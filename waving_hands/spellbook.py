@@ -1,17 +1,185 @@
 # a spellbook contains spells.
 # the spellbook is responsible for spell lookup.
+#
+# A spellbook never changes once it is read, so every wizard and client in a
+# process shares the one load() returns for a file. Anything that changes
+# during a match, such as how long a spell has left, is kept by the wizard.
 
+import hashlib
 import operator
+import os
+import threading
+
+from waving_hands import spell_cache
 from waving_hands.spell import Spell
+from waving_hands.spell_matcher import MatchState, SpellMatcher
 
-class Spellbook:
+# The lines of each spell in a spellbook file, in order.
+SPELL_FIELDS = ("spell", "gesture", "desc", "kill")
+
+VALID_GESTURES = "fpswdc"
+
+# Turns a spell lasts once cast, for the spells that last.
+SPELL_DURATIONS = {"Shield":1}
+
+# (real path, sha256 of the contents): the Spellbook read from them
+_books = {}
+
+# real path: (mtime_ns, size, sha256) of the file when it was last read
+_stamps = {}
+
+# (name, gesture, desc, kill): the one Spell with them
+_spells = {}
+
+_books_lock = threading.Lock()
+
+
+class SpellbookParseError(ValueError):
+
+    """ Raised for a spellbook file that is not laid out as one. """
+
+    def __init__(self, source, line, message):
+
+        super().__init__(str(source) + ", line " + str(line) + ": " + message)
+
+        self.source = source
+        self.line = line
+
+
+def load(path_to_spellbook):
+
+    """ Return the shared Spellbook for a spellbook file. The file is read
+    again only when its modification time or size has changed, and the
+    Spellbook is built again only when its contents have. """
+
+    path = os.path.realpath(path_to_spellbook)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError("Failed to populate spellbook: Could not find path \'" + str(path_to_spellbook) + "\'")
+
+    with _books_lock:
+        stamp = _stamps.get(path)
+        if stamp and stamp[:2] == (stat.st_mtime_ns, stat.st_size):
+            return _books[(path, stamp[2])]
+
+    digest, spells = compile_spellbook(path, stat)
+
+    with _books_lock:
+        book = _books.get((path, digest))
+
+        if book is None:
+            book = Spellbook(path_to_spellbook, spells)
+            _books[(path, digest)] = book
+
+        _stamps[path] = (stat.st_mtime_ns, stat.st_size, digest)
+
+    return book
+
+
+def compile_spellbook(path, stat):
+
+    """ Return (sha256 of the file, [(name, gesture, desc, kill), ...]) for
+    the spellbook file at the real path, from the cache when it is still
+    good; see spell_cache.py. """
+
+    entry = spell_cache.read(path)
+
+    if entry and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+        return entry["digest"], spell_cache.spells_of(entry)
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    digest = hashlib.sha256(data).hexdigest()
+
+    if entry and entry["digest"] == digest:
+        spells = spell_cache.spells_of(entry)
+    else:
+        spells = list(parse_spellbook(data.decode("utf-8").splitlines(), path))
+
+    spell_cache.write(path, stat, digest, spells)
+
+    return digest, spells
+
+
+def parse_spellbook(lines, source="spellbook"):
+
+    """ Yield (name, gesture, desc, kill) for each spell in the lines of a
+    spellbook file, in one pass.
+
+    Each spell is four lines in a row: spell=, gesture=, desc= and kill=.
+    Lines outside a spell are skipped. Raises SpellbookParseError, naming
+    source and the line, for a spell that is cut short or has gestures that
+    are not f, p, s, w, d or c.
+    """
+
+    fields = []
+    number = 0
+
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+
+        if not fields and not line.startswith("spell="):
+            continue
+
+        wanted = SPELL_FIELDS[len(fields)]
+        key, sep, value = line.partition("=")
+
+        if key != wanted or not sep:
+            raise SpellbookParseError(source, number, "expected " + wanted + "= for spell " + repr(fields[0]))
+
+        if wanted == "gesture":
+            if not value:
+                raise SpellbookParseError(source, number, "spell " + repr(fields[0]) + " has no gestures")
+            invalid = value.lower().strip(VALID_GESTURES)
+            if invalid:
+                raise SpellbookParseError(source, number, "invalid gesture " + repr(invalid[0]) + " in spell " + repr(fields[0]))
+
+        fields.append(value)
+
+        if len(fields) == len(SPELL_FIELDS):
+            yield tuple(fields)
+            fields = []
 
-    # the _spell_list will be populated by a list of Spell objects.
+    if fields:
+        raise SpellbookParseError(source, number, "the file ends in the middle of spell " + repr(fields[0]))
 
-    def __init__(self, path_to_spellbook):
-        self.spell_list = []
+
+def intern_spell(name, gesture, desc, kill):
+
+    """ Return the one Spell with these fields, making it if need be. """
+
+    key = (name, gesture, desc, kill)
+
+    spell = _spells.get(key)
+
+    if spell is None:
+        spell = _spells.setdefault(key, Spell(name, gesture, desc, kill, SPELL_DURATIONS.get(name, 0)))
+
+    return spell
+
+
+class Spellbook:
+
+    # the _spell_list will be populated by a list of Spell objects, and is
+    # made a tuple once it is complete. Use load() rather than making one
+    # directly, so that the spellbook is shared.
+
+    def __init__(self, path_to_spellbook, spells=None):
+        """
+        :param path_to_spellbook: The spellbook file
+        :param spells: (name, gesture, desc, kill) for each spell, if the
+            file has already been parsed
+        """
+        self._matcher = None
+        self._spell_list = []
+        self._by_name = {}
+        self._by_lower_name = {}
+        self._by_gesture = ()
         self._path_to_spellbook = path_to_spellbook
-        self.populate()
+        self.populate(spells)
 
     @property
     def spell_list(self):
@@ -19,108 +187,119 @@ class Spellbook:
 
     @spell_list.setter
     def spell_list(self, new_list):
-        self._spell_list = new_list
+        self._spell_list = tuple(new_list)
+        self._matcher = None
+        self.build_indexes()
+
+    @property
+    def by_gesture(self):
+        """ The spells sorted by gesture, as the @g commands list them. """
+        return self._by_gesture
+
+    def build_indexes(self):
+
+        # The spell list never changes once it is set, so these are only
+        # built then. Spells with the same gesture stay in name order.
+        self._by_name = {spell.name:spell for spell in self.spell_list}
+        self._by_lower_name = {spell.name.lower():spell for spell in self.spell_list}
+        self._by_gesture = tuple(sorted(self.spell_list, key=operator.attrgetter('gesture')))
+
+    def get_spell(self, spell_name):
+
+        """ Return the spell with the given name, or failing that the one
+        whose name differs only in case. Returns None if there is neither. """
+
+        spell = self._by_name.get(spell_name)
+
+        if spell is None:
+            spell = self._by_lower_name.get(spell_name.lower())
+
+        return spell
+
+    @property
+    def matcher(self):
+        """ The spell list compiled for finding the spells a hand has just
+        completed, see spell_matcher.py. """
+
+        if self._matcher is None:
+            self._matcher = SpellMatcher(self.spell_list)
+
+        return self._matcher
+
+    def forecast(self, history, horizon=None):
 
-    def populate(self):
+        """ Return a Forecast (spell, remaining, continuation) for every
+        spell, saying how many more gestures a hand with this history needs
+        to complete it and which, the soonest first. With a horizon, only the
+        spells that can be completed within that many more gestures.
+
+        The forecast of each matcher state is worked out once and kept, so a
+        hand's own state may be given in place of its history. """
+
+        state = history if isinstance(history, MatchState) else self.matcher.state_after(history)
+
+        if horizon is None:
+            return state.forecast
+
+        return state.within(horizon)
+
+    def populate(self, spells=None):
         # the spellbook will create Spell() objects from the contents of the
         # given path_to_spellbook file.
 
-        
+        if spells is None:
+            try:
+                with open(self._path_to_spellbook, encoding="utf-8") as f:
+                    spells = list(parse_spellbook(f, self._path_to_spellbook))
+            except FileNotFoundError:
+                raise FileNotFoundError("Failed to populate spellbook: Could not find path \'" + str(self._path_to_spellbook) + "\'")
 
-        try:
-            spell_list_f = []
-            with open(self._path_to_spellbook) as f:
-                spell_list_f = f.read().splitlines()
-
-            # find lines that start with spell=
-            for line in spell_list_f:
-                if line.startswith("spell="):
-                    gestureline = spell_list_f.index(line) + 1
-                    error = "Could not find gesture line"
-                    if spell_list_f[gestureline].startswith("gesture="):
-                        descline = gestureline + 1
-                        error = "Could not find desc line"
-                        if spell_list_f[descline].startswith("desc="):
-                            killline = descline + 1
-                            error = "Could not find kill line"
-                            if spell_list_f[killline].startswith("kill="):
-                                spellname = spell_list_f[spell_list_f.index(line)][len("spell="):]
-                                gesture = spell_list_f[gestureline][len("gesture="):]
-                                desc = spell_list_f[descline][len("desc="):]
-                                kill = spell_list_f[killline][len("kill="):]
-                                valid = self.validate_gesture(gesture)
-                                if valid:
-                                    self.add_spell(spellname, gesture, desc, kill)
-                                else:
-                                    print("Malformed spell at line " + str(gestureline) + ": " + spellname)
-                                    raise ValueError("Malformed spell -- see above traceback")
-                            else:
-                                raise ValueError("Malformed spell at line " + 
-                                    str(spell_list_f.index(line)+1) + ": " + error)
-
-        except FileNotFoundError:
-            raise FileNotFoundError("Failed to populate spellbook: Could not find path \'" + str(self._path_to_spellbook) + "\'")
+        for spell_name, gesture, desc, kill in spells:
+            self.add_spell(spell_name, gesture, desc, kill)
 
         self.sort_spells()
 
     def add_spell(self, spell_name, spell_gesture, spell_desc, spell_kill):
-        new_spell = Spell(spell_name, spell_gesture, spell_desc, spell_kill)
-
-        spells_with_time = {"Shield":1}
-
-        if new_spell.name in spells_with_time:
-            new_spell.has_time = True
-            new_spell.time_remaining = spells_with_time[new_spell.name]
+        # Only while populating; the finished spell list is a tuple.
+        new_spell = intern_spell(spell_name, spell_gesture, spell_desc, spell_kill)
 
-        self.spell_list.append(new_spell)
+        self._spell_list.append(new_spell)
+        self._matcher = None
 
     def sort_spells(self):
-        self.spell_list.sort(key=operator.attrgetter('name'))
+        self.spell_list = sorted(self.spell_list, key=operator.attrgetter('name'))
 
     def validate_gesture(self, gesture):
-        valid_gestures = ["f", "p", "s", "w", "d", "c"]
-
-        # examine the gesture digit-by-digit
-
-        for character in gesture:
-            if character.lower() not in valid_gestures:
-                print("Invalid gesture: " + character)
-                return False
-
-        return True
+        return bool(gesture) and not gesture.lower().strip(VALID_GESTURES)
 
     def show_spell_desc_by_name(self, spell_name):
 
-        for spell in self.spell_list:
-            if spell.name == spell_name:
-                return "\n" + spell.name.upper() + "\n\n" + spell.desc + "\n"
+        spell = self.get_spell(spell_name)
+
+        if spell:
+            return "\n" + spell.name.upper() + "\n\n" + spell.desc + "\n"
     
         return "\nThat spell is not in your spellbook!\n"
 
     def search_by_gesture_length(self, history, length):
 
-        if history == "Nothing yet.":
+        if not history or history == "Nothing yet.":
             print("\nYou have no gesture history yet.")
         else:
             if len(history) < length:
                 print("\nYour gesture history is too short -- you do not have " + str(length) + " gestures to search by.")
             else:
-                search_key = history[-length:]
-                # Run through the search key and lower() everything but C
-                lowered_search_key = []
-                for character in search_key:
-                    new_char = character
-                    if new_char != "C":
-                        new_char = new_char.lower()
-                    lowered_search_key.append(new_char)
-                    search_key = "".join(lowered_search_key)
-
-                matching_spells = []
-                for spell in self.spell_list:
-                    if len(spell.gesture) > length:
-                        key_gestures = spell.gesture[:length]
-                        if key_gestures == search_key:
-                            matching_spells.append(spell)
+                gestures = history[-length:]
+
+                # The spells the last length gestures are the start of. The
+                # matcher's states index spells by the gestures they start
+                # with, and only the last length gestures can start one that
+                # far along.
+                state = self.matcher.state_after(gestures)
+                matching_spells = [spell for spell, made in state.in_progress if made == length]
+
+                # Shown in lower case, all but C
+                search_key = "".join(gesture if gesture == "C" else gesture.lower() for gesture in gestures)
 
                 if matching_spells:
                     longest_name = 0
@@ -137,10 +316,24 @@ class Spellbook:
             
         print("")
 
+    def show_forecast(self, history, horizon):
+
+        forecast = self.forecast(str(history), horizon)
+
+        if forecast:
+            longest_name = max(len(entry.spell.name) for entry in forecast)
+
+            print("\nSpells that can be completed within " + str(horizon) + " more gestures:\n")
+            for entry in forecast:
+                print("{0:{width}} {1:>2}  {2}".format(entry.spell.name, entry.remaining, entry.continuation, width = longest_name))
+        else:
+            print("\nNo spells can be completed within " + str(horizon) + " more gestures.")
+
+        print("")
+
     def show_spell_desc_gesture_sort(self, index):
         
-        by_gesture = self.spell_list.copy()
-        by_gesture.sort(key=operator.attrgetter('gesture'))
+        by_gesture = self.by_gesture
         
         try:
             index = int(index)
@@ -181,10 +374,7 @@ class Spellbook:
 
         self.print_spell_header()
 
-        by_gestures = self.spell_list.copy()
-        by_gestures.sort(key=operator.attrgetter('gesture'))
-
-        for i,spell in enumerate(by_gestures, 1):
+        for i,spell in enumerate(self.by_gesture, 1):
             print("{:>2}. {:<30} {:<30}".format(str(i), spell.name, spell.gesture))
 
         print("\n")
\ No newline at end of file
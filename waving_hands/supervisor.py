@@ -0,0 +1,385 @@
+import logging
+import multiprocessing
+import os
+import select
+import socket
+import sys
+import threading
+
+from waving_hands import capture
+from waving_hands import protocol
+from waving_hands.gamemaster import Gamemaster, resume_session, spectate_session
+from waving_hands.async_server import play_session
+
+log = logging.getLogger(__name__)
+
+
+def worker_main(index, conn, active, finished, settings):
+
+    """ Run matches handed over by the supervisor until the pipe closes.
+
+    Every match gets its own thread, since a match spends most of its time
+    waiting on players. The turn resolution of every match in this process
+    shares one core, which is why there is one worker per core.
+
+    The pipe carries ("match", clients, caps) for a new match and
+    ("resume", client, hello) for a player coming back to one of ours, and
+    ("spectate", client, hello, caps) for a spectator of one of ours.
+    """
+
+    if settings["quiet"]:
+        sys.stdout = open(os.devnull, "w")
+
+    # The supervisor counts a match as running when it sends it, so the
+    # worker only has to count it as finished.
+    lock = threading.Lock()
+
+    def run(clients):
+        game = Gamemaster(
+            pregame=settings["pregame"],
+            customize_wizards=settings["customize_wizards"],
+            players=settings["players"],
+            clients=clients,
+            deadlines=settings["deadlines"],
+            resume_window=settings["resume_window"],
+            session_prefix=str(index) + ":",
+            capture=capture.match_path(settings["capture_dir"]) if settings["capture_dir"] else None,
+        )
+        try:
+            play_session(game)
+        finally:
+            with lock, active.get_lock():
+                active[index] -= 1
+                finished[index] += 1
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+
+        if message[0] == "resume":
+            client, hello = message[1:]
+            if not resume_session(client, hello):
+                client.close()
+            continue
+
+        if message[0] == "spectate":
+            client, hello, caps = message[1:]
+            protocol.agree(client, caps)
+            if not spectate_session(client, hello):
+                client.close()
+            continue
+
+        clients, caps = message[1:]
+        for client, agreed in zip(clients, caps):
+            protocol.agree(client, agreed)
+
+        threading.Thread(target=run, args=(clients,), daemon=True).start()
+
+
+class Supervisor:
+
+    """ Accept players in one process and spread their matches across a pool
+    of worker processes, one per core by default.
+
+    Accepted sockets are passed to the least loaded worker over a pipe. The
+    number of running and finished matches of each worker is kept in shared
+    memory so it can be reported from here. Resume tokens start with the
+    index of the worker that made them, so a player coming back is sent to
+    the worker playing its match.
+    """
+
+    def __init__(self,
+        host: str = "localhost",
+        port: int = 12345,
+        pregame: bool = True,
+        customize_wizards: bool = True,
+        players: int = 2,
+        workers: int = None,
+        quiet: bool = False,
+        deadlines: dict = None,
+        resume_window: float = 60,
+        capture_dir: str = None):
+        """
+        :param host: IP address or host to serve the game, defaults to localhost
+        :param port: Port to use for the server
+        :param pregame: Start each game with pre-game flair? Defaults to True
+        :param customize_wizards: Allow players to customize their wizards? Defaults to True
+        :param players: Number of players in each match. Defaults to 2
+        :param workers: Number of worker processes. Defaults to the number of cores
+        :param quiet: Silence the Gamemaster output of the workers
+        :param deadlines: {phase:seconds} for the Gamemaster of each match
+        :param resume_window: Seconds a dropped player has to reconnect
+        :param capture_dir: Directory to record a capture of every match to
+        """
+
+        self._HOST = host
+        self._PORT = port
+        self._NUMBER_OF_WIZARDS = players
+        self._NUMBER_OF_WORKERS = workers or os.cpu_count() or 1
+        self._HELLO_TIMEOUT = 10
+
+        self._settings = {"pregame":pregame,
+                          "customize_wizards":customize_wizards,
+                          "players":players,
+                          "quiet":quiet,
+                          "deadlines":deadlines,
+                          "resume_window":resume_window,
+                          "capture_dir":capture_dir}
+
+        self._server = None
+        self._waiting = []
+        self._hellos = protocol.PendingHellos(self._HELLO_TIMEOUT)
+
+        self._workers = []
+        self._pipes = []
+        self._active = None
+        self._finished = None
+
+    @property
+    def server(self):
+        return self._server
+
+    @server.setter
+    def server(self, sock):
+        self._server = sock
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def open_socket(self):
+
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self._HOST, self._PORT))
+        self.server.listen(128)
+
+        log.info("Supervising " + str(self._NUMBER_OF_WORKERS) + " workers on " + str(self.server.getsockname()))
+
+    def start_workers(self):
+
+        self._active = multiprocessing.Array("i", self._NUMBER_OF_WORKERS)
+        self._finished = multiprocessing.Array("i", self._NUMBER_OF_WORKERS)
+
+        for index in range(self._NUMBER_OF_WORKERS):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=worker_main,
+                args=(index, child_conn, self._active, self._finished, self._settings),
+                daemon=True,
+            )
+            worker.start()
+            child_conn.close()
+
+            self._workers.append(worker)
+            self._pipes.append(parent_conn)
+
+    def stop_workers(self):
+
+        for conn in self._pipes:
+            conn.close()
+
+        for worker in self._workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+
+        self._workers = []
+        self._pipes = []
+
+    def load(self):
+
+        """ Return the running and finished match counts of every worker. """
+
+        report = []
+
+        for index, worker in enumerate(self.workers):
+            report.append({"worker":index,
+                           "pid":worker.pid,
+                           "active":self._active[index],
+                           "finished":self._finished[index]})
+
+        return report
+
+    def print_load(self):
+
+        for entry in self.load():
+            print("Worker {worker} (pid {pid}): {active} running, {finished} finished".format(**entry))
+
+    def least_loaded(self):
+
+        """ Return the index of the worker with the fewest running matches. """
+
+        return min(range(len(self.workers)), key=lambda index: self._active[index])
+
+    def dispatch(self, clients):
+
+        """ Hand a full group of players to a worker. """
+
+        index = self.least_loaded()
+
+        with self._active.get_lock():
+            self._active[index] += 1
+
+        # The capabilities agreed with each player go along, since the
+        # worker gets new socket objects.
+        caps = [sorted(protocol.agreed(client)) for client in clients]
+        self._pipes[index].send(("match", clients, caps))
+
+        # The worker now holds its own copies of the sockets.
+        for client in clients:
+            client.close()
+
+        print("Match sent to worker " + str(index))
+
+    def route_resume(self, client, hello):
+
+        """ Pass a player who is coming back to the worker that has their
+        match. """
+
+        index, sep, rest = hello["resume"].partition(":")
+
+        if not sep or not index.isdigit() or int(index) >= len(self._pipes):
+            print("Turned away a resume token no worker could have made.")
+            client.close()
+            return
+
+        self._pipes[int(index)].send(("resume", client, hello))
+        client.close()
+
+        print("Resume sent to worker " + index)
+
+    def route_spectator(self, client, hello):
+
+        """ Pass a spectator to the worker playing the match it asks for, or
+        to the busiest worker if it named none. """
+
+        match_id = hello["spectate"]
+
+        if match_id:
+            index, sep, rest = match_id.partition(":")
+            if not sep or not index.isdigit() or int(index) >= len(self._pipes):
+                print("Turned away a spectator asking for a match no worker could have.")
+                client.close()
+                return
+            index = int(index)
+        else:
+            index = max(range(len(self.workers)), key=lambda index: self._active[index])
+
+        protocol.answer_hello(client, hello)
+        caps = sorted(protocol.agreed(client))
+
+        self._pipes[index].send(("spectate", client, hello, caps))
+        client.close()
+
+        print("Spectator sent to worker " + str(index))
+
+    def add_player(self, client):
+
+        protocol.configure_socket(client)
+        self._waiting.append(client)
+
+        if len(self._waiting) >= self._NUMBER_OF_WIZARDS:
+            # Never start a match against someone who has already gone.
+            self.drop_dead_waiters()
+
+        if len(self._waiting) >= self._NUMBER_OF_WIZARDS:
+            clients = self._waiting[:self._NUMBER_OF_WIZARDS]
+            self._waiting = self._waiting[self._NUMBER_OF_WIZARDS:]
+            self.dispatch(clients)
+
+    def drop_dead_waiters(self):
+
+        for client in list(self._waiting):
+            if not protocol.client_alive(client):
+                self._waiting.remove(client)
+                client.close()
+                print("A waiting player hung up.")
+
+    def serve(self, max_matches=None):
+
+        """ Accept players, dispatching a match for every full group.
+        Stops after max_matches have been dispatched, if given. """
+
+        # Start the workers first so they do not inherit the listening socket.
+        if not self.workers:
+            self.start_workers()
+
+        if not self.server:
+            self.open_socket()
+
+        dispatched = 0
+
+        # Each connection's HELLO is read as it arrives, so one that is slow
+        # to say hello does not hold up everyone connecting after it.
+        try:
+            while max_matches is None or dispatched < max_matches:
+                rlist, wlist, elist = select.select( [self.server] + self._hellos.sockets(), [], [],
+                                                     self._hellos.timeout() )
+
+                for client in rlist:
+                    if client is self.server:
+                        client, addr = self.server.accept()
+                        print("Connection accepted from " + str(addr))
+                        self._hellos.add(client)
+                    elif self.read_hello(client):
+                        dispatched += 1
+                        self.print_load()
+
+                for client in self._hellos.expire():
+                    print("Dropped a connection that did not say hello.")
+                    client.close()
+        finally:
+            self._hellos.close()
+            self.server.close()
+            self.server = None
+
+    def read_hello(self, client):
+
+        """ Read from a connection that is still saying hello, and route it
+        once it has. Returns True if a match was dispatched. """
+
+        hello = self._hellos.read(client)
+        if client in self._hellos:
+            return False
+
+        if hello is None:
+            print("Dropped a connection that did not say hello.")
+            client.close()
+            return False
+        if hello.get("resume"):
+            self.route_resume(client, hello)
+            return False
+        if hello.get("spectate") is not None:
+            self.route_spectator(client, hello)
+            return False
+
+        protocol.answer_hello(client, hello)
+        self.add_player(client)
+
+        return not self._waiting
+
+
+def main(host, port, pregame=True, customize_wizards=True, players=2, workers=None, deadlines=None,
+         resume_window=60, capture_dir=None):
+
+    supervisor = Supervisor(
+        host=host,
+        port=port,
+        pregame=pregame,
+        customize_wizards=customize_wizards,
+        players=players,
+        workers=workers,
+        deadlines=deadlines,
+        resume_window=resume_window,
+        capture_dir=capture_dir,
+    )
+
+    try:
+        supervisor.serve()
+    except KeyboardInterrupt:
+        print("Server shut down.")
+    finally:
+        supervisor.stop_workers()
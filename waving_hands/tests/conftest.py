@@ -0,0 +1,9 @@
+import pytest
+
+from waving_hands import spell_cache
+
+
+@pytest.fixture(autouse=True)
+def spell_cache_dir(tmp_path_factory, monkeypatch):
+    # Keep compiled spellbooks out of the home directory.
+    monkeypatch.setattr(spell_cache, "CACHE_DIR", tmp_path_factory.getbasetemp() / "spell-cache")
@@ -0,0 +1,77 @@
+import asyncio
+import socket
+
+from waving_hands import protocol
+from waving_hands.async_server import AsyncMatchServer
+
+
+async def wait_for(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def test_dead_clients_end_only_their_own_match():
+
+    async def scenario():
+        server = AsyncMatchServer(host="127.0.0.1", port=0, pregame=False, customize_wizards=False,
+                                  resume_window=0)
+        server.open_socket()
+        addr = server.server.getsockname()
+        serving = asyncio.ensure_future(server.serve())
+
+        first = [socket.create_connection(addr) for _ in range(2)]
+        second = [socket.create_connection(addr) for _ in range(2)]
+        for sock in first + second:
+            protocol.send_frame(sock, protocol.HELLO, protocol.pack_hello())
+        assert await wait_for(lambda: server.active_matches == 2)
+
+        for sock in first:
+            sock.close()
+        assert await wait_for(lambda: server.finished_matches == 1)
+        assert server.active_matches == 1
+        assert not serving.done()
+
+        for sock in second:
+            sock.close()
+        assert await wait_for(lambda: server.finished_matches == 2)
+
+        serving.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_players_who_hang_up_while_waiting_are_not_paired():
+
+    async def scenario():
+        server = AsyncMatchServer(host="127.0.0.1", port=0, pregame=False, customize_wizards=False,
+                                  resume_window=0)
+        server.open_socket()
+        addr = server.server.getsockname()
+        serving = asyncio.ensure_future(server.serve())
+
+        gone = socket.create_connection(addr)
+        protocol.send_frame(gone, protocol.HELLO, protocol.pack_hello())
+        assert await wait_for(lambda: len(server._waiting) == 1)
+        gone.close()
+        await asyncio.sleep(0.05)
+
+        # The newcomer waits for someone who is still there.
+        bob = socket.create_connection(addr)
+        protocol.send_frame(bob, protocol.HELLO, protocol.pack_hello())
+        assert await wait_for(lambda: len(server._waiting) == 1 and server._waiting[0].fileno() != -1)
+        assert server.active_matches == 0
+
+        carol = socket.create_connection(addr)
+        protocol.send_frame(carol, protocol.HELLO, protocol.pack_hello())
+        assert await wait_for(lambda: server.active_matches == 1)
+
+        for sock in bob, carol:
+            sock.close()
+        assert await wait_for(lambda: server.finished_matches == 1)
+
+        serving.cancel()
+
+    asyncio.run(scenario())
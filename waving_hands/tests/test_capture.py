@@ -0,0 +1,33 @@
+import pytest
+
+from waving_hands import capture
+from waving_hands.headless import play_match
+from waving_hands.replay import Replay
+from waving_hands.scripted_client import ScriptedClient
+
+
+def test_captured_match_replays_frame_for_frame(tmp_path):
+    path = str(tmp_path / "match.whcap")
+    bots = [ScriptedClient(name="Alice", surrender_after=3),
+            ScriptedClient(name="Bob", gestures=("p", "d"), surrender_after=5)]
+
+    game = play_match(bots, seed=1234, capture=path)
+
+    settings, records = capture.read_capture(path)
+    assert settings["seed"] == game.seed == 1234
+    assert {record.connection for record in records} == {0, 1}
+    assert [record.time for record in records] == sorted(record.time for record in records)
+
+    replay = Replay(path)
+
+    assert replay.run(), replay.mismatches
+    assert replay.turns == 3
+    assert replay.frames > 0
+
+
+def test_read_capture_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-capture"
+    path.write_bytes(b"hello")
+
+    with pytest.raises(capture.CaptureError):
+        capture.read_capture(str(path))
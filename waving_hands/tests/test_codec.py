@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from waving_hands import codec
+from waving_hands.targetable_client import TargetableClient
+
+
+def test_values_round_trip():
+    value = {
+        "version":1,
+        "hp":-3,
+        "big":2 ** 40,
+        "blind":False,
+        "charmed":[True, "left"],
+        "none":None,
+        "monsters":{"Grobleplop the Goblin":"Gandalf"},
+        "name":"Gándalf",
+    }
+    assert codec.decode(codec.encode(value)) == value
+
+
+def test_tuples_decode_as_lists():
+    assert codec.decode(codec.encode(("Left", "p"))) == ["Left", "p"]
+
+
+def test_targetable_client_records():
+    goblin = TargetableClient("Goblin", 1, "minion", False, 1, "Gandalf", "Saruman")
+    targets, attack = codec.decode(codec.encode([[goblin], "stab"]))
+
+    assert attack == "stab"
+    assert targets[0].name == "Goblin"
+    assert targets[0].target_name == "Gandalf"
+    assert targets[0].master_name == "Saruman"
+
+
+def test_rejects_unknown_types():
+    with pytest.raises(codec.CodecError):
+        codec.encode(object())
+
+
+@pytest.mark.parametrize("payload", [
+    b"",
+    b"Z",
+    b"S\x05ab",
+    b"L\x02N",
+    b"NN",
+    b"L\x01" * 100 + b"N",
+    b"D\x01L\x00N",
+    b"S\x01\xff",
+    b"A\x02a\xff",
+    b"D\x01S\x01\xffN",
+])
+def test_rejects_malformed_payloads(payload):
+    with pytest.raises(codec.CodecError):
+        codec.decode(payload)
+
+
+def test_string_lists_round_trip():
+    for value in (["a", "", "Gándalf"], [""], ["has a \0 in it", "b"]):
+        assert codec.decode(codec.encode(value)) == value
+
+
+def test_corrupted_payloads_only_raise_codec_errors():
+    rng = random.Random(7)
+    payload = codec.encode({"name":"Gándalf", "lines":["a", "b"], "hp":[14, -3, None]})
+
+    for _ in range(2000):
+        corrupted = bytearray(payload)
+        for _ in range(rng.randint(1, 3)):
+            corrupted[rng.randrange(len(corrupted))] = rng.randrange(256)
+        try:
+            codec.decode(bytes(corrupted))
+        except codec.CodecError:
+            pass
@@ -0,0 +1,262 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from waving_hands import codec
+from waving_hands import netstats
+from waving_hands import protocol
+from waving_hands.gamemaster import ConnectionLost, Gamemaster, resume_session
+from waving_hands.headless import play_match
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.transport import InProcessTransport
+
+
+def make_gamemaster():
+    gm = Gamemaster()
+    gm.create_wizards()
+    return gm
+
+
+def test_status_snapshot_has_every_status_field():
+    gm = make_gamemaster()
+    gandalf, saruman = gm.wizards
+    saruman.hp = 9
+    gandalf.paralyzed_hand = "left"
+
+    snapshot = gm.build_status_snapshot(gandalf)
+
+    assert snapshot["version"] == protocol.SNAPSHOT_VERSION
+    assert snapshot["hp"] == gandalf.hp
+    assert snapshot["enemy_hp"] == 9
+    assert snapshot["paralyzed"] == [True, "left"]
+    assert snapshot["charmed"] == [False, ""]
+    assert snapshot["monsters"] == {}
+    assert set(snapshot["history_self"]) == {"left", "right"}
+
+
+def test_status_snapshot_is_pushed_as_one_frame():
+    gm = make_gamemaster()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+
+    gm.send_status_snapshot(server_side)
+    frame = protocol.recv_frame(client_side)
+
+    assert frame.tag == protocol.STATUS
+    assert codec.decode(frame.payload)["hp"] == gm.wizards[0].hp
+
+    server_side.close()
+    client_side.close()
+
+
+def test_connections_are_only_closed_once():
+    gm = make_gamemaster()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+    gm.send_status_snapshot(server_side)
+
+    def status_sent():
+        return netstats.process_stats.stats().get("STATUS", {}).get("sent", 0)
+
+    before = status_sent()
+    with pytest.raises(ConnectionLost):
+        gm.kill_connection("test")
+    gm.close_connections()
+
+    assert status_sent() - before == gm.net_stats.stats()["STATUS"]["sent"] > 0
+    assert server_side.fileno() == -1
+    client_side.close()
+
+
+def test_scripted_match_plays_to_the_end():
+    gm = Gamemaster(pregame=True, customize_wizards=True)
+    pairs = [socket.socketpair() for _ in range(2)]
+    gm._session_clients = [server_side for server_side, client_side in pairs]
+
+    bots = [ScriptedClient(name="Alice", gestures=("p", "$"), surrender_after=2),
+            ScriptedClient(name="Bob", surrender_after=4)]
+    for bot, (server_side, client_side) in zip(bots, pairs):
+        bot.server = client_side
+
+    results = []
+    threads = [threading.Thread(target=lambda bot=bot: results.append(bot.play())) for bot in bots]
+    for thread in threads:
+        thread.start()
+
+    gm.setup_game()
+    gm.play_game()
+    gm.close_connections()
+
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [True, True]
+    assert [wizard.name for wizard in gm.wizards] == ["Alice", "Bob"]
+    assert bots[0].turns == 3
+
+
+def test_notices_never_wait_on_the_client():
+    gm = make_gamemaster()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+
+    # Nobody reads client_side, so the socket buffer fills up and the later
+    # notices are dropped instead of blocking.
+    for i in range(20000):
+        gm.msg_client_g("Waiting for challenger... " + str(i), server_side)
+
+    client_side.setblocking(False)
+    seqs = []
+    try:
+        while True:
+            frame = protocol.recv_frame(client_side)
+            seqs.append(protocol.unpack_notice(frame.payload)[0])
+    except BlockingIOError:
+        pass
+
+    assert seqs[:3] == [1, 2, 3]
+    assert seqs == sorted(seqs)
+    assert len(seqs) < 20000
+
+    server_side.close()
+    client_side.close()
+
+
+def test_dropped_client_resumes_where_it_left_off():
+    gm = Gamemaster(resume_window=5)
+    gm.create_wizards()
+    server_side, client_side = socket.socketpair()
+    gm.assign_clients([server_side])
+    token = codec.decode(protocol.recv_frame(client_side).payload)["token"]
+
+    # The command is lost along with the connection.
+    gm.msg_client("GET_GESTURES", server_side)
+    client_side.close()
+
+    got = []
+    reader = threading.Thread(target=lambda: got.append(gm.recv(server_side)))
+    reader.start()
+
+    new_server_side, new_client_side = socket.socketpair()
+    assert resume_session(new_server_side, {"resume":token, "received":0})
+
+    answer = protocol.recv_frame(new_client_side)
+    assert answer.tag == protocol.SESSION
+    assert codec.decode(answer.payload)["received"] == 0
+    assert protocol.recv_frame(new_client_side).payload == b"GET_GESTURES"
+
+    protocol.send_frame(new_client_side, protocol.CMD, b"GESTURES_COMPLETE")
+    reader.join(5)
+    assert got == [b"GESTURES_COMPLETE"]
+
+    # The match still knows the client by its first socket, which is closed;
+    # what is sent to it goes out on the new one.
+    assert server_side.fileno() == -1
+    gm.msg_client("NEXT_TURN", server_side)
+    assert protocol.recv_frame(new_client_side).payload == b"NEXT_TURN"
+
+    gm.close_connections()
+    new_client_side.close()
+    assert not resume_session(new_server_side, {"resume":token, "received":0})
+
+
+def test_silent_clients_and_stalled_phases_end_the_match():
+    gm = Gamemaster(heartbeat_timeout=0.2, resume_window=0)
+    gm.create_wizards()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+
+    protocol.send_frame(client_side, protocol.HEARTBEAT)
+    protocol.send_frame(client_side, protocol.CMD, b"NEXT_TURN_READY")
+    assert gm.recv(server_side) == b"NEXT_TURN_READY"
+
+    with pytest.raises(ConnectionLost):
+        gm.recv(server_side)
+
+    gm = Gamemaster(deadlines={"gestures":0.1})
+    gm.create_wizards()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+    gm.begin_phase("gestures")
+
+    with pytest.raises(ConnectionLost, match="gestures deadline"):
+        gm.recv(server_side)
+
+    client_side.close()
+
+
+def test_a_client_that_stalls_or_sends_garbage_is_dropped():
+    gm = Gamemaster(heartbeat_timeout=0.2, resume_window=0)
+    gm.create_wizards()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+
+    # Half a frame, then nothing: the match is not stuck waiting for the rest.
+    client_side.sendall(protocol.pack_frame(protocol.CMD, b"NEXT_TURN_READY")[:7])
+    with pytest.raises(ConnectionLost, match="no heartbeat"):
+        gm.recv(server_side)
+    client_side.close()
+
+    for data, reason in ((protocol.HEADER.pack(99, 0), "malformed frame"),
+                         (protocol.pack_frame(protocol.DATA, b"\xff"), "could not be decoded")):
+        gm = Gamemaster(resume_window=0)
+        gm.create_wizards()
+        server_side, client_side = socket.socketpair()
+        gm.wizards[0].client = server_side
+
+        client_side.sendall(data)
+        with pytest.raises(ConnectionLost, match=reason):
+            gm.deserialize(gm.recv(server_side))
+        client_side.close()
+
+
+def test_a_connection_slow_to_say_hello_does_not_hold_up_the_players():
+    transport = InProcessTransport()
+    transport.listen()
+    silent = transport.connect()
+    silent.sendall(protocol.HEADER.pack(protocol.HELLO, 10)[:3])
+
+    bots = [ScriptedClient(name="Alice", surrender_after=2),
+            ScriptedClient(name="Bob", surrender_after=2)]
+    started = time.monotonic()
+    play_match(bots, transport=transport)
+
+    assert [bot.finished for bot in bots] == [True, True]
+    # Well inside the ten seconds the silent connection has to say hello.
+    assert time.monotonic() - started < 5
+    silent.close()
+
+
+def test_a_client_that_stops_reading_does_not_hold_up_the_others():
+    gm = Gamemaster(high_water=1024 * 1024)
+    gm.create_wizards()
+    pairs = [socket.socketpair() for _ in range(2)]
+    for wizard, (server_side, client_side) in zip(gm.wizards, pairs):
+        wizard.client = server_side
+    (fast, fast_client), (slow, slow_client) = pairs
+
+    report = protocol.pack_frame(protocol.FLAVOR, b"x" * (4 * 1024 * 1024))
+
+    def read_report():
+        received = 0
+        while received < len(report):
+            received += len(fast_client.recv(1 << 20))
+        protocol.send_frame(fast_client, protocol.CMD, b"NEXT_TURN_READY")
+
+    reader = threading.Thread(target=read_report)
+    reader.start()
+
+    # Slow never reads, yet fast gets the whole report and can answer.
+    gm.queue_bytes(fast, report)
+    gm.queue_bytes(slow, report)
+    assert gm.recv(fast) == b"NEXT_TURN_READY"
+    reader.join(5)
+
+    gm.msg_client_g("Waiting on other wizards...", slow)
+    assert gm.outbound_stats()["Saruman"]["notices_dropped"] == 1
+    assert gm.outbound_stats()["Gandalf"]["waiting"] == 0
+
+    for sock in fast, fast_client, slow, slow_client:
+        sock.close()
@@ -0,0 +1,53 @@
+import random
+
+from waving_hands.gesture_history import GestureHistory, MAX_HISTORY
+from waving_hands.hand import Hand
+
+
+def test_history_keeps_the_latest_gestures_as_a_string_would():
+    history = GestureHistory()
+    text = ""
+
+    rng = random.Random(19)
+    for _ in range(500):
+        gesture = rng.choice("fpswdcFPSWDC$? ")
+        history.append(gesture)
+        text = (text + gesture)[-MAX_HISTORY:]
+
+        assert history == text
+        assert str(history) == text
+        assert history.latest == text[-1]
+        assert len(history) == len(text)
+        assert history[-3:] == text[-3:]
+
+
+def test_empty_and_unknown_gestures():
+    history = GestureHistory("fp")
+
+    history.append("")
+    assert history == "fp"
+
+    history.append("x")
+    assert history == "fp?"
+
+    history.clear()
+    assert history.latest == ""
+    assert history.show() == "Nothing yet."
+    assert GestureHistory.from_shown(history.show()) == GestureHistory()
+    assert "{:>4}".format(GestureHistory("ws")) == "  ws"
+
+
+def test_hand_history_is_trimmed_and_rewritable():
+    hand = Hand()
+
+    for gesture in "wpfsdwpfsd":
+        hand.add_gesture(gesture)
+
+    assert hand.history == "fsdwpfsd"
+    assert hand.get_latest_gesture() == "d"
+
+    hand.history = "PP"
+    assert hand.gestures.latest == "P"
+
+    hand.erase_history()
+    assert hand.show_history() == "Nothing yet."
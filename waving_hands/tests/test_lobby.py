@@ -0,0 +1,117 @@
+import asyncio
+import socket
+
+from waving_hands import codec
+from waving_hands import protocol
+from waving_hands.lobby import Lobby
+
+
+async def join(loop, addr, room, heartbeat=False):
+    sock = socket.socket()
+    sock.setblocking(False)
+    await loop.sock_connect(sock, addr)
+    await protocol.async_send_frame(loop, sock, protocol.HELLO, protocol.pack_hello())
+    if heartbeat:
+        await protocol.async_send_frame(loop, sock, protocol.HEARTBEAT)
+
+    command = await protocol.async_recv_frame(loop, sock)
+    assert command.payload == b"LOBBY"
+    rooms = codec.decode((await protocol.async_recv_frame(loop, sock)).payload)
+
+    await protocol.async_send_frame(loop, sock, protocol.TEXT, room.encode(protocol.ENC))
+    return sock, rooms
+
+
+async def wait_for(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def test_players_are_grouped_into_rooms_and_rooms_are_cleaned_up():
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        lobby = Lobby(host="127.0.0.1", port=0, pregame=False, customize_wizards=False,
+                      resume_window=0)
+        lobby.open_socket()
+        addr = lobby.server.getsockname()
+        serving = asyncio.ensure_future(lobby.serve())
+
+        alice, rooms = await join(loop, addr, "duel")
+        assert rooms == []
+        assert await wait_for(lambda: "duel" in lobby.rooms)
+
+        carol, rooms = await join(loop, addr, "")
+        assert [room["name"] for room in rooms] == ["duel"]
+        # A blank answer fills the waiting room first.
+        assert await wait_for(lambda: lobby.rooms["duel"].playing)
+        assert lobby.active_matches == 1
+
+        # A heartbeat sent before the answer is not taken for a blank one.
+        dave, rooms = await join(loop, addr, "my-room", heartbeat=True)
+        assert await wait_for(lambda: "my-room" in lobby.rooms)
+        assert sorted(lobby.rooms) == ["duel", "my-room"]
+        dave.close()
+
+        # The room is forgotten once its match ends.
+        alice.close()
+        carol.close()
+        assert await wait_for(lambda: "duel" not in lobby.rooms)
+        assert lobby.finished_matches == 1
+
+        serving.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_players_who_hang_up_while_waiting_leave_their_room():
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        lobby = Lobby(host="127.0.0.1", port=0, pregame=False, customize_wizards=False,
+                      resume_window=0)
+        lobby.open_socket()
+        addr = lobby.server.getsockname()
+        serving = asyncio.ensure_future(lobby.serve())
+
+        # Hanging up before anyone else comes leaves the room empty, and it
+        # is closed rather than kept for good.
+        lobby._SWEEP_INTERVAL = 0.05
+        lonely, rooms = await join(loop, addr, "lonely")
+        assert await wait_for(lambda: "lonely" in lobby.rooms)
+        lonely.close()
+        assert await wait_for(lambda: "lonely" not in lobby.rooms)
+
+        # A player who hangs up just before the room fills is not played
+        # against; the newcomer waits for someone else instead.
+        lobby._SWEEP_INTERVAL = 3600
+        await asyncio.sleep(0.1)
+        bob, rooms = await join(loop, addr, "duel")
+        assert await wait_for(lambda: "duel" in lobby.rooms)
+        bob.close()
+        await asyncio.sleep(0.05)
+        carol, rooms = await join(loop, addr, "duel")
+        assert await wait_for(lambda: len(lobby.rooms["duel"].clients) == 1 and
+                              lobby.rooms["duel"].clients[0].fileno() != -1)
+        assert not lobby.rooms["duel"].playing
+        assert lobby.active_matches == 0
+
+        # A room name that is not utf-8 only costs that player their seat.
+        sock = socket.socket()
+        sock.setblocking(False)
+        await loop.sock_connect(sock, addr)
+        await protocol.async_send_frame(loop, sock, protocol.HELLO, protocol.pack_hello())
+        await protocol.async_recv_frame(loop, sock)
+        await protocol.async_recv_frame(loop, sock)
+        await protocol.async_send_frame(loop, sock, protocol.TEXT, b"\xff")
+        assert await wait_for(lambda: not lobby._greeting)
+        assert sorted(lobby.rooms) == ["duel"]
+
+        for s in carol, sock:
+            s.close()
+        serving.cancel()
+
+    asyncio.run(scenario())
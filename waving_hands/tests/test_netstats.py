@@ -0,0 +1,44 @@
+from waving_hands import netstats
+from waving_hands import protocol
+from waving_hands.headless import play_match
+from waving_hands.scripted_client import ScriptedClient
+
+
+def test_histogram_buckets_by_powers_of_two():
+    histogram = netstats.Histogram()
+
+    for micros in (1, 3, 3, 100, 5000):
+        histogram.add(micros / 1e6)
+
+    assert histogram.count == 5
+    assert histogram.buckets() == {2:1, 4:2, 128:1, 8192:1}
+    assert histogram.percentile(0.5) == 4 / 1e6
+    assert histogram.percentile(1.0) == 5000 / 1e6
+
+
+def test_replies_are_counted_under_the_command_they_answer():
+    stats = netstats.NetStats()
+    link = netstats.Link(stats, asks=True)
+
+    link.sent(protocol.CMD, b"GET_TARGET")
+    link.received(protocol.TEXT, b"Gandalf")
+
+    counted = stats.stats()["GET_TARGET"]
+    assert counted["frames_sent"] == counted["frames_received"] == 1
+    assert counted["received"] == protocol.HEADER.size + len(b"Gandalf")
+    assert counted["round_trips"] == 1
+
+
+def test_match_counts_round_trips_on_both_sides():
+    bots = [ScriptedClient(name="Alice", surrender_after=2),
+            ScriptedClient(name="Bob", surrender_after=5)]
+
+    game = play_match(bots)
+
+    server = game.net_stats.stats()
+    assert server["GET_GESTURES"]["round_trips"] == 2 * 3
+    assert server["GET_GESTURES"]["received"] > 0
+
+    client = bots[0].net_stats.stats()
+    assert client["GET_GESTURES"]["sent"] > 0
+    assert client["GET_GESTURES"]["round_trips"] == 3
@@ -0,0 +1,45 @@
+import socket
+
+from waving_hands import outbox as outbox_module
+from waving_hands.outbox import Outbox
+
+
+def test_flush_sends_what_the_socket_takes_and_keeps_the_rest():
+    sender, receiver = socket.socketpair()
+    outbox = Outbox(high_water=1024)
+    data = bytes(range(256)) * 40000
+
+    outbox.put(data)
+    assert not outbox.flush(sender)
+    assert outbox.over_high_water
+    assert 0 < outbox.stats()["sent"] < len(data)
+
+    received = bytearray()
+    while len(received) < len(data):
+        received += receiver.recv(1 << 20)
+        outbox.flush(sender)
+
+    assert received == data
+    assert len(outbox) == 0
+
+    stats = outbox.stats()
+    assert stats["queued"] == stats["sent"] == stats["peak"] == len(data)
+    assert stats["would_block"] >= 1
+
+    sender.close()
+    receiver.close()
+
+
+def test_flush_does_not_block_without_msg_dontwait(monkeypatch):
+    # As on Windows, where there is no MSG_DONTWAIT.
+    monkeypatch.setattr(outbox_module, "DONTWAIT", 0)
+
+    sender, receiver = socket.socketpair()
+    outbox = Outbox()
+    outbox.put(b"x" * (8 * 1024 * 1024))
+
+    assert not outbox.flush(sender)
+    assert sender.gettimeout() is None
+
+    sender.close()
+    receiver.close()
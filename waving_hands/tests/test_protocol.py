@@ -0,0 +1,100 @@
+import socket
+
+import pytest
+
+from waving_hands import protocol
+
+
+@pytest.fixture
+def pair():
+    a, b = socket.socketpair()
+    yield a, b
+    a.close()
+    b.close()
+
+
+def test_frames_round_trip_back_to_back(pair):
+    a, b = pair
+    protocol.send_frame(a, protocol.CMD, b"GET_TARGET")
+    protocol.send_frame(a, protocol.DATA, b"\x00" * 5000)
+    protocol.send_frame(a, protocol.INT, protocol.encode_int(1234))
+
+    assert protocol.recv_frame(b) == (protocol.CMD, b"GET_TARGET")
+    assert protocol.recv_frame(b) == (protocol.DATA, b"\x00" * 5000)
+    frame = protocol.recv_frame(b)
+    assert frame.tag == protocol.INT
+    assert protocol.decode_int(frame.payload) == 1234
+
+
+def test_empty_payload(pair):
+    a, b = pair
+    protocol.send_frame(a, protocol.TEXT)
+    assert protocol.recv_frame(b) == (protocol.TEXT, b"")
+
+
+def test_closed_connection_returns_none(pair):
+    a, b = pair
+    a.sendall(protocol.pack_frame(protocol.CMD, b"MSG")[:4])
+    a.close()
+    assert protocol.recv_frame(b) is None
+
+
+def test_unknown_tag_is_rejected(pair):
+    a, b = pair
+    a.sendall(protocol.HEADER.pack(200, 0))
+    with pytest.raises(protocol.ProtocolError):
+        protocol.recv_frame(b)
+
+
+def test_take_frames_leaves_a_partial_frame_behind():
+    data = protocol.pack_frame(protocol.CMD, b"MSG") + protocol.pack_frame(protocol.TEXT, b"hello")
+    buffer = bytearray(data[:-2])
+
+    assert protocol.take_frames(buffer) == [(protocol.CMD, b"MSG")]
+    assert buffer == data[8:-2]
+
+    buffer += data[-2:]
+    assert protocol.take_frames(buffer) == [(protocol.TEXT, b"hello")]
+    assert buffer == b""
+
+    with pytest.raises(protocol.ProtocolError):
+        protocol.take_frames(bytearray(protocol.HEADER.pack(protocol.CMD, protocol.MAX_PAYLOAD + 1)))
+
+
+def test_compressed_frames_unpack_to_the_frames_packed(pair):
+    a, b = pair
+    frames = [(protocol.CMD, b"PRINT_FLAVOR"),
+              (protocol.FLAVOR, b"Gandalf casts Magic Missile at Saruman!"),
+              (protocol.FLAVOR, b"...but it is deflected by Saruman's shield!"),
+              (protocol.FLAVOR_END, b"")]
+    data = b"".join(protocol.pack_frame(tag, payload) for tag, payload in frames)
+
+    packed = protocol.pack_compressed(data)
+    assert len(packed) < len(data)
+
+    a.sendall(packed)
+    frame = protocol.recv_frame(b)
+    assert frame.tag == protocol.COMPRESSED
+    assert protocol.unpack_compressed(frame.payload) == frames
+
+    with pytest.raises(protocol.ProtocolError):
+        protocol.unpack_compressed(frame.payload[:-4])
+
+
+def test_hello_is_answered_only_when_capabilities_are_offered(pair):
+    a, b = pair
+
+    protocol.answer_hello(a, protocol.unpack_hello(protocol.pack_hello()))
+    assert protocol.agreed(a) == frozenset()
+
+    offer = protocol.unpack_hello(protocol.pack_hello(caps=["zlib-00000000"] + protocol.capabilities()))
+    protocol.answer_hello(a, offer)
+
+    answer = protocol.recv_frame(b)
+    assert answer.tag == protocol.HELLO
+    assert protocol.unpack_hello(answer.payload)["caps"] == protocol.capabilities()
+    assert protocol.agreed(a) == frozenset(protocol.capabilities())
+
+
+def test_hello_that_is_not_utf8_is_not_a_hello():
+    assert protocol.unpack_hello(b"S\x01\xff") is None
@@ -0,0 +1,81 @@
+import socket
+
+from waving_hands import codec
+from waving_hands import protocol
+from waving_hands import snapshot as status
+from waving_hands.gamemaster import Gamemaster
+from waving_hands.minion import Minion
+
+
+def play_turn(gm, gestures):
+    gandalf, saruman = gm.wizards
+    for hand, gesture in zip(("left", "right"), gestures):
+        gandalf.get_hand(hand).add_gesture(gesture)
+        saruman.get_hand(hand).add_gesture(gesture.upper())
+    gandalf.add_broadcasted_gesture(saruman)
+
+
+def test_history_ops():
+    assert status.diff_history("ab", "ab") is None
+    assert status.diff_history("ab", "abc") == [status.APPEND, "c"]
+    assert status.diff_history("abcdefgh", "bcdefghi") == [status.APPEND, "i"]
+    assert status.diff_history("Nothing yet.", "p") == [status.SET, "p"]
+
+    for old, new in (("ab", "abc"), ("abcdefgh", "bcdefghi"), ("xyz", "p")):
+        assert status.apply_history(old, status.diff_history(old, new)) == new
+
+
+def test_deltas_rebuild_the_snapshot_and_stay_small():
+    gm = Gamemaster()
+    gm.create_wizards()
+    gandalf = gm.wizards[0]
+
+    first = gm.build_status_snapshot(gandalf)
+    client_side = first
+    server_side = first
+    sizes = []
+
+    for turn in range(30):
+        play_turn(gm, "wpsfdcwp"[turn % 8] + "s")
+        if turn == 5:
+            gandalf.add_minion(Minion("Grobleplop the Goblin", 1))
+        if turn == 6:
+            gandalf.hp -= 3
+
+        new = gm.build_status_snapshot(gandalf)
+        delta = status.diff_snapshot(server_side, new, turn, turn + 1)
+        sizes.append(len(codec.encode(delta)))
+
+        client_side = status.apply_delta(client_side, codec.decode(codec.encode(delta)))
+        assert client_side == new
+        server_side = new
+
+    # Once the histories are full, every turn costs the same.
+    assert max(sizes[10:]) == min(sizes[10:])
+
+
+def test_server_sends_deltas_after_the_first_snapshot_and_resyncs():
+    gm = Gamemaster()
+    gm.create_wizards()
+    server_side, client_side = socket.socketpair()
+    gm.wizards[0].client = server_side
+
+    gm.send_status_snapshot(server_side)
+    frame = protocol.recv_frame(client_side)
+    assert frame.tag == protocol.STATUS
+    assert codec.decode(frame.payload)["state"] == 1
+
+    gm.wizards[0].hp = 10
+    gm.send_status_snapshot(server_side)
+    frame = protocol.recv_frame(client_side)
+    delta = codec.decode(frame.payload)
+    assert frame.tag == protocol.STATUS_DELTA
+    assert (delta["base"], delta["state"], delta["set"]) == (1, 2, {"hp":10})
+
+    gm.send_status_snapshot(server_side, full=True)
+    frame = protocol.recv_frame(client_side)
+    assert frame.tag == protocol.STATUS
+    assert codec.decode(frame.payload)["state"] == 3
+
+    server_side.close()
+    client_side.close()
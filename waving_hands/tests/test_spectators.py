@@ -0,0 +1,67 @@
+import socket
+import threading
+
+from waving_hands import protocol
+from waving_hands.gamemaster import Gamemaster
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.spectator_client import SpectatorClient
+from waving_hands.spectators import Spectators
+from waving_hands.transport import InProcessTransport
+
+
+def test_spectator_sees_every_round_of_the_match():
+    transport = InProcessTransport()
+    game = Gamemaster(players=2, transport=transport, pregame=False, customize_wizards=False)
+
+    lines = []
+    spectator = SpectatorClient(transport=transport, output=lines.append)
+    spectator.connect()
+    watching = threading.Thread(target=spectator.watch)
+
+    bots = [ScriptedClient(name="Alice", surrender_after=2, transport=transport),
+            ScriptedClient(name="Bob", surrender_after=4, transport=transport)]
+    threads = [threading.Thread(target=bot.play) for bot in bots]
+    for bot in bots:
+        bot.connect()
+    for thread in threads + [watching]:
+        thread.start()
+
+    try:
+        game.setup_game()
+        game.play_game()
+    finally:
+        game.close_connections()
+
+    for thread in threads + [watching]:
+        thread.join(5)
+
+    assert spectator.match == game.match_id
+    assert spectator.rounds == 3
+    assert lines[0].startswith("Watching match " + game.match_id)
+    assert "Gandalf gestures P with the left hand and P with the right." in lines
+
+
+def test_spectators_that_fall_behind_are_dropped():
+    spectators = Spectators(high_water=64 * 1024)
+    reader, reader_far = socket.socketpair()
+    idle, idle_far = socket.socketpair()
+
+    spectators.add(reader, b"")
+    spectators.add(idle, b"")
+    assert reader.gettimeout() == 0.0
+
+    round_data = protocol.pack_frame(protocol.FLAVOR, b"x" * 4096)
+    received = 0
+    for rounds in range(1, 201):
+        spectators.broadcast(round_data)
+        while received < rounds * len(round_data):
+            received += len(reader_far.recv(65536))
+            spectators.flush(reader)
+
+    assert len(spectators) == 1
+    assert spectators.stats()["dropped"] == 1
+    assert received == 200 * len(round_data)
+
+    spectators.close()
+    for sock in reader_far, idle_far:
+        sock.close()
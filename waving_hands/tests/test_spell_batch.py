@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from waving_hands import spellbook
+from waving_hands.config import DATA
+from waving_hands.gesture_history import GestureHistory
+from waving_hands.spell_batch import BatchMatcher, encode_histories, encode_packed
+
+HISTORY_GESTURES = "fpswdcFPSWDC$? "
+
+
+def test_batch_agrees_with_the_matcher():
+    book = spellbook.load(DATA["spellbook"])
+    batch = BatchMatcher(book.spell_list)
+
+    rng = random.Random(23)
+    histories = ["".join(rng.choice(HISTORY_GESTURES) for _ in range(rng.randint(0, 8))) for _ in range(3000)]
+    histories += ["PWPWWC", "pwpfsssd", "pwpfsssdP", "sd", "C"]
+
+    codes = encode_histories(histories)
+    found = batch.completions(codes)
+    hasted = batch.completions(codes, hasted=True)
+
+    for row, history in enumerate(histories):
+        assert [spell for spell, hit in zip(book.spell_list, found[row]) if hit] == book.matcher.matches(history), history
+        # The matrix only holds the last eight gestures.
+        assert [spell for spell, hit in zip(book.spell_list, hasted[row]) if hit] == book.matcher.matches(history[-8:-1]), history
+
+    # A wider matrix keeps the gesture an eight gesture spell starts with.
+    wide = BatchMatcher(book.spell_list, width=9)
+    hasted = wide.completions(encode_histories(["pwpfsssdP"], width=9), hasted=True)
+    assert [spell.name for spell, hit in zip(book.spell_list, hasted[0]) if hit] == ["Finger of Death", "Magic Missile"]
+
+
+def test_packed_histories_encode_like_strings():
+    histories = [GestureHistory(text) for text in ("", "p", "fpswdcFP", "wpfsdwpfsdCC")]
+
+    packed = encode_packed([history.packed for history in histories], [len(history) for history in histories])
+
+    assert (packed == encode_histories(histories)).all()
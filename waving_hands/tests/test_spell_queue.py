@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from waving_hands.spell import Spell
+from waving_hands.spell_queue import SpellQueue
+
+
+class Caster:
+
+    def __init__(self, name):
+        self.name = name
+
+
+def test_queue_answers_as_the_list_did():
+    rng = random.Random(25)
+    wizards = [Caster("W" + str(i)) for i in range(4)]
+    spells = [Spell(name, "p", "", "null") for name in ("Shield", "Raise Dead", "Amnesia", "Fire Storm")]
+
+    queue = SpellQueue()
+    reference = []
+
+    for _ in range(3000):
+        roll = rng.random()
+
+        if roll < 0.5 or not reference:
+            spell_tuple = (rng.choice(wizards), rng.choice(wizards), rng.choice(spells))
+            queue.add(*spell_tuple)
+            reference.append(spell_tuple)
+        elif roll < 0.8:
+            spell_tuple = rng.choice(reference)
+            queue.remove(spell_tuple)
+            reference.remove(spell_tuple)
+        else:
+            name = rng.choice(spells).name
+            first = next((spell_tuple for spell_tuple in reference if spell_tuple[2].name == name), None)
+            assert queue.pop_first(name) == first
+            if first:
+                reference.remove(first)
+
+        assert list(queue) == reference
+        assert len(queue) == len(reference)
+
+        wizard = rng.choice(wizards)
+        assert list(queue.by_caster(wizard)) == [spell_tuple for spell_tuple in reference if spell_tuple[0] is wizard]
+        assert list(queue.targeting(wizard)) == [spell_tuple for spell_tuple in reference if spell_tuple[1] is wizard]
+
+        for spell in spells:
+            assert queue.contains_spell(spell.name) == any(spell_tuple[2] is spell for spell_tuple in reference)
+
+    with pytest.raises(ValueError):
+        queue.remove((wizards[0], wizards[0], Spell("Nothing", "p", "", "null")))
+
+    queue.clear()
+    assert not queue
+    assert queue.first("Shield") is None
+
+
+def test_spells_added_while_walking_are_reached():
+    wizard = Caster("W")
+    shield = Spell("Shield", "p", "", "null")
+
+    queue = SpellQueue([(wizard, wizard, shield)])
+
+    walked = []
+    for spell_tuple in queue.targeting(wizard):
+        walked.append(spell_tuple)
+        if len(walked) < 3:
+            queue.add(wizard, wizard, shield)
+
+    assert len(walked) == 3
+    assert (wizard, wizard, shield) in queue
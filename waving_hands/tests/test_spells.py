@@ -1,2 +1,204 @@
+import itertools
+import os
+import random
+
+import pytest
+
+from waving_hands.config import DATA
+from waving_hands.hand import Hand
+from waving_hands.wizard import Wizard
+from waving_hands import spell_cache
+from waving_hands import spellbook
+
+# What a hand's history can hold: a gesture made with one hand, the same
+# made with both, a stab, and nothing.
+HISTORY_GESTURES = "fpswdcFPSWDC$-"
+
+
+def nested_loop_matches(book, hand_history):
+
+    # The check determine_spellcasts made before the spellbook was compiled.
+
+    found = []
+
+    for spell in book.spell_list:
+        if len(spell.gesture) <= len(hand_history):
+            spell_slice = hand_history[-len(spell.gesture):]
+            for i in range(0, len(spell_slice)):
+                if spell.gesture[i] != "C":
+                    if spell_slice[i].lower() == spell.gesture[i].lower():
+                        if spell_slice[i] != spell.gesture[i]:
+                            if spell_slice[i].lower() == spell.gesture[i]:
+                                spell_slice = spell_slice.replace(spell_slice[i], spell_slice[i].lower(), 1)
+
+            if spell_slice == spell.gesture:
+                found.append(spell)
+
+    return found
+
+
 def test_sanity():
     assert True
+
+
+def test_matcher_finds_what_the_nested_loop_found():
+    book = spellbook.load(DATA["spellbook"])
+
+    for length in range(4):
+        for history in itertools.product(HISTORY_GESTURES, repeat=length):
+            history = "".join(history)
+            assert book.matcher.matches(history) == nested_loop_matches(book, history), history
+
+    rng = random.Random(17)
+    for _ in range(20000):
+        history = "".join(rng.choice(HISTORY_GESTURES) for _ in range(8))
+        assert book.matcher.matches(history) == nested_loop_matches(book, history), history
+
+
+def test_claps_need_both_hands():
+    book = spellbook.load(DATA["spellbook"])
+
+    names = [spell.name for spell in book.matcher.matches("PWPWWC")]
+    assert "Haste" in names
+
+    assert book.matcher.matches("pwpwwc") == []
+
+
+def test_hand_state_follows_its_history():
+    book = spellbook.load(DATA["spellbook"])
+    hand = Hand(book.matcher)
+
+    rng = random.Random(18)
+    for _ in range(2000):
+        hand.add_gesture(rng.choice(HISTORY_GESTURES))
+        assert list(hand.state.completed) == nested_loop_matches(book, hand.history)
+        assert list(hand.previous_state.completed) == nested_loop_matches(book, hand.history[:-1])
+
+    hand.erase_history()
+    assert hand.state is book.matcher.start
+
+    hand.history = "dwsssP"
+    assert [spell.name for spell in hand.state.completed] == [
+        spell.name for spell in nested_loop_matches(book, "dwsssP")]
+    assert "Shield" in [spell.name for spell in hand.state.completed]
+    assert ("Delayed Effect", 5) in [(spell.name, made) for spell, made in hand.previous_state.in_progress]
+
+
+def test_forecast_gives_the_shortest_way_to_each_spell():
+    book = spellbook.load(DATA["spellbook"])
+
+    rng = random.Random(19)
+    for _ in range(300):
+        history = "".join(rng.choice(HISTORY_GESTURES) for _ in range(rng.randrange(9)))
+        forecast = book.forecast(history)
+
+        assert sorted(entry.spell.name for entry in forecast) == sorted(spell.name for spell in book.spell_list)
+        assert [entry.remaining for entry in forecast] == sorted(entry.remaining for entry in forecast)
+
+        for spell, remaining, continuation in forecast:
+            # The fewest gestures after which the nested loop finds the spell.
+            fewest = next(count for count in range(1, len(spell.gesture) + 1)
+                          if spell in nested_loop_matches(book, history + spell.gesture[-count:]))
+            assert (remaining, continuation) == (fewest, spell.gesture[-fewest:]), (history, spell.name)
+
+    hand = Hand(book.matcher)
+    hand.history = "pwpww"
+    assert book.forecast(hand.state, 1) == book.forecast("pwpww", 1)
+    assert ("Haste", 1, "C") in [(entry.spell.name, entry.remaining, entry.continuation)
+                                 for entry in book.forecast(hand.state, 1)]
+    assert all(entry.remaining <= 2 for entry in book.forecast("sd", 2))
+
+
+def test_spellbooks_are_shared_until_the_file_changes(tmp_path):
+    path = tmp_path / "spells.txt"
+    path.write_text("spell=Shield\ngesture=p\ndesc=Blocks.\nkill=null\n")
+
+    book = spellbook.load(str(path))
+    assert spellbook.load(str(path)) is book
+
+    # Rewritten with the same contents: still the same book.
+    path.write_text("spell=Shield\ngesture=p\ndesc=Blocks.\nkill=null\n")
+    os.utime(path, ns=(0, 0))
+    assert spellbook.load(str(path)) is book
+
+    path.write_text("spell=Shield\ngesture=p\ndesc=Blocks.\nkill=null\n\nspell=Stab\ngesture=s\ndesc=Ow.\nkill=null\n")
+    changed = spellbook.load(str(path))
+    assert changed is not book
+    assert [spell.name for spell in changed.spell_list] == ["Shield", "Stab"]
+
+    # Spells are shared too.
+    assert changed.spell_list[0] is book.spell_list[0]
+    assert book.spell_list[0].duration == 1
+
+    wizard = Wizard("Merlin")
+    other = Wizard("Morgana")
+    assert wizard.spellbook is other.spellbook
+
+
+def test_spellbook_indexes(capsys):
+    book = spellbook.load(DATA["spellbook"])
+
+    assert book.get_spell("Anti-spell").gesture == "spf"
+    assert book.get_spell("Anti-Spell") is book.get_spell("Anti-spell")
+    assert book.get_spell("Fireball of Doom") is None
+    assert "ANTI-SPELL" in book.show_spell_desc_by_name("Anti-Spell")
+
+    assert list(book.by_gesture) == sorted(book.spell_list, key=lambda spell: spell.gesture)
+    assert book.by_gesture[0].name.upper() in book.show_spell_desc_gesture_sort(1)
+
+    book.search_by_gesture_length("ffPW", 2)
+    out = capsys.readouterr().out
+    assert "[pw]" in out
+    assert "Haste" in out and "pwpwwC" in out
+    assert "Finger of Death" in out
+
+
+def test_parser_reports_the_line_at_fault():
+    lines = ["spell=Shield", "gesture=p", "desc=Blocks.", "kill=null", "",
+             "spell=Shield", "gesture=p", "desc=Blocks.", "kill=null", "",
+             "spell=Stab", "gesture=sx", "desc=Ow.", "kill=null"]
+
+    with pytest.raises(spellbook.SpellbookParseError) as e:
+        list(spellbook.parse_spellbook(lines, "spells.txt"))
+    assert e.value.line == 12
+    assert "spells.txt, line 12" in str(e.value) and "'x'" in str(e.value)
+
+    # Identical blocks are each read from their own lines.
+    assert len(list(spellbook.parse_spellbook(lines[:10]))) == 2
+
+    with pytest.raises(spellbook.SpellbookParseError) as e:
+        list(spellbook.parse_spellbook(["spell=Stab", "gesture=s", "kill=null"]))
+    assert e.value.line == 3
+
+    with pytest.raises(ValueError):
+        list(spellbook.parse_spellbook(["spell=Stab", "gesture=s"]))
+
+
+def test_compiled_spellbook_skips_parsing(tmp_path, monkeypatch):
+    path = tmp_path / "spells.txt"
+    path.write_text("spell=Shield\ngesture=p\ndesc=Blocks.\nkill=null\n")
+
+    book = spellbook.load(str(path))
+
+    # As a new process would find it: nothing loaded, but the cache written.
+    monkeypatch.setattr(spellbook, "_books", {})
+    monkeypatch.setattr(spellbook, "_stamps", {})
+
+    parse_spellbook = spellbook.parse_spellbook
+
+    def parse(lines, source="spellbook"):
+        raise AssertionError("parsed " + str(source))
+
+    monkeypatch.setattr(spellbook, "parse_spellbook", parse)
+
+    cached = spellbook.load(str(path))
+    assert cached is not book
+    assert cached.spell_list == book.spell_list
+
+    # A damaged cache, or one that is not utf-8, is parsed around.
+    monkeypatch.setattr(spellbook, "parse_spellbook", parse_spellbook)
+    for junk in (b"junk", b"S\x01\xff", b"D\x01S\x01\xffN"):
+        spell_cache.cache_path(os.path.realpath(str(path))).write_bytes(junk)
+        monkeypatch.setattr(spellbook, "_books", {})
+        monkeypatch.setattr(spellbook, "_stamps", {})
+        assert spellbook.load(str(path)).spell_list == book.spell_list
@@ -0,0 +1,53 @@
+import socket
+import threading
+import time
+
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.supervisor import Supervisor
+
+
+def test_matches_are_spread_across_workers():
+    supervisor = Supervisor(host="127.0.0.1", port=0, pregame=False,
+                            customize_wizards=False, workers=2, quiet=True)
+    supervisor.start_workers()
+    supervisor.open_socket()
+    port = supervisor.server.getsockname()[1]
+
+    serving = threading.Thread(target=supervisor.serve, args=(2,))
+    serving.start()
+
+    # A connection that never says hello does not hold up the players.
+    silent = socket.create_connection(("127.0.0.1", port))
+
+    try:
+        bots = []
+        for i in range(2):
+            pair = [ScriptedClient(host="127.0.0.1", port=port, name="A" + str(i), surrender_after=3),
+                    ScriptedClient(host="127.0.0.1", port=port, name="B" + str(i), surrender_after=3)]
+            for bot in pair:
+                bot.connect()
+            bots.extend(pair)
+
+        results = []
+        threads = [threading.Thread(target=lambda bot=bot: results.append(bot.play())) for bot in bots]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        serving.join(10)
+
+        assert results == [True] * 4
+        assert not serving.is_alive()
+
+        for _ in range(100):
+            load = supervisor.load()
+            if sum(entry["finished"] for entry in load) == 2:
+                break
+            time.sleep(0.01)
+
+        # Each worker was idle when its match arrived.
+        assert [entry["finished"] for entry in load] == [1, 1]
+        assert [entry["active"] for entry in load] == [0, 0]
+    finally:
+        silent.close()
+        supervisor.stop_workers()
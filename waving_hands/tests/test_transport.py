@@ -0,0 +1,33 @@
+import select
+
+from waving_hands import protocol
+from waving_hands.headless import play_match
+from waving_hands.scripted_client import ScriptedClient
+from waving_hands.transport import InProcessTransport
+
+
+def test_in_process_connections_wake_select_and_carry_frames():
+    transport = InProcessTransport()
+
+    assert select.select([transport], [], [], 0)[0] == []
+    client = transport.connect()
+    assert select.select([transport], [], [], 0)[0] == [transport]
+
+    server, addr = transport.accept()
+    protocol.send_frame(client, protocol.CMD, b"NEXT_TURN_READY")
+    assert protocol.recv_frame(server).payload == b"NEXT_TURN_READY"
+
+    transport.close()
+    client.close()
+    server.close()
+
+
+def test_headless_match_needs_no_port():
+    bots = [ScriptedClient(name="Alice", surrender_after=2),
+            ScriptedClient(name="Bob", surrender_after=5)]
+
+    game = play_match(bots)
+
+    assert [bot.finished for bot in bots] == [True, True]
+    assert bots[0].turns == 3
+    assert game.server is None
@@ -0,0 +1,195 @@
+# How the Gamemaster gets its players' connections, and how a client
+# reaches the Gamemaster.
+#
+# Whatever the transport, every connection is an ordinary socket, so the
+# frames, select calls and resumes work the same way. A transport only
+# decides where those sockets come from. On the server side it stands in for
+# the listening socket: it can be passed to select, and accept() returns the
+# next (socket, address).
+
+import collections
+import itertools
+import socket
+import threading
+
+
+class Transport:
+
+    """ The interface every transport provides. """
+
+    def listen(self):
+
+        """ Start taking connections. Calling it again does nothing. """
+
+        raise NotImplementedError
+
+    def accept(self):
+
+        """ Return (socket, address) for the next connection, waiting for one
+        if need be. """
+
+        raise NotImplementedError
+
+    def fileno(self):
+
+        """ A file descriptor that select reports readable while a connection
+        is waiting to be accepted. """
+
+        raise NotImplementedError
+
+    def connect(self, timeout=None):
+
+        """ Return a new connection to the server, as a blocking socket. """
+
+        raise NotImplementedError
+
+    def close(self):
+
+        raise NotImplementedError
+
+
+class TcpTransport(Transport):
+
+    """ Connections over TCP, as used by every server and client by default. """
+
+    def __init__(self, host="localhost", port=12345, backlog=128):
+
+        self._HOST_ADDR = (host, port)
+        self._BACKLOG = backlog
+
+        self._listener = None
+
+    @property
+    def address(self):
+
+        """ The address we listen on, with the real port if port 0 was asked for. """
+
+        if self._listener:
+            return self._listener.getsockname()
+        return self._HOST_ADDR
+
+    def listen(self):
+
+        if self._listener:
+            return
+
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(self._HOST_ADDR)
+        self._listener.listen(self._BACKLOG)
+
+    def accept(self):
+
+        return self._listener.accept()
+
+    def fileno(self):
+
+        return self._listener.fileno()
+
+    def connect(self, timeout=None):
+
+        sock = socket.create_connection(self.address, timeout=timeout)
+        sock.settimeout(None)
+
+        return sock
+
+    def close(self):
+
+        if self._listener:
+            self._listener.close()
+            self._listener = None
+
+    def __str__(self):
+        return "TCP " + str(self.address)
+
+
+class InProcessTransport(Transport):
+
+    """ Connections between threads of one process, with no port bound.
+
+    Each connection is a socketpair. connect() keeps the server end until it
+    is accepted, and writes a byte to a wake-up socket so that a server
+    waiting in select notices. The wake-up socket is emptied once nothing is
+    waiting, so it stays readable exactly while there is something to accept.
+    """
+
+    _numbers = itertools.count(1)
+
+    def __init__(self):
+
+        self._waiting = collections.deque()
+        self._lock = threading.Lock()
+        self._name = "in-process #" + str(next(self._numbers))
+
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._closed = False
+
+        # Wake-up bytes are only ever sent without waiting. The reader stays
+        # blocking for accept(), and is made non-blocking only to be emptied.
+        self._wake_writer.setblocking(False)
+
+        self._connections = itertools.count(1)
+
+    def listen(self):
+
+        # Nothing to bind; connections are taken from the moment we exist.
+        pass
+
+    def accept(self):
+
+        while True:
+            with self._lock:
+                if self._waiting:
+                    server_side = self._waiting.popleft()
+                    if not self._waiting:
+                        self.clear_wake()
+                    return server_side, (self._name, next(self._connections))
+
+            if not self._wake_reader.recv(1):
+                raise OSError("Transport closed.")
+
+    def clear_wake(self):
+
+        self._wake_reader.setblocking(False)
+        try:
+            while self._wake_reader.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        finally:
+            self._wake_reader.setblocking(True)
+
+    def fileno(self):
+
+        return self._wake_reader.fileno()
+
+    def connect(self, timeout=None):
+
+        if self._closed:
+            raise ConnectionRefusedError("Transport closed.")
+
+        server_side, client_side = socket.socketpair()
+
+        with self._lock:
+            self._waiting.append(server_side)
+            try:
+                self._wake_writer.send(b"\0")
+            except BlockingIOError:
+                # Full of wake-up bytes already, so the server will notice.
+                pass
+
+        return client_side
+
+    def close(self):
+
+        self._closed = True
+
+        with self._lock:
+            while self._waiting:
+                self._waiting.popleft().close()
+
+        self._wake_writer.close()
+        self._wake_reader.close()
+
+    def __str__(self):
+        return self._name
@@ -2,7 +2,14 @@ import argparse
 import logging
 import logging.config
 
+from waving_hands import async_server
+from waving_hands import capture
+from waving_hands import codec
 from waving_hands import gamemaster
+from waving_hands import lobby
+from waving_hands import protocol
+from waving_hands import spectator_client
+from waving_hands import supervisor
 from waving_hands.spellbinder_client import main as client_main
 from waving_hands import config
 
@@ -20,6 +27,40 @@ parser.add_argument(
 parser.add_argument(
     "--client", action="store_true", help="Connect to another host instead using the --host and --port args"
 )
+parser.add_argument(
+    "--spectate",
+    nargs="?",
+    const="",
+    default=None,
+    metavar="MATCH",
+    help="Watch a match on --host and --port instead of playing. Default: the newest match",
+)
+parser.add_argument(
+    "--serve-async",
+    action="store_true",
+    help="Serve any number of matches at once from a single process",
+)
+parser.add_argument(
+    "--lobby",
+    action="store_true",
+    help="Serve a lobby where players are grouped into rooms, each playing its own match",
+)
+parser.add_argument(
+    "--supervise",
+    action="store_true",
+    help="Spread matches across a pool of worker processes",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=None,
+    help="Number of worker processes for --supervise. Default: one per core",
+)
+parser.add_argument(
+    "--room",
+    default=None,
+    help="Room to join when connecting to a lobby with --client. Default: ask",
+)
 parser.add_argument(
     "--skip-pregame", action="store_true", help="Skip the pre-game introductions"
 )
@@ -34,28 +75,113 @@ parser.add_argument(
     default=2,
     help="Number of players to use for the game. Should always be 2.",
 )
+parser.add_argument(
+    "--deadline",
+    action="append",
+    default=[],
+    metavar="PHASE=SECONDS",
+    help="Time players have for a phase: customize, gestures, choices or ready. May be repeated",
+)
+parser.add_argument(
+    "--resume-window",
+    type=float,
+    default=60,
+    help="Seconds a dropped player has to reconnect before the match ends. Default: 60",
+)
+parser.add_argument(
+    "--capture",
+    default=None,
+    metavar="DIR",
+    help="Record every match to a capture file in DIR, for python -m waving_hands.replay",
+)
 parser.add_argument("--log", default="INFO", help="Set Logging level for the server")
 
 
+def parse_deadlines(specs):
+
+    """ Turn PHASE=SECONDS arguments into a {phase:seconds} dict. """
+
+    deadlines = {}
+
+    for spec in specs:
+        phase, sep, seconds = spec.partition("=")
+        if phase not in gamemaster.DEADLINES or not sep:
+            parser.error("--deadline takes PHASE=SECONDS, where PHASE is one of " + ", ".join(gamemaster.DEADLINES))
+        try:
+            deadlines[phase] = float(seconds)
+        except ValueError:
+            parser.error("--deadline " + spec + " does not give a number of seconds")
+
+    return deadlines
+
+
 def main():
     args = parser.parse_args()
     log_cfg = config.LOGGING.copy()
     log_cfg["handlers"]["console"]["level"] = args.log
     logging.config.dictConfig(log_cfg)
 
-    if args.client:
-        client_main(args.host, args.port)
+    pregame, customize = not args.skip_pregame, not args.skip_customize
+    deadlines = parse_deadlines(args.deadline)
+
+    if args.spectate is not None:
+        spectator_client.main(args.host, args.port, match=args.spectate)
+    elif args.client:
+        client_main(args.host, args.port, room=args.room)
+    elif args.lobby:
+        lobby.main(
+            args.host,
+            args.port,
+            pregame=pregame,
+            customize_wizards=customize,
+            players=args.players,
+            deadlines=deadlines,
+            resume_window=args.resume_window,
+            capture_dir=args.capture,
+        )
+    elif args.supervise:
+        supervisor.main(
+            args.host,
+            args.port,
+            pregame=pregame,
+            customize_wizards=customize,
+            players=args.players,
+            workers=args.workers,
+            deadlines=deadlines,
+            resume_window=args.resume_window,
+            capture_dir=args.capture,
+        )
+    elif args.serve_async:
+        async_server.main(
+            args.host,
+            args.port,
+            pregame=pregame,
+            customize_wizards=customize,
+            players=args.players,
+            deadlines=deadlines,
+            resume_window=args.resume_window,
+            capture_dir=args.capture,
+        )
     else:
-        pregame, customize = not args.skip_pregame, not args.skip_customize
         game = gamemaster.Gamemaster(
             host=args.host,
             port=args.port,
             pregame=pregame,
             customize_wizards=customize,
             players=args.players,
+            deadlines=deadlines,
+            resume_window=args.resume_window,
+            capture=capture.match_path(args.capture) if args.capture else None,
         )
-        game.setup_game()  # create wizards, customize, etc
-        game.play_game()
+        try:
+            game.setup_game()  # create wizards, customize, etc
+            game.play_game()
+        except gamemaster.ConnectionLost as e:
+            log.info("Game ended: " + str(e))
+        except (protocol.ProtocolError, codec.CodecError) as e:
+            log.info("Game ended by a malformed message: " + str(e))
+        finally:
+            game.close_connections()
 
 
 if __name__ == "__main__":
@@ -1,15 +1,16 @@
-from random import randint
+import random
 
+from waving_hands.gesture_history import GestureHistory
 from waving_hands.hand import Hand
 from waving_hands.spellbook_client import SpellbookClient
-from waving_hands.spellbook import Spellbook
+from waving_hands import spellbook
 from waving_hands.targetable import Targetable
 from waving_hands.config import DATA
 
 class Wizard(Targetable):
 
     # a wizard has two hands.
-    # a wizard also has their own spellbook.
+    # a wizard also has a spellbook, shared with every other wizard.
 
     def __init__(self, name="Merlin"):
 
@@ -20,13 +21,14 @@ class Wizard(Targetable):
         super().__init__()
 
         self._name = name
+        self._rng = random.Random()
         self._maxhp = 14
         self._hp = self._maxhp
 
         self._color = "blue"
-        self._left = Hand()
-        self._right = Hand()
-        self._spellbook = Spellbook(DATA["spellbook"])
+        self._spellbook = spellbook.load(DATA["spellbook"])
+        self._left = Hand(self._spellbook.matcher)
+        self._right = Hand(self._spellbook.matcher)
         self._spellbook_client = SpellbookClient(self._spellbook.spell_list)
         self._taunt = "I forgot what I was going to say."
         self._victory = "It looks like I win again."
@@ -75,6 +77,16 @@ class Wizard(Targetable):
 
         self._client = None
 
+    @property
+    def rng(self):
+        """ Random number generator for confusion, shared with the
+        Gamemaster so that a seeded match plays out the same every time. """
+        return self._rng
+
+    @rng.setter
+    def rng(self, rng):
+        self._rng = rng
+
     @property
     def c_hands(self):
         return self._c_hands
@@ -206,7 +218,7 @@ class Wizard(Targetable):
 
         if other_wizard.name not in self.perceived_history:
             # The name is not here. Create one.
-            self.perceived_history[other_wizard.name] = {"left":"", "right":""}
+            self.perceived_history[other_wizard.name] = {"left":GestureHistory(), "right":GestureHistory()}
 
         # Next, get the broadcasted gestures, and determine if we add them to our own.
 
@@ -218,26 +230,15 @@ class Wizard(Targetable):
                 if self.blinded or other_wizard.invisible:
                     hand_history = "?"
             
-            enemy_history = self.perceived_history[other_wizard.name][hand]
-
-            # Finally, add the character to the end of the history string.
-            if len(enemy_history) == 8:
-                new_history = []
-                for i in range(1, len(enemy_history)):
-                    new_history.append(enemy_history[i])
-                new_history.append(hand_history)
-                new_history = "".join(new_history)
-
-                self.perceived_history[other_wizard.name][hand] = new_history
-            else:
-                self.perceived_history[other_wizard.name][hand] += hand_history
+            # Finally, add the gesture to the end of the history.
+            self.perceived_history[other_wizard.name][hand].append(hand_history)
 
     def erase_perceived_history(self, other_wizard):
 
         """ Erase the perceived history of the other wizard. """
 
         if other_wizard.name in self.perceived_history:
-            self.perceived_history[other_wizard.name] = {"left":"", "right":""}
+            self.perceived_history[other_wizard.name] = {"left":GestureHistory(), "right":GestureHistory()}
 
     def show_perceived_history(self, other_wizard):
 
@@ -257,6 +258,14 @@ class Wizard(Targetable):
     def perceived_history(self):
         return self._perceived_history
 
+    def get_perceived_history_strings(self):
+
+        """ Return the perceived history as {wizard name:{hand:history}}
+        with each history as a string, for sending. """
+
+        return {name:{hand:str(history) for hand, history in hands.items()}
+                for name, hands in self.perceived_history.items()}
+
     @property
     def paralysis_expiration(self):
         return self._paralysis_expiration
@@ -606,7 +615,7 @@ class Wizard(Targetable):
 
     def get_latest_gesture(self, hand):
         if hand.lower() in ("left", "right"):
-            return self.get_hand(hand).history[-1:]
+            return self.get_hand(hand).gestures.latest
         else:
             raise AttributeError("Received request for invalid hand: " + str(hand))
 
@@ -704,14 +713,14 @@ class Wizard(Targetable):
             if self.confused:
                 # Which hand will be confused? 0 for left, 1 for right
                 hands = ("left", "right")
-                rand_hand = randint(0, len(hands)-1)
+                rand_hand = self.rng.randint(0, len(hands)-1)
                 self.confusion_hand = hands[rand_hand]
 
                 # What will the gesture be replaced with?
                 # 1=C, 2=D, 3=F, 4=P, 5=S, 6=W
 
                 r_gestures = ("c", "d", "f", "p", "s", "w")
-                rand_gesture = randint(0, len(r_gestures)-1)
+                rand_gesture = self.rng.randint(0, len(r_gestures)-1)
                 confusion_gesture = r_gestures[rand_gesture]
             """
             valid_gestures = ["f", "p", "s", "w", "d", "c", "h", "?", "@", "$"]